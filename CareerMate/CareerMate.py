@@ -1,21 +1,39 @@
+from rag_tools.startup import startup_report, timed, warmup
+
 import os
+import sys
+import copy
 import json
 import asyncio
+import dataclasses
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional, Tuple
 from dataclasses import dataclass
 from pydantic import BaseModel
 from dotenv import load_dotenv
 from openai import AsyncOpenAI
-from agents import (
-    Agent, OpenAIChatCompletionsModel, Runner, function_tool, 
-    RunContextWrapper, InputGuardrailTripwireTriggered
-)
-# Assuming these are the corrected files from previous conversations
-from rag_tools.rag_skills import get_required_skills_with_rag  
-from rag_tools.rag_jobs import find_jobs_with_rag
-from rag_tools.rag_skills import SkillGapResult 
-from rag_tools.rag_jobs import JobListing
+with timed("import agents sdk"):
+    from agents import (
+        Agent, OpenAIChatCompletionsModel, Runner, function_tool, 
+        RunContextWrapper, RunHooks, InputGuardrailTripwireTriggered
+    )
+# RAG modules are cheap to import: the embedder, indexes and LLM load on first use
+with timed("import rag_tools"):
+    from rag_tools.rag_skills import get_required_skills_with_rag, cached_required_skills, skills_query
+    from rag_tools.rag_jobs import stream_jobs_with_rag, cached_jobs, jobs_query, job_filters
+    from rag_tools.rag_skills import SkillGapResult 
+    from rag_tools.rag_jobs import JobListing
+    from rag_tools.setup_vectorstore import get_hybrid_retriever
+    from rag_tools.skill_index import lookup_required_skills, normalize_skill, extract_skills
+    from rag_tools.intent_router import classify_intent
+    from rag_tools.course_catalog import get_course_catalog
+    from rag_tools.metrics import incr, observe, COUNT_BUCKETS
+    from rag_tools.tracing import configure_tracing, span, start_span, end_span, record_llm_call
+    from rag_tools.events import emit, event_sink
+    from rag_tools.llm_gateway import LLM_TIMEOUT, get_http_client
+    from rag_tools.answer_cache import normalize_query
+    from rag_tools.sessions import SESSIONS, Session, drain_sessions, get_session_store
 
 
 # Load environment variables
@@ -28,13 +46,29 @@ MODEL_NAME = os.getenv("MODEL_NAME")
 if not BASE_URL or not API_KEY or not MODEL_NAME:
     raise ValueError("Please set BASE_URL, API_KEY, and MODEL_NAME.")
 
-client = AsyncOpenAI(base_url=BASE_URL, api_key=API_KEY)
+# Shares the RAG chains' connection pool, coalescing, rate limit and retries (llm_gateway.py)
+client = AsyncOpenAI(base_url=BASE_URL, api_key=API_KEY, http_client=get_http_client(),
+                     max_retries=0, timeout=LLM_TIMEOUT)
 
 # ----------------------------- MODELS -----------------------------
 
 class CourseRecommendation(BaseModel):
     skill: str
     courses: List[str]
+    matched_skill: Optional[str] = None   # catalog skill the request resolved to ("ML" -> "Machine Learning")
+
+# UserContext fields a career plan is computed from
+PLAN_INPUTS = ("target_job", "current_skills", "preferred_location", "involvement", "work_type")
+
+class CareerPlan(BaseModel):
+    target_job: Optional[str] = None
+    current_skills: List[str] = []
+    preferred_location: Optional[str] = None
+    involvement: Optional[str] = None
+    work_type: Optional[str] = None
+    missing_skills: List[str] = []
+    jobs: List[JobListing] = []
+    courses: List[CourseRecommendation] = []
 
 @dataclass
 class UserContext:
@@ -46,6 +80,8 @@ class UserContext:
     work_type: Optional[str] = None        # "remote" / "on-site" / "hybrid"
     missing_skills: List[str] = None
     session_start: datetime = None
+    career_plan: Optional[CareerPlan] = None   # reused while its PLAN_INPUTS are unchanged
+    skill_gap_for: Optional[str] = None        # skill_gap_key() that missing_skills was computed for
 
     def __post_init__(self):
         if self.current_skills is None:
@@ -55,6 +91,25 @@ class UserContext:
         if self.session_start is None:
             self.session_start = datetime.now()
 
+CONTEXT_FIELDS = {f.name for f in dataclasses.fields(UserContext)}
+
+def context_to_dict(user_context: UserContext) -> dict:
+    """JSON-ready UserContext, for the session store and serve.py responses."""
+    data = {f.name: copy.deepcopy(getattr(user_context, f.name)) for f in dataclasses.fields(user_context)}
+    data["session_start"] = user_context.session_start.isoformat()
+    if user_context.career_plan is not None:
+        data["career_plan"] = user_context.career_plan.model_dump(mode="json")
+    return data
+
+def context_from_dict(data: dict) -> UserContext:
+    """Inverse of context_to_dict; unknown keys are ignored."""
+    fields = {k: v for k, v in data.items() if k in CONTEXT_FIELDS}
+    if isinstance(fields.get("session_start"), str):
+        fields["session_start"] = datetime.fromisoformat(fields["session_start"])
+    if isinstance(fields.get("career_plan"), dict):
+        fields["career_plan"] = CareerPlan.model_validate(fields["career_plan"])
+    return UserContext(**fields)
+
 # ----------------------------- TOOLS -----------------------------
 
 @function_tool
@@ -68,83 +123,161 @@ async def get_required_skills_for_job(wrapper: RunContextWrapper[UserContext]) -
         # Handle the case where no target job is set
         return SkillGapResult(missing_skills=[])
 
-    # CRITICAL FIX: 'await' is required here because get_required_skills_with_rag is an async function
-    required_skills_result = await get_required_skills_with_rag(job_title=job_title)
-    
-    # Compare with current_skills to find missing ones
-    required_skills = required_skills_result.missing_skills
-    missing_skills = [skill for skill in required_skills if skill not in current_skills]
-    
+    # Repeat turns of a session reuse the gap computed earlier
+    missing_skills = known_skill_gap(wrapper.context)
+    if missing_skills is not None:
+        return missing_skills
+
+    # Known titles are answered from the offline skill index; RAG + LLM only for unseen titles
+    required_skills = lookup_required_skills(job_title)
+    if required_skills is None:
+        # CRITICAL FIX: 'await' is required here because get_required_skills_with_rag is an async function
+        required_skills_result = await get_required_skills_with_rag(job_title=job_title)
+        required_skills = required_skills_result.missing_skills
+
+    missing_skills = missing_from(required_skills, current_skills)
     wrapper.context.missing_skills = missing_skills
+    wrapper.context.skill_gap_for = skill_gap_key(wrapper.context)
     return missing_skills
 
+def missing_from(required_skills: List[str], current_skills: List[str]) -> List[str]:
+    """Required skills the user lacks; aliases like "ML" / "Machine Learning" match."""
+    known = {normalize_skill(skill).lower() for skill in current_skills}
+    return [skill for skill in required_skills if normalize_skill(skill).lower() not in known]
+
+def skill_gap_key(user_context: UserContext) -> str:
+    """What the skill gap depends on: the target job and the current skills."""
+    skills = sorted({normalize_skill(skill).lower() for skill in user_context.current_skills})
+    return json.dumps([normalize_query(user_context.target_job or ""), skills])
+
+def known_skill_gap(user_context: UserContext) -> Optional[List[str]]:
+    """The context's missing_skills, if they were computed for its current job and skills."""
+    if user_context.skill_gap_for != skill_gap_key(user_context):
+        return None
+    incr("skill_gap_reuse_total")
+    return list(user_context.missing_skills)
+
 
 @function_tool
 async def find_matching_jobs(wrapper: RunContextWrapper[UserContext]) -> List[JobListing]:
     """Search for jobs using the RAG system based on skills, location, work type, and involvement."""
-    # CRITICAL FIX: 'await' is required here because find_jobs_with_rag is an async function
-    return await find_jobs_with_rag(
+    jobs = []
+    # Listings arrive one by one; streaming callers can show each before the agent replies
+    async for job in stream_jobs_with_rag(
         skills=wrapper.context.current_skills,
         location=wrapper.context.preferred_location,
         involvement=wrapper.context.involvement,
         work_type=wrapper.context.work_type
-    )
+    ):
+        emit("job", job=job.model_dump())
+        jobs.append(job)
+    return jobs
 
-# Dummy course recommendation (only this part is not RAG-based)
-course_data = {
-    "SQL": [
-        "SQL Basics - Coursera",
-        "Advanced SQL - Udemy",
-        "SQL for Data Science - edX"
-    ],
-    "Pandas": [
-        "Pandas for Data Analysis - Datacamp",
-        "Data Manipulation with Pandas - Coursera"
-    ],
-    "Statistics": [
-        "Intro to Stats - Khan Academy",
-        "Statistics with R - Coursera"
-    ],
-    "Machine Learning": [
-        "ML Crash Course - Google",
-        "Machine Learning A-Z - Udemy",
-        "Deep Learning Specialization - Coursera"
-    ],
-    ".NET": [
-        "C# Basics for Beginners - Udemy",
-        "ASP.NET Core Fundamentals - Pluralsight",
-        "Building Web Applications with ASP.NET - Coursera"
-    ],
-    "Java": [
-        "Java Programming Masterclass - Udemy",
-        "Java Fundamentals - Pluralsight",
-        "Object Oriented Programming in Java - Coursera"
-    ],
-    "C": [
-        "C Programming For Beginners - Udemy",
-        "Introduction to Programming in C - Coursera",
-        "C Fundamentals - Pluralsight"
-    ],
-    "C#": [
-        "C# Intermediate Programming - Udemy",
-        "Learn C# Fundamentals - Microsoft Learn",
-        "Advanced C# Programming - Pluralsight"
-    ],
-    "Unity": [
-        "Unity Game Development Fundamentals - Coursera",
-        "Create with Code - Unity Learn",
-        "Introduction to Unity - Udemy"
+# Courses come from the catalog file (see rag_tools/course_catalog.py)
+def course_recommendations(missing_skills: List[str]) -> List[CourseRecommendation]:
+    catalog = get_course_catalog()
+    found = catalog.lookup_many(missing_skills)
+    return [
+        CourseRecommendation(
+            skill=skill,
+            matched_skill=catalog.matched_skill(skill),
+            courses=[course.label() for course in courses] or ["No courses found"]
+        )
+        for skill, courses in found.items()
     ]
-}
 
 @function_tool
 def recommend_courses(missing_skills: List[str]) -> List[CourseRecommendation]:
     """Recommend online courses for the user's missing skills."""
-    recommendations = []
-    for skill in missing_skills:
-        courses = course_data.get(skill, ["No courses found"])
-        recommendations.append(CourseRecommendation(skill=skill, courses=courses))
-    return recommendations
+    return course_recommendations(missing_skills)
+
+def current_plan(user_context: UserContext) -> Optional[CareerPlan]:
+    """The context's career plan, if it was computed from the current PLAN_INPUTS."""
+    plan = user_context.career_plan
+    if plan is not None and all(getattr(plan, f) == getattr(user_context, f) for f in PLAN_INPUTS):
+        return plan
+    return None
+
+async def build_career_plan(user_context: UserContext) -> CareerPlan:
+    """
+    Skill gap, matching jobs and courses from the context in one go. The skill
+    and job branches run concurrently, and the queries of those that miss their
+    answer cache are retrieved in one batch, so the plan takes about as long as
+    the slower branch instead of a chain of agent hops.
+    """
+    ctx = user_context
+    plan = current_plan(ctx)
+    if plan is not None:
+        return plan
+
+    with span("career_plan") as attrs:
+        title = ctx.target_job
+        prefs = (ctx.preferred_location, ctx.involvement, ctx.work_type)
+        # A gap computed earlier in the session, else known titles from the skill index, then the answer caches
+        gap = known_skill_gap(ctx)
+        required = lookup_required_skills(title) if title and gap is None else []
+        lookups = {"jobs": cached_jobs(ctx.current_skills, title, *prefs)}
+        if required is None:
+            lookups["skills"] = cached_required_skills(title)
+        cached = dict(zip(lookups, await asyncio.gather(*lookups.values())))
+        if cached.get("skills") is not None:
+            required = cached["skills"].missing_skills
+
+        # One retrieval pass for the branches that still need RAG
+        queries, filters = [], []
+        if required is None:
+            queries.append(skills_query(title))
+            filters.append(None)
+        if cached["jobs"] is None:
+            queries.append(jobs_query(ctx.current_skills, title))
+            filters.append(job_filters(*prefs))
+        docs = await get_hybrid_retriever().aretrieve_batch(queries, filters)
+
+        async def skills_branch() -> List[str]:
+            if gap is not None:
+                return gap
+            skills = required
+            if skills is None:
+                skills = (await get_required_skills_with_rag(title, docs=docs[0])).missing_skills
+            return missing_from(skills, ctx.current_skills)
+
+        async def jobs_branch() -> List[JobListing]:
+            jobs = cached["jobs"]
+            if jobs is None:
+                jobs = [job async for job in stream_jobs_with_rag(ctx.current_skills, title, *prefs, docs=docs[-1])]
+            for job in jobs:
+                emit("job", job=job.model_dump())
+            return jobs
+
+        missing_skills, jobs = await asyncio.gather(skills_branch(), jobs_branch())
+        plan = CareerPlan(
+            **{f: copy.deepcopy(getattr(ctx, f)) for f in PLAN_INPUTS},
+            missing_skills=missing_skills,
+            jobs=jobs,
+            courses=course_recommendations(missing_skills),   # in-memory catalog
+        )
+        attrs.update(retrieved=len(queries), missing=len(missing_skills), jobs=len(jobs))
+    ctx.missing_skills = missing_skills
+    ctx.skill_gap_for = skill_gap_key(ctx)
+    ctx.career_plan = plan
+    return plan
+
+@function_tool
+async def get_career_plan(wrapper: RunContextWrapper[UserContext]) -> CareerPlan:
+    """Missing skills for the target job, matching jobs and courses for the missing skills, in one call."""
+    return await build_career_plan(wrapper.context)
+
+def render_courses(recommendations: List[CourseRecommendation]) -> str:
+    """The course list as a chat answer, for the router's no-LLM path."""
+    lines = ["Here are some courses that can help you build these skills:"]
+    for rec in recommendations:
+        matched = f" ({rec.matched_skill})" if rec.matched_skill and rec.matched_skill != rec.skill else ""
+        lines.append(f"\n**{rec.skill}**{matched}")
+        if rec.courses == ["No courses found"]:
+            lines.append("- Sorry, I don't have course recommendations for this skill yet.")
+        else:
+            lines.extend(f"- {course}" for course in rec.courses)
+    return "\n".join(lines)
 
 # ----------------------------- AGENTS -----------------------------
 
@@ -210,6 +343,36 @@ skill_gap_agent = Agent[UserContext](
     handoffs=[course_recommender_agent, job_finder_agent] 
 )
 
+def career_plan_instructions(wrapper: RunContextWrapper[UserContext], agent: Agent[UserContext]) -> str:
+    instructions = """
+    You present a complete career plan: the skills the user is missing for their target job,
+    matching job openings, and online courses for the missing skills.
+
+    - Start with a short summary of where the user stands for their target job.
+    - List the missing skills, then the jobs (numbered: Title, Company, Location and a brief description),
+      then the courses as bullet points under each skill.
+    - If there are no jobs or no missing skills, say so politely and suggest a next step.
+    - End with one or two concrete next steps.
+
+    Format your final response as a complete message, not raw data.
+    """
+    plan = current_plan(wrapper.context)
+    if plan is not None:
+        # Computed by the router's fast path: render it without another tool round-trip
+        return instructions + "\nThe plan is already computed; do not call any tool. Plan (JSON):\n" + plan.model_dump_json()
+    return instructions + "\nUse the `get_career_plan` tool to compute the plan."
+
+career_plan_agent = Agent[UserContext](
+    name="Career Plan Specialist",
+    handoff_description="Specialist agent for a complete plan: missing skills, matching jobs and courses at once",
+    instructions=career_plan_instructions,
+    tools=[get_career_plan],
+    model=OpenAIChatCompletionsModel(model=MODEL_NAME, openai_client=client),
+    output_type=str
+)
+# For plans the router already computed: no tools, so rendering is exactly one LLM call
+career_plan_renderer = career_plan_agent.clone(tools=[])
+
 conversation_agent = Agent[UserContext](
     name="Conversation Agent",
     instructions="""
@@ -218,24 +381,233 @@ conversation_agent = Agent[UserContext](
     - Skill Gap Agent: For job-related goals, or if asked what skills are required for a specific job.
     - Job Finder Agent: For requests to find jobs based on user's skills and preferences.
     - Course Recommender Agent: For requests for learning resources or courses.
+    - Career Plan Agent: For a complete plan covering missing skills, matching jobs and courses together.
     
     If a query doesn't fit a specific tool, handle it directly. For example, you can have a general conversation about computer science and technology.
     """,
     model=OpenAIChatCompletionsModel(model=MODEL_NAME, openai_client=client),
-    handoffs=[skill_gap_agent, job_finder_agent, course_recommender_agent]
+    handoffs=[skill_gap_agent, job_finder_agent, course_recommender_agent, career_plan_agent]
 )
 
 # ----------------------------- MAIN -----------------------------
 
+class TurnMetrics(RunHooks[UserContext]):
+    """Agent-side instrumentation for one turn: model calls, tool calls and handoffs."""
+
+    def __init__(self):
+        self.handoffs = 0
+        self.llm_calls = 0
+        self._llm = {}
+        self._tools = {}
+
+    async def on_llm_start(self, context, agent, system_prompt, input_items) -> None:
+        self._llm[agent.name] = start_span("llm.agent", agent=agent.name)
+
+    async def on_llm_end(self, context, agent, response) -> None:
+        self.llm_calls += 1
+        usage = getattr(response, "usage", None)
+        if not getattr(usage, "total_tokens", 0):   # provider did not report usage
+            usage = None
+        prompt_tokens = getattr(usage, "input_tokens", None)
+        completion_tokens = getattr(usage, "output_tokens", None)
+        seconds = end_span(self._llm.pop(agent.name, None), prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        record_llm_call("agents", agent.name, seconds, prompt_tokens, completion_tokens)
+
+    async def on_tool_start(self, context, agent, tool) -> None:
+        self._tools.setdefault(tool.name, []).append(start_span(f"tool.{tool.name}", agent=agent.name))
+
+    async def on_tool_end(self, context, agent, tool, result) -> None:
+        calls = self._tools.get(tool.name)
+        end_span(calls.pop() if calls else None)
+        incr("agent_tool_calls_total", agent=agent.name, tool=tool.name)
+
+    async def on_handoff(self, context, from_agent, to_agent) -> None:
+        self.handoffs += 1
+        incr("agent_handoffs_total", source=from_agent.name, target=to_agent.name)
+
+    def finish(self, intent: str) -> None:
+        observe("agent_handoffs_per_turn", self.handoffs, COUNT_BUCKETS, intent=intent)
+        observe("agent_llm_calls_per_turn", self.llm_calls, COUNT_BUCKETS, intent=intent)
+
+async def route_turn(query: str, user_context: UserContext) -> Tuple[Agent, Optional[str], str]:
+    """
+    Pick where a turn starts. Confident intents skip the LLM router: skill gap and
+    job search go straight to their specialist, course requests naming known
+    skills are answered without any LLM call, and career plans are computed here
+    and only rendered by their agent. Returns (agent, direct answer, intent).
+    """
+    with span("turn.route"):
+        match = await classify_intent(query)
+    if match is None or not match.confident:
+        incr("intent_route_total", intent=match.intent if match else "disabled", route="llm")
+        return conversation_agent, None, match.intent if match else "unknown"
+
+    incr("intent_route_total", intent=match.intent, route="fast")
+    if match.intent == "courses":
+        skills = [s for s in extract_skills(query) if get_course_catalog().resolve(s)] or user_context.missing_skills
+        if skills:
+            return course_recommender_agent, render_courses(course_recommendations(skills)), match.intent
+        return course_recommender_agent, None, match.intent
+    if match.intent == "find_jobs":
+        return job_finder_agent, None, match.intent
+    if match.intent == "career_plan":
+        # All branches run here, concurrently; the agent then only renders the plan (one LLM call)
+        await build_career_plan(user_context)
+        return career_plan_renderer, None, match.intent
+    return skill_gap_agent, None, match.intent
+
+@asynccontextmanager
+async def user_session(user_id: str, **updates) -> AsyncIterator[Tuple[UserContext, Optional[Session]]]:
+    """
+    The user's stored context with `updates` (profile fields from the request)
+    applied, and their conversation session; both are saved when the block exits.
+    With SESSIONS=false every turn starts from a fresh context and no history.
+    """
+    if not SESSIONS:
+        yield UserContext(user_id=user_id, **updates), None
+        return
+    async with get_session_store().session(user_id) as session:
+        user_context = context_from_dict({**session.context, **updates, "user_id": user_id})
+        yield user_context, session
+        session.context = context_to_dict(user_context)
+
+def turn_input(query: str, session: Optional[Session]):
+    """The query, preceded by the session's summary and recent turns."""
+    if session is None:
+        return query
+    return session.history() + [{"role": "user", "content": query}]
+
+async def run_turn(query: str, user_context: UserContext, session: Optional[Session] = None) -> str:
+    """Run one user turn through the agent graph. Shared by the CLI and serve.py."""
+    with span("turn", streamed=False) as attrs:
+        agent, answer, intent = await route_turn(query, user_context)
+        attrs["intent"] = intent
+        if answer is None:
+            hooks = TurnMetrics()
+            try:
+                result = await Runner.run(agent, turn_input(query, session), context=user_context, hooks=hooks)
+            finally:
+                hooks.finish(intent)
+            attrs.update(handoffs=hooks.handoffs, llm_calls=hooks.llm_calls)
+            answer = result.final_output
+    if session is not None:
+        session.add_turn(query, answer)
+    return answer
+
+_STREAM_DONE = object()
+
+def _agent_event(event, agent_name: str) -> Optional[dict]:
+    """Translate an Agents SDK stream event into a plain dict (None = not interesting)."""
+    if event.type == "raw_response_event":
+        delta = getattr(event.data, "delta", None)
+        if getattr(event.data, "type", "") == "response.output_text.delta" and delta:
+            return {"type": "token", "agent": agent_name, "text": delta}
+    elif event.type == "agent_updated_stream_event":
+        return {"type": "agent", "agent": event.new_agent.name}
+    elif event.type == "run_item_stream_event":
+        item = event.item
+        if event.name == "tool_called":
+            return {"type": "tool_call", "agent": agent_name, "tool": getattr(item.raw_item, "name", None)}
+        if event.name == "tool_output":
+            return {"type": "tool_output", "agent": agent_name, "output": str(item.output)}
+        if event.name == "handoff_occured":
+            return {"type": "handoff", "from": item.source_agent.name, "to": item.target_agent.name}
+    return None
+
+async def stream_turn(query: str, user_context: UserContext, session: Optional[Session] = None) -> AsyncIterator[dict]:
+    """
+    Run one user turn and yield events as they happen: `route` (where the turn
+    started, see route_turn), then `agent`, `handoff`, `tool_call`, `tool_output`
+    and `token` from the agent run, `job` and `rag_token` from inside the RAG
+    tools, then one `final` event with the output.
+    """
+    # Not a context-manager span: the consumer may resume this generator from another context
+    turn_span = start_span("turn", streamed=True)
+    agent, answer, intent = await route_turn(query, user_context)
+    yield {"type": "route", "intent": intent, "agent": agent.name, "llm_router": agent is conversation_agent}
+    if answer is not None:
+        end_span(turn_span, intent=intent)
+        if session is not None:
+            session.add_turn(query, answer)
+        yield {"type": "final", "agent": agent.name, "output": answer}
+        return
+
+    queue: asyncio.Queue = asyncio.Queue()
+    hooks = TurnMetrics()
+    # The runner task is created here and inherits the sink, so do this before leaving the block
+    with event_sink(queue.put_nowait):
+        result = Runner.run_streamed(agent, turn_input(query, session), context=user_context, hooks=hooks)
+
+    async def pump():
+        agent_name = agent.name
+        try:
+            async for event in result.stream_events():
+                if event.type == "agent_updated_stream_event":
+                    agent_name = event.new_agent.name
+                translated = _agent_event(event, agent_name)
+                if translated:
+                    queue.put_nowait(translated)
+        except Exception as e:
+            queue.put_nowait(e)
+        finally:
+            queue.put_nowait(_STREAM_DONE)
+
+    pump_task = asyncio.create_task(pump())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _STREAM_DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        if not pump_task.done():  # consumer stopped early or timed out
+            result.cancel()
+            pump_task.cancel()
+        hooks.finish(intent)
+        end_span(turn_span, intent=intent, handoffs=hooks.handoffs, llm_calls=hooks.llm_calls)
+    if session is not None:
+        session.add_turn(query, result.final_output)
+    yield {"type": "final", "agent": result.last_agent.name, "output": result.final_output}
+
+async def print_stream(query: str, user_context: UserContext, session: Optional[Session] = None) -> None:
+    """CLI renderer for `stream_turn`: tokens inline, tool activity on its own lines."""
+    at_line_start = True
+    streamed = False
+    async for event in stream_turn(query, user_context, session):
+        kind = event["type"]
+        if kind == "token":
+            streamed = True
+            if at_line_start:
+                print("CareerMate: ", end="", flush=True)
+            print(event["text"], end="", flush=True)
+            at_line_start = False
+            continue
+        if not at_line_start:
+            print()
+            at_line_start = True
+        if kind == "handoff":
+            print(f"  ↪ {event['from']} → {event['to']}")
+        elif kind == "tool_call":
+            print(f"  🔧 {event['tool']}...")
+        elif kind == "job":
+            job = event["job"]
+            print(f"  • {job['title']} at {job['company']} ({job['location']})")
+        elif kind == "final" and not streamed:  # answered by the router, or no text deltas
+            print(f"CareerMate: {event['output'] or '(no answer)'}")
+
 async def main():
-    user_context = UserContext(
-        user_id="user456",
+    user_id = "user456"
+    profile = dict(
         current_skills=["Python", "SQL", "Machine Learning"],
         target_job="Data Analyst",
         preferred_location="Delhi",
         involvement="full-time",
         work_type="remote"
     )
+    if SESSIONS and "--new-session" in sys.argv:
+        await get_session_store().reset(user_id)
 
     queries = [
         #"I want to be a Game Developer",
@@ -247,12 +619,30 @@ async def main():
 
     for query in queries:
         print(f"User: {query}")
-        try:
-            result = await Runner.run(conversation_agent, query, context=user_context)
-            print(f"CareerMate: {result.final_output}")
-        except InputGuardrailTripwireTriggered:
-            print("CareerMate: ⚠️ GUARDRAIL TRIGGERED ⚠️")
+        # Earlier turns, the computed skill gap and plan come from the user's session
+        async with user_session(user_id, **profile) as (user_context, session):
+            try:
+                if "--no-stream" in sys.argv:
+                    output = await run_turn(query, user_context, session)
+                    print(f"CareerMate: {output}")
+                else:
+                    await print_stream(query, user_context, session)
+            except InputGuardrailTripwireTriggered:
+                print("CareerMate: ⚠️ GUARDRAIL TRIGGERED ⚠️")
         print("-" * 60) # Use a simple separator
+    await drain_sessions()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    # --warmup: load models and indexes up front; --startup-report: print where startup time went;
+    # --no-stream: print the answer only once the whole agent run has finished;
+    # --new-session: forget the stored conversation and context of the CLI user first;
+    # --metrics: print the collected stage/LLM/cache metrics at the end
+    configure_tracing()
+    if "--warmup" in sys.argv:
+        warmup()
+    asyncio.run(main())
+    if "--startup-report" in sys.argv:
+        print(startup_report())
+    if "--metrics" in sys.argv:
+        from rag_tools.metrics import render_prometheus
+        print(render_prometheus())
\ No newline at end of file
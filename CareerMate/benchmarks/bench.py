@@ -0,0 +1,349 @@
+# benchmarks/bench.py
+#
+# Offline benchmark suite. Starts the mock LLM (benchmarks/mock_llm.py) in-process,
+# points BASE_URL at it and drives the retriever, the RAG tools and the agent flow
+# with N concurrent sessions. Run from the CareerMate folder after building the index:
+#
+#   python -m benchmarks.bench
+#   python -m benchmarks.bench --scenarios retriever,jobs --concurrency 16 --requests 200
+#   python -m benchmarks.bench --workers 4                      # memory per pre-forked worker
+#   python -m benchmarks.bench --json results.json --baseline baseline.json   # exit 1 on regression
+#
+# Reports p50/p95/p99 latency, throughput, process memory (RSS/PSS) and recall@k
+# against a labeled query set generated from IT_jobs.csv: a query is a posting's
+# title plus skills from its description, and every posting with the same
+# normalized title is relevant.
+
+import os
+import gc
+import sys
+import json
+import time
+import zlib
+import random
+import asyncio
+import argparse
+import tempfile
+import itertools
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+SCENARIOS = ("retriever", "jobs", "skills", "plan", "agent", "turn", "session")
+DEFAULT_SCENARIOS = ("retriever", "jobs", "skills", "agent")
+
+# ---------------- Environment ----------------
+
+def configure_env(base_url: str, with_cache: bool) -> None:
+    """Must run before rag_tools / CareerMate are imported: they read these at import time."""
+    os.environ["BASE_URL"] = base_url
+    os.environ.setdefault("API_KEY", "mock")
+    os.environ.setdefault("MODEL_NAME", "mock")
+    os.environ.setdefault("OPENAI_AGENTS_DISABLE_TRACING", "1")
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("SESSION_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="careermate-bench-"), "sessions.db"))
+    if not with_cache:
+        os.environ["ANSWER_CACHE_TTL"] = "0"   # every call does the full work
+
+
+def memory_mb() -> Dict[str, float]:
+    """RSS, peak RSS and PSS (shared pages split between the processes mapping them)."""
+    stats = {}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    stats["rss_mb" if line.startswith("VmRSS") else "peak_rss_mb"] = int(line.split()[1]) / 1024
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    stats["pss_mb"] = int(line.split()[1]) / 1024
+    except OSError:
+        import resource
+        stats["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {k: round(v, 1) for k, v in stats.items()}
+
+# ---------------- Query set ----------------
+
+def build_query_set(csv_path: str = "IT_jobs.csv", n: int = 100, seed: int = 0) -> List[dict]:
+    import pandas as pd
+    from rag_tools.ingest import keyed_postings
+    from rag_tools.skill_index import extract_skills, normalize_title
+
+    postings = keyed_postings(pd.read_csv(csv_path))
+    by_title = defaultdict(list)
+    for key, row in postings.items():
+        by_title[normalize_title(row["designation"])].append(key)
+
+    keys = sorted(postings)
+    queries = []
+    for key in random.Random(seed).sample(keys, min(n, len(keys))):
+        row = postings[key]
+        skills = extract_skills(str(row["job_details"]))[:4]
+        queries.append({
+            "query": " ".join([row["designation"], *skills]),
+            "title": row["designation"],
+            "skills": skills or ["Python"],
+            "posting_id": key,
+            "relevant": by_title[normalize_title(row["designation"])],
+        })
+    return queries
+
+
+def recall_at_k(retriever, queries: List[dict], k: int) -> Dict[str, float]:
+    """
+    recall@k: share of relevant postings (capped at k) among the first k distinct
+    postings retrieved; hit@k: how often the query's own posting is among them.
+    """
+    recalls, hits = [], []
+    for q in queries:
+        postings = []
+        for doc in retriever.invoke(q["query"]):
+            pid = doc.metadata.get("posting_id")
+            if pid not in postings:
+                postings.append(pid)
+        top = set(postings[:k])
+        relevant = set(q["relevant"])
+        recalls.append(len(top & relevant) / min(k, len(relevant)))
+        hits.append(q["posting_id"] in top)
+    return {f"recall@{k}": round(float(np.mean(recalls)), 4), f"hit@{k}": round(float(np.mean(hits)), 4)}
+
+# ---------------- Scenarios ----------------
+
+def scenario_calls() -> Dict[str, Callable[[dict], Awaitable]]:
+    from agents import Runner
+    from rag_tools.setup_vectorstore import get_hybrid_retriever
+    from rag_tools.rag_jobs import find_jobs_with_rag
+    from rag_tools.rag_skills import get_required_skills_with_rag
+    import CareerMate as app
+
+    prompts = ["Find me a job.", "What skills do I need to become a {title}?", "How do I learn {skill}?"]
+
+    def agent_input(q: dict):
+        prompt = prompts[zlib.crc32(q["posting_id"].encode()) % len(prompts)].format(title=q["title"], skill=q["skills"][0])
+        context = app.UserContext(user_id=q["posting_id"], current_skills=q["skills"][:2], target_job=q["title"])
+        return prompt, context
+
+    async def agent(q):
+        prompt, context = agent_input(q)
+        return await Runner.run(app.conversation_agent, prompt, context=context)
+
+    async def turn(q):
+        return await app.run_turn(*agent_input(q))
+
+    async def plan(q):
+        # Skill gap, jobs and courses fanned out, without the rendering LLM call
+        return await app.build_career_plan(agent_input(q)[1])
+
+    async def session(q):
+        # Turns of a few long conversations: history is compacted, so latency should not grow with --requests
+        prompt, context = agent_input(q)
+        profile = {"current_skills": context.current_skills, "target_job": context.target_job}
+        async with app.user_session(f"bench-{zlib.crc32(q['posting_id'].encode()) % 16}", **profile) as (user_context, conversation):
+            return await app.run_turn(prompt, user_context, conversation)
+
+    return {
+        "retriever": lambda q: get_hybrid_retriever().ainvoke(q["query"]),
+        "jobs": lambda q: find_jobs_with_rag(skills=q["skills"], job_title=q["title"]),
+        "skills": lambda q: get_required_skills_with_rag(q["title"]),
+        "plan": plan,
+        "agent": agent,
+        "turn": turn,
+        "session": session,
+    }
+
+
+async def run_load(call: Callable[[dict], Awaitable], queries: List[dict], concurrency: int, requests: int) -> dict:
+    """`concurrency` sessions issue `requests` calls in total, back to back."""
+    latencies: List[float] = []
+    errors: Dict[str, int] = defaultdict(int)
+    counter = itertools.count()
+
+    async def session():
+        while True:
+            i = next(counter)
+            if i >= requests:
+                return
+            start = time.perf_counter()
+            try:
+                await call(queries[i % len(queries)])
+            except Exception as e:
+                errors[type(e).__name__] += 1
+            else:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+
+    ms = np.asarray(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": dict(errors),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "mean_ms": round(float(ms.mean()), 2),
+        "throughput_rps": round(len(latencies) / wall, 2),
+    }
+
+
+async def run_scenarios(names: List[str], queries: List[dict], concurrency: int, requests: int) -> Dict[str, dict]:
+    calls = scenario_calls()
+    results = {}
+    for name in names:
+        for q in queries[:2]:  # untimed: first-call costs are reported by the startup report
+            await calls[name](q)
+        results[name] = await run_load(calls[name], queries, concurrency, requests)
+        results[name]["memory"] = memory_mb()
+        print(f"  {name:<10} p50 {results[name]['p50_ms']:>9.1f} ms   p95 {results[name]['p95_ms']:>9.1f} ms   "
+              f"p99 {results[name]['p99_ms']:>9.1f} ms   {results[name]['throughput_rps']:>8.1f} req/s"
+              + (f"   errors {results[name]['errors']}" if results[name]["errors"] else ""))
+    return results
+
+# ---------------- Pre-forked workers ----------------
+
+def run_workers(n: int, names: List[str], queries: List[dict], concurrency: int, requests: int) -> List[dict]:
+    """
+    Load once, fork `n` workers (like serve.py) and run the scenarios in each at
+    the same time. Each worker reports its own latencies and memory; PSS is the
+    per-worker cost once shared index pages are split between workers.
+    """
+    from rag_tools.startup import warmup
+    from rag_tools.setup_vectorstore import get_retrieval_executor
+
+    warmup(probe=False)
+    gc.collect()
+    gc.freeze()
+
+    children = []
+    for _ in range(n):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            code = 0
+            try:
+                if get_retrieval_executor.loaded():
+                    get_retrieval_executor.reset()
+                warmup(probe=True)
+                report = {"pid": os.getpid(), "memory_after_warmup": memory_mb(),
+                          "scenarios": asyncio.run(run_scenarios(names, queries, concurrency, requests))}
+            except BaseException as e:
+                report, code = {"pid": os.getpid(), "error": repr(e)}, 1
+            with os.fdopen(write_fd, "w") as out:
+                json.dump(report, out)
+            os._exit(code)
+        os.close(write_fd)
+        children.append((pid, read_fd))
+
+    reports = []
+    for pid, read_fd in children:
+        with os.fdopen(read_fd) as f:
+            data = f.read()
+        os.waitpid(pid, 0)
+        reports.append(json.loads(data) if data else {"pid": pid, "error": "no report"})
+    return reports
+
+# ---------------- Regression check ----------------
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Human-readable regressions of `results` against a previous run."""
+    problems = []
+    for name, current in results.get("scenarios", {}).items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        for metric in ("p95_ms", "p99_ms"):
+            if before[metric] and current[metric] > before[metric] * (1 + tolerance):
+                problems.append(f"{name} {metric}: {before[metric]} -> {current[metric]}")
+        if before["throughput_rps"] and current["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            problems.append(f"{name} throughput_rps: {before['throughput_rps']} -> {current['throughput_rps']}")
+        if current["errors"] and not before["errors"]:
+            problems.append(f"{name} errors: {current['errors']}")
+    same_queries = all(
+        results["config"].get(key) == baseline.get("config", {}).get(key) for key in ("csv", "queries", "k")
+    )
+    for metric, value in results.get("quality", {}).items() if same_queries else ():
+        before = baseline.get("quality", {}).get(metric)
+        if before is not None and value < before - 0.02:
+            problems.append(f"{metric}: {before} -> {value}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline CareerMate benchmarks against a mock LLM.")
+    parser.add_argument("--scenarios", default=",".join(DEFAULT_SCENARIOS), help=f"Comma-separated, from {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent sessions")
+    parser.add_argument("--requests", type=int, default=100, help="Calls per scenario")
+    parser.add_argument("--queries", type=int, default=100, help="Size of the labeled query set")
+    parser.add_argument("--k", type=int, default=5, help="k for recall@k / hit@k")
+    parser.add_argument("--csv", default="IT_jobs.csv")
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock LLM time to first token (s)")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="Mock LLM delay per streamed chunk (s)")
+    parser.add_argument("--base-url", help="Use this OpenAI-compatible server instead of the built-in mock")
+    parser.add_argument("--with-cache", action="store_true", help="Keep the answer caches on")
+    parser.add_argument("--workers", type=int, default=0, help="Also run in N pre-forked workers and report memory per worker")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--baseline", help="Previous --json output; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown against the baseline")
+    args = parser.parse_args()
+
+    names = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    if args.base_url:
+        base_url = args.base_url
+    else:
+        from benchmarks.mock_llm import MockSettings, start_mock_server
+        server = start_mock_server(settings=MockSettings(args.latency, args.token_delay))
+        base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    configure_env(base_url, args.with_cache)
+
+    from rag_tools.startup import warmup, startup_report
+    from rag_tools.setup_vectorstore import get_hybrid_retriever
+
+    queries = build_query_set(args.csv, args.queries)
+    results = {"config": vars(args), "started_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+    if args.workers:
+        print(f"Running {names} in {args.workers} pre-forked workers...")
+        results["workers"] = run_workers(args.workers, names, queries, args.concurrency, args.requests)
+        for report in results["workers"]:
+            print(f"  worker {report['pid']}: {report.get('memory_after_warmup') or report.get('error')}")
+    else:
+        warmup()
+        results["memory_after_warmup"] = memory_mb()
+        results["startup"] = startup_report()
+        print(results["startup"])
+
+        results["quality"] = recall_at_k(get_hybrid_retriever(), queries, args.k)
+        print(f"Retrieval quality over {len(queries)} queries: {results['quality']}")
+
+        print(f"Load: {args.requests} calls per scenario, {args.concurrency} concurrent sessions, "
+              f"mock latency {args.latency}s" if not args.base_url else f"LLM at {base_url}")
+        results["scenarios"] = asyncio.run(run_scenarios(names, queries, args.concurrency, args.requests))
+        results["memory"] = memory_mb()
+        print(f"Memory: {results['memory']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            problems = compare(results, json.load(f), args.tolerance)
+        if problems:
+            print("❌ Regressions against baseline:")
+            for problem in problems:
+                print(f"  - {problem}")
+            sys.exit(1)
+        print("✅ No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+# benchmarks/mock_llm.py
+#
+# Offline OpenAI-compatible chat completions server for benchmarks.
+# Point BASE_URL at it (http://127.0.0.1:8999/v1); answers are deterministic and
+# shaped like what CareerMate's agents and RAG chains expect:
+#   - requests with tools: call the tool that best matches the user's words
+#     (handoffs included), with arguments generated from the tool's JSON schema
+#   - the jobs prompt: a {"jobs": [...]} answer built from the postings in the context
+#   - the skills prompt: a bullet list of skills found in the context
+#   - anything else: a short text answer
+# Latency is simulated per request (time to first token) and per streamed chunk.
+#
+#   python -m benchmarks.mock_llm --port 8999 --latency 0.3 --token-delay 0.01
+
+import re
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import List, Optional, Tuple
+
+CHUNK_CHARS = 16   # characters per streamed delta
+
+# Words in the user's message that point at a tool (or handoff) name
+TOOL_HINTS = {
+    "job": ("job", "jobs", "opening", "openings", "hiring", "work", "position"),
+    "skill": ("skill", "skills", "become", "missing", "requirements", "need", "qualify"),
+    "course": ("course", "courses", "learn", "study", "tutorial", "resources"),
+}
+
+
+class MockSettings:
+    def __init__(self, latency: float = 0.2, token_delay: float = 0.005, jitter: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def first_token_delay(self) -> float:
+        with self.lock:
+            self.requests += 1
+            return max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+
+# ---------------- Answers ----------------
+
+def _text(content) -> str:
+    if isinstance(content, list):  # content parts
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def _example(schema: dict):
+    """Smallest value that satisfies a JSON schema fragment."""
+    kind = schema.get("type")
+    if "anyOf" in schema:
+        return _example(schema["anyOf"][0])
+    if kind == "array":
+        return [_example(schema.get("items", {"type": "string"}))]
+    if kind == "object":
+        props = schema.get("properties", {})
+        return {name: _example(props[name]) for name in schema.get("required", props)}
+    if kind in ("integer", "number"):
+        return 1
+    if kind == "boolean":
+        return True
+    return "SQL"
+
+
+def pick_tool(tools: List[dict], user_text: str, exclude_handoffs: bool) -> dict:
+    words = set(re.findall(r"[a-z]+", user_text.lower()))
+    candidates = [t for t in tools if not (exclude_handoffs and t["function"]["name"].startswith("transfer_to_"))] or tools
+
+    def score(tool):
+        name = tool["function"]["name"].lower()
+        return sum(len(words & set(hints)) for key, hints in TOOL_HINTS.items() if key in name)
+
+    return max(candidates, key=score)
+
+
+def decide(body: dict) -> Tuple[str, object]:
+    """("tool", (name, arguments)) or ("text", content) for a chat completions request."""
+    messages = body.get("messages", [])
+    tools = body.get("tools") or []
+    last = messages[-1] if messages else {}
+    user_text = next((_text(m.get("content")) for m in reversed(messages) if m.get("role") == "user"), "")
+
+    last_call = None
+    for m in messages:
+        for call in m.get("tool_calls") or []:
+            last_call = call["function"]["name"]
+    after_handoff = last.get("role") == "tool" and (last_call or "").startswith("transfer_to_")
+
+    if tools and (last.get("role") == "user" or after_handoff):
+        tool = pick_tool(tools, user_text, exclude_handoffs=after_handoff)
+        args = _example(tool["function"].get("parameters") or {"type": "object", "properties": {}})
+        return "tool", (tool["function"]["name"], json.dumps(args))
+
+    system = " ".join(_text(m.get("content")) for m in messages if m.get("role") == "system")
+    if '"jobs"' in system:
+        return "text", json.dumps({"jobs": jobs_from_context(system)})
+    if "bullet-point list of skills" in system:
+        return "text", "\n".join(f"- {s}" for s in skills_from_context(system)) or "- Communication"
+    if last.get("role") == "tool":
+        return "text", "Here is what I found for you:\n" + _text(last.get("content"))[:400]
+    return "text", "CareerMate here. I can help with skills, jobs and courses."
+
+
+def jobs_from_context(text: str, limit: int = 3) -> List[dict]:
+    jobs = []
+    for block in re.split(r"(?=Job Title:)", text):
+        title = re.search(r"Job Title:\s*(.+)", block)
+        if not title:
+            continue
+        location = re.search(r"Location:\s*(.+)", block)
+        description = re.search(r"Job Description:\s*(.+)", block)
+        jobs.append({
+            "title": title.group(1).strip(),
+            "company": "Not specified",
+            "location": location.group(1).strip() if location else "Not specified",
+            "requirements": skills_from_context(block)[:5] or ["Not specified"],
+            "description": (description.group(1).strip() if description else "")[:200],
+            "contact": None,
+        })
+        if len(jobs) >= limit:
+            break
+    return jobs
+
+
+def skills_from_context(text: str) -> List[str]:
+    try:
+        from rag_tools.skill_index import extract_skills
+    except ImportError:
+        return []
+    return extract_skills(text)[:10]
+
+# ---------------- HTTP ----------------
+
+def _completion_id() -> str:
+    return "chatcmpl-" + uuid.uuid4().hex[:12]
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    settings: MockSettings = MockSettings()
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status: int, payload: dict) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._json(200, {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "benchmarks"}]})
+        else:
+            self._json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._json(404, {"error": {"message": f"{self.path} is not mocked"}})
+            return
+
+        kind, value = decide(body)
+        time.sleep(self.settings.first_token_delay())
+        base = {"id": _completion_id(), "created": int(time.time()), "model": body.get("model", "mock")}
+        usage = {"prompt_tokens": 100, "completion_tokens": 20, "total_tokens": 120}
+        tool_call = None
+        if kind == "tool":
+            name, arguments = value
+            tool_call = {"id": "call_" + uuid.uuid4().hex[:12], "type": "function",
+                         "function": {"name": name, "arguments": arguments}}
+
+        if not body.get("stream"):
+            message = {"role": "assistant", "content": None if tool_call else value}
+            if tool_call:
+                message["tool_calls"] = [tool_call]
+            self._json(200, {**base, "object": "chat.completion", "usage": usage, "choices": [
+                {"index": 0, "message": message, "finish_reason": "tool_calls" if tool_call else "stop"}
+            ]})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def send(choices: list, extra: Optional[dict] = None) -> None:
+            chunk = {**base, "object": "chat.completion.chunk", "choices": choices, **(extra or {})}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        if tool_call:
+            send([{"index": 0, "delta": {"role": "assistant", "tool_calls": [{"index": 0, **tool_call}]}, "finish_reason": None}])
+            send([{"index": 0, "delta": {}, "finish_reason": "tool_calls"}])
+        else:
+            send([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+            for i in range(0, len(value), CHUNK_CHARS):
+                time.sleep(self.settings.token_delay)
+                send([{"index": 0, "delta": {"content": value[i:i + CHUNK_CHARS]}, "finish_reason": None}])
+            send([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if (body.get("stream_options") or {}).get("include_usage"):
+            send([], {"usage": usage})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def start_mock_server(host: str = "127.0.0.1", port: int = 0, settings: Optional[MockSettings] = None) -> ThreadingHTTPServer:
+    """Run the mock in a daemon thread; `server.server_address` has the bound port."""
+    handler = type("Handler", (MockHandler,), {"settings": settings or MockSettings()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible server for offline benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8999)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="Seconds between streamed chunks")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform +/- jitter on --latency")
+    args = parser.parse_args()
+
+    handler = type("Handler", (MockHandler,), {"settings": MockSettings(args.latency, args.token_delay, args.jitter)})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"Mock LLM listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
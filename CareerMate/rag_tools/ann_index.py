@@ -0,0 +1,275 @@
+# rag_tools/ann_index.py
+
+import os
+import json
+import time
+import argparse
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+# Dense index backends for the chunk vectors (L2 metric, row i == store row i):
+#   flat    exact scan; the default, fine up to a few hundred thousand chunks
+#   ivfpq   inverted lists + product quantization: small and fast, approximate;
+#           the retriever re-scores the top `refine` x k with the stored vectors
+#   hnsw    graph search over full vectors: fast and accurate, larger in memory
+# Build parameters and search defaults are saved next to the index in
+# index_params.json. Compare backends on the live store with
+#     python -m rag_tools.ann_index --eval
+# and switch without re-embedding with
+#     python -m rag_tools.ann_index --build hnsw
+
+ANN_INDEX = os.getenv("ANN_INDEX", "flat")
+PARAMS_FILE = "index_params.json"
+KINDS = ("flat", "ivfpq", "hnsw")
+
+# Search-time overrides of the saved defaults
+ANN_NPROBE = os.getenv("ANN_NPROBE")
+ANN_EF_SEARCH = os.getenv("ANN_EF_SEARCH")
+ANN_REFINE = os.getenv("ANN_REFINE")
+
+# PQ codebooks need 256+ training points and IVF ~39 per list; small corpora stay flat
+MIN_IVFPQ_VECTORS = 1000
+# IVF-PQ trains on a sample of at most this many vectors; vectors are added in blocks,
+# so a memory-mapped store is never copied into RAM whole
+MAX_TRAIN_VECTORS = 200_000
+ADD_BLOCK = 65_536
+
+
+def default_params(kind: str, n: int, dim: int) -> dict:
+    if kind == "ivfpq":
+        nlist = int(np.clip(4 * np.sqrt(n), 16, max(16, n // 39)))
+        m = next(m for m in (48, 32, 24, 16, 12, 8, 4, 2, 1) if dim % m == 0)
+        return {"build": {"nlist": nlist, "m": m, "nbits": 8}, "search": {"nprobe": 16, "refine": 4}}
+    if kind == "hnsw":
+        return {"build": {"M": 32, "efConstruction": 80}, "search": {"efSearch": 64}}
+    return {"build": {}, "search": {}}
+
+# ---------------- Build ----------------
+
+def build_index(vectors: np.ndarray, kind: str = ANN_INDEX, params: Optional[dict] = None) -> Tuple[faiss.Index, dict]:
+    """
+    Index `vectors` (rows in order, an array or a memory-mapped store matrix) with
+    the given backend. Returns (index, params).
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown ANN_INDEX {kind!r}; use one of {', '.join(KINDS)}")
+    n, dim = vectors.shape
+    if kind == "ivfpq" and n < MIN_IVFPQ_VECTORS:
+        print(f"⚠️ {n} vectors are too few to train IVF-PQ, using a flat index.")
+        kind = "flat"
+
+    params = params or default_params(kind, n, dim)
+    build = params["build"]
+    start = time.perf_counter()
+    if kind == "ivfpq":
+        quantizer = faiss.IndexFlatL2(dim)
+        index = faiss.IndexIVFPQ(quantizer, dim, build["nlist"], build["m"], build["nbits"])
+        index.train(_training_sample(vectors))
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, build["M"])
+        index.hnsw.efConstruction = build["efConstruction"]
+    else:
+        index = faiss.IndexFlatL2(dim)
+    for block in range(0, n, ADD_BLOCK):
+        index.add(np.ascontiguousarray(vectors[block:block + ADD_BLOCK], dtype=np.float32))
+
+    params = {
+        "kind": kind,
+        "metric": "l2",
+        "dim": dim,
+        "ntotal": int(index.ntotal),
+        "build": build,
+        "search": params["search"],
+        "build_seconds": round(time.perf_counter() - start, 3),
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    apply_search_params(index, params)
+    return index, params
+
+
+def _training_sample(vectors: np.ndarray, seed: int = 0) -> np.ndarray:
+    n = len(vectors)
+    if n <= MAX_TRAIN_VECTORS:
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+    rows = np.sort(np.random.default_rng(seed).choice(n, size=MAX_TRAIN_VECTORS, replace=False))
+    return np.ascontiguousarray(vectors[rows], dtype=np.float32)
+
+
+def index_kind(index: faiss.Index) -> str:
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivfpq"
+    return "flat"
+
+
+def remove_rows(index: faiss.Index, params: dict, rows: np.ndarray, vectors: np.ndarray) -> faiss.Index:
+    """
+    Drop `rows` so the remaining ones are renumbered 0..n-1, like the chunk store.
+    A flat index compacts in place; IVF keeps its original ids and HNSW cannot
+    remove at all, so those are refilled from `vectors`, the store's surviving
+    rows (IVF keeps its trained centroids and codebooks).
+    """
+    kind = index_kind(index)
+    if kind == "flat":
+        index.remove_ids(np.asarray(rows, dtype=np.int64))
+        return index
+    if kind == "ivfpq":
+        index.reset()
+        index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+        return index
+    rebuilt, _ = build_index(vectors, "hnsw", params)
+    return rebuilt
+
+# ---------------- Save / load ----------------
+
+def save_index(index: faiss.Index, params: dict, index_dir: str) -> None:
+    os.makedirs(index_dir, exist_ok=True)
+    index_file = os.path.join(index_dir, "index.faiss")
+    faiss.write_index(index, index_file + ".tmp")
+    os.replace(index_file + ".tmp", index_file)
+    params = {**params, "ntotal": int(index.ntotal)}
+    with open(os.path.join(index_dir, PARAMS_FILE + ".tmp"), "w", encoding="utf-8") as f:
+        json.dump(params, f, indent=2)
+    os.replace(os.path.join(index_dir, PARAMS_FILE + ".tmp"), os.path.join(index_dir, PARAMS_FILE))
+
+
+def load_params(index_dir: str) -> dict:
+    """Saved parameters; indexes built before index_params.json existed are flat."""
+    path = os.path.join(index_dir, PARAMS_FILE)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"kind": "flat", "metric": "l2", "build": {}, "search": {}}
+
+
+def apply_search_params(index: faiss.Index, params: dict) -> dict:
+    """Set nprobe / efSearch on the index (env overrides win); returns the effective values."""
+    search = dict(params.get("search", {}))
+    if ANN_NPROBE:
+        search["nprobe"] = int(ANN_NPROBE)
+    if ANN_EF_SEARCH:
+        search["efSearch"] = int(ANN_EF_SEARCH)
+    if ANN_REFINE:
+        search["refine"] = int(ANN_REFINE)
+    kind = index_kind(index)
+    if kind == "ivfpq" and "nprobe" in search:
+        faiss.extract_index_ivf(index).nprobe = search["nprobe"]
+    elif kind == "hnsw" and "efSearch" in search:
+        index.hnsw.efSearch = search["efSearch"]
+    params["search"] = search
+    return search
+
+
+def search_parameters(index: faiss.Index, selector=None) -> faiss.SearchParameters:
+    """Per-call parameters of the right type for `index`, e.g. to restrict to an IDSelector."""
+    kind = index_kind(index)
+    if kind == "ivfpq":
+        return faiss.SearchParametersIVF(sel=selector, nprobe=faiss.extract_index_ivf(index).nprobe)
+    if kind == "hnsw":
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+    return faiss.SearchParameters(sel=selector)
+
+# ---------------- Evaluation ----------------
+
+def refine_exact(vectors: np.ndarray, queries: np.ndarray, candidates: np.ndarray, k: int) -> np.ndarray:
+    """Re-rank ANN candidates by exact L2 distance against the stored vectors."""
+    out = np.full((len(queries), k), -1, dtype=np.int64)
+    for i, (query, rows) in enumerate(zip(queries, candidates)):
+        rows = rows[rows >= 0]
+        distances = ((np.asarray(vectors[rows]) - query) ** 2).sum(axis=1)
+        best = rows[np.argsort(distances)[:k]]
+        out[i, :len(best)] = best
+    return out
+
+
+def _timed_search(index, queries: np.ndarray, k: int) -> Tuple[np.ndarray, List[float]]:
+    results, latencies = [], []
+    for query in queries:  # one query at a time, like a request
+        start = time.perf_counter()
+        _, rows = index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - start)
+        results.append(rows[0])
+    return np.asarray(results), latencies
+
+
+def evaluate(vectors: np.ndarray, kinds=KINDS, k: int = 20, n_queries: int = 200, seed: int = 0) -> List[dict]:
+    """
+    Recall@k against exact search and single-query latency for each backend and
+    search setting. Queries are stored vectors with a little noise, so they
+    resemble real queries without needing the embedder.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)]
+    queries = queries + rng.normal(0, 0.02, queries.shape).astype(np.float32)
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, k)
+
+    settings = {
+        "flat": [{}],
+        "ivfpq": [{"nprobe": p, "refine": r} for p in (4, 8, 16, 32, 64) for r in (1, 4)],
+        "hnsw": [{"efSearch": ef} for ef in (16, 32, 64, 128, 256)],
+    }
+    report = []
+    for kind in kinds:
+        index, params = build_index(vectors, kind)
+        size_mb = len(faiss.serialize_index(index)) / 2 ** 20
+        for setting in settings[params["kind"]]:
+            params["search"] = dict(setting)
+            apply_search_params(index, params)
+            refine = setting.get("refine", 1)
+            found, latencies = _timed_search(index, queries, k * refine)
+            if refine > 1:
+                start = time.perf_counter()
+                found = refine_exact(vectors, queries, found, k)
+                latencies = [t + (time.perf_counter() - start) / len(queries) for t in latencies]
+            recall = np.mean([len(set(f[f >= 0]) & set(t)) / len(t) for f, t in zip(found, truth)])
+            ms = np.asarray(latencies) * 1000
+            report.append({
+                "kind": params["kind"], **setting,
+                f"recall@{k}": round(float(recall), 4),
+                "p50_ms": round(float(np.percentile(ms, 50)), 3),
+                "p95_ms": round(float(np.percentile(ms, 95)), 3),
+                "build_s": params["build_seconds"],
+                "size_mb": round(size_mb, 1),
+            })
+    return report
+
+
+def main():
+    from rag_tools.chunk_store import ChunkStore
+    from rag_tools.ingest import STORE_PATH, INDEX_PATH
+
+    parser = argparse.ArgumentParser(description="Build or compare dense index backends for the chunk store.")
+    parser.add_argument("--eval", action="store_true", help="Report recall@k vs latency for each backend")
+    parser.add_argument("--build", choices=KINDS, help="Rebuild the saved index with this backend from the stored vectors")
+    parser.add_argument("--kinds", default=",".join(KINDS))
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--json", help="Write the --eval report to this file")
+    args = parser.parse_args()
+
+    store = ChunkStore(STORE_PATH)
+    vectors = np.asarray(store.vectors, dtype=np.float32)
+    if args.build:
+        index, params = build_index(vectors, args.build)
+        save_index(index, {**params, "generation": store.generation}, INDEX_PATH)   # same rows as the store
+        print(f"✅ {params['kind']} index over {index.ntotal} vectors saved to {INDEX_PATH} ({params['build_seconds']}s)")
+    if args.eval:
+        report = evaluate(vectors, [k.strip() for k in args.kinds.split(",")], args.k, args.queries)
+        columns = list(dict.fromkeys(key for row in report for key in row))
+        print(" | ".join(f"{c:>10}" for c in columns))
+        for row in report:
+            print(" | ".join(f"{str(row.get(c, '')):>10}" for c in columns))
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
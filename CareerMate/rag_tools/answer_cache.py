@@ -0,0 +1,150 @@
+# rag_tools/answer_cache.py
+
+import os
+import re
+import copy
+import asyncio
+import threading
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from cachetools import TTLCache
+
+from rag_tools.metrics import incr
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(6 * 3600)))   # seconds
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.92"))
+
+
+def current_corpus_version() -> int:
+    # Imported here: the ingest module pulls in pandas and the text splitter
+    from rag_tools.ingest import corpus_version
+    return corpus_version()
+
+
+def normalize_query(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    text = re.sub(r"[^\w\s#+.]", " ", text.lower())
+    return " ".join(text.replace(". ", " ").split()).strip(" .")
+
+
+class AnswerCache:
+    """
+    Two-tier cache for RAG answers, scoped to the corpus version.
+
+    - Exact tier: normalized query -> answer.
+    - Semantic tier: the query embedding is compared with cached queries of the
+      same namespace; a cosine similarity above `similarity_threshold` is a hit.
+
+    Both tiers evict by LRU once `maxsize` is reached and expire entries after
+    `ttl` seconds. When the ingest manifest reports a new corpus version the
+    whole cache is dropped. Values are deep-copied in and out. Lookups are
+    counted in `answer_cache_lookups_total{cache=name, result=...}`.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = ANSWER_CACHE_SIZE,
+        ttl: float = ANSWER_CACHE_TTL,
+        embed_fn: Optional[Callable[[str], List[float]]] = None,
+        similarity_threshold: float = ANSWER_CACHE_SIMILARITY,
+        executor: Optional[Executor] = None,
+        version_fn: Callable[[], Any] = current_corpus_version,
+        name: str = "answers"
+    ):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.embed_fn = embed_fn
+        self.similarity_threshold = similarity_threshold
+        self.executor = executor
+        self.version_fn = version_fn
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+        self._version = None
+        self.invalidate()
+
+    # ---------------- Housekeeping ----------------
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._exact = TTLCache(self.maxsize, self.ttl)
+            self._semantic: Dict[str, TTLCache] = {}
+            self._vectors = TTLCache(self.maxsize, self.ttl)
+
+    def _check_version(self) -> None:
+        version = self.version_fn()
+        if version != self._version:
+            self.invalidate()
+            self._version = version
+
+    def hit_rate(self) -> float:
+        total = sum(self.stats.values())
+        return (self.stats["exact_hits"] + self.stats["semantic_hits"]) / total if total else 0.0
+
+    # ---------------- Lookup ----------------
+
+    def _embed(self, query: str) -> np.ndarray:
+        vector = self._vectors.get(query)
+        if vector is None:
+            vector = np.asarray(self.embed_fn(query), dtype=np.float32)
+            vector /= (np.linalg.norm(vector) or 1.0)
+        return vector
+
+    def _lookup(self, namespace: str, query: str, vector: Optional[np.ndarray]) -> Optional[Any]:
+        with self._lock:
+            value = self._exact.get((namespace, query))
+            if value is not None:
+                self.stats["exact_hits"] += 1
+                incr("answer_cache_lookups_total", cache=self.name, result="exact_hit")
+                return copy.deepcopy(value)
+
+            entries = self._semantic.get(namespace)
+            if vector is not None:
+                self._vectors[query] = vector
+                if entries:
+                    keys = list(entries.keys())
+                    matrix = np.stack([entries[k][0] for k in keys])
+                    similarities = matrix @ vector
+                    best = int(np.argmax(similarities))
+                    if similarities[best] >= self.similarity_threshold:
+                        self.stats["semantic_hits"] += 1
+                        incr("answer_cache_lookups_total", cache=self.name, result="semantic_hit")
+                        return copy.deepcopy(entries[keys[best]][1])
+
+            self.stats["misses"] += 1
+            incr("answer_cache_lookups_total", cache=self.name, result="miss")
+            return None
+
+    def get(self, namespace: str, query: str, semantic: bool = False) -> Optional[Any]:
+        self._check_version()
+        query = normalize_query(query)
+        vector = self._embed(query) if semantic and self.embed_fn else None
+        return self._lookup(namespace, query, vector)
+
+    async def aget(self, namespace: str, query: str, semantic: bool = False) -> Optional[Any]:
+        """Like `get`, but the query embedding runs on the executor, off the event loop."""
+        self._check_version()
+        query = normalize_query(query)
+        vector = None
+        if semantic and self.embed_fn:
+            if (namespace, query) in self._exact:
+                return self._lookup(namespace, query, None)
+            vector = await asyncio.get_running_loop().run_in_executor(self.executor, self._embed, query)
+        return self._lookup(namespace, query, vector)
+
+    # ---------------- Store ----------------
+
+    def put(self, namespace: str, query: str, value: Any, semantic: bool = False) -> None:
+        query = normalize_query(query)
+        value = copy.deepcopy(value)
+        vector = None
+        if semantic and self.embed_fn:
+            vector = self._embed(query)  # usually already computed by the preceding miss
+        with self._lock:
+            self._exact[(namespace, query)] = value
+            if vector is not None:
+                entries = self._semantic.setdefault(namespace, TTLCache(self.maxsize, self.ttl))
+                entries[query] = (vector, value)
@@ -0,0 +1,67 @@
+# rag_tools/batching.py
+
+import asyncio
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, List, Sequence
+
+
+class MicroBatcher:
+    """
+    Collects items submitted from coroutines within a short window and processes
+    them with a single `batch_fn(items)` call on a bounded executor, so that
+    CPU-bound work (embedding, FAISS search) neither blocks the event loop nor
+    runs once per concurrent caller.
+
+    `batch_fn` must return one result per item, in order.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], Sequence[Any]],
+        executor: Executor,
+        window: float = 0.005,
+        max_batch: int = 32
+    ):
+        self.batch_fn = batch_fn
+        self.executor = executor
+        self.window = window
+        self.max_batch = max_batch
+        # Pending work is kept per event loop; futures cannot cross loops
+        self._pending: Dict[asyncio.AbstractEventLoop, list] = {}
+        self._timers: Dict[asyncio.AbstractEventLoop, asyncio.TimerHandle] = {}
+
+    async def submit(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(loop, [])
+        pending.append((item, future))
+
+        if len(pending) >= self.max_batch:
+            self._flush(loop)
+        elif loop not in self._timers:
+            self._timers[loop] = loop.call_later(self.window, self._flush, loop)
+        return await future
+
+    def _flush(self, loop: asyncio.AbstractEventLoop) -> None:
+        timer = self._timers.pop(loop, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(loop, [])
+        if not batch:
+            return
+
+        items = [item for item, _ in batch]
+        work = loop.run_in_executor(self.executor, self.batch_fn, items)
+        work.add_done_callback(lambda done: self._resolve(batch, done))
+
+    @staticmethod
+    def _resolve(batch: list, done: asyncio.Future) -> None:
+        error = done.exception()
+        results = None if error else done.result()
+        for i, (_, future) in enumerate(batch):
+            if future.done():  # caller was cancelled or timed out
+                continue
+            if error:
+                future.set_exception(error)
+            else:
+                future.set_result(results[i])
@@ -0,0 +1,105 @@
+# rag_tools/bm25_index.py
+
+from collections import Counter
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+class SparseBM25:
+    """
+    Okapi BM25 over a precomputed CSR term-document matrix.
+
+    Row `t` of the matrix holds the final BM25 weight of term `t` in every chunk
+    it occurs in (IDF and length normalization already applied), so scoring a
+    query only touches the postings of its terms instead of the whole corpus.
+    Scores match `rank_bm25.BM25Okapi` with the same k1/b/epsilon.
+    """
+
+    def __init__(self, corpus: Iterable[List[str]], k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+
+        vocab = {}
+        doc_ids, term_ids, tfs = [], [], []
+        doc_len = []
+        for doc_id, tokens in enumerate(corpus):
+            doc_len.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                term_id = vocab.setdefault(term, len(vocab))
+                doc_ids.append(doc_id)
+                term_ids.append(term_id)
+                tfs.append(tf)
+
+        self.vocab = vocab
+        self.n_docs = len(doc_len)
+        doc_len = np.asarray(doc_len, dtype=np.float32)
+        doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        term_ids = np.asarray(term_ids, dtype=np.int32)
+        tfs = np.asarray(tfs, dtype=np.float32)
+
+        # Document frequency and IDF, with BM25Okapi's epsilon floor for very common terms
+        df = np.bincount(term_ids, minlength=len(vocab)).astype(np.float32)
+        idf = np.log(self.n_docs - df + 0.5) - np.log(df + 0.5)
+        if len(idf):
+            floor = self.epsilon * float(idf.mean())
+            idf[idf < 0] = floor
+        self.idf = idf
+
+        avgdl = float(doc_len.mean()) if self.n_docs else 0.0
+        norm = self.k1 * (1 - self.b + self.b * doc_len / max(avgdl, 1e-9))
+        weights = idf[term_ids] * tfs * (self.k1 + 1) / (tfs + norm[doc_ids])
+
+        # CSR layout: terms are rows, postings (doc ids) are the column indices
+        order = np.lexsort((doc_ids, term_ids))
+        self.indices = doc_ids[order]
+        self.data = weights[order].astype(np.float32)
+        self.indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        self.indptr[1:] = np.cumsum(df.astype(np.int64))
+
+    def __len__(self) -> int:
+        return self.n_docs
+
+    def _postings(self, query_tokens: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Concatenated (doc id, weight) postings of the query terms, weighted by query term count."""
+        rows, counts = [], []
+        for term, count in Counter(query_tokens).items():
+            term_id = self.vocab.get(term)
+            if term_id is not None:
+                rows.append(term_id)
+                counts.append(count)
+        if not rows:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+
+        starts = self.indptr[rows]
+        ends = self.indptr[np.asarray(rows) + 1]
+        docs = np.concatenate([self.indices[s:e] for s, e in zip(starts, ends)])
+        weights = np.concatenate([self.data[s:e] * c for s, e, c in zip(starts, ends, counts)])
+        return docs, weights
+
+    def get_scores(self, query_tokens: List[str]) -> np.ndarray:
+        """Dense score vector over all chunks (sparse matrix-vector product)."""
+        docs, weights = self._postings(query_tokens)
+        return np.bincount(docs, weights=weights, minlength=self.n_docs).astype(np.float32)
+
+    def top_k(self, query_tokens: List[str], k: int, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Indices and scores of the `k` best chunks, best first. Only chunks that
+        contain at least one query term (and are set in the boolean `mask`, if
+        given) are candidates.
+        """
+        docs, weights = self._postings(query_tokens)
+        if mask is not None and len(docs):
+            keep = mask[docs]
+            docs, weights = docs[keep], weights[keep]
+        if not len(docs):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        candidates, inverse = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights).astype(np.float32)
+        if len(candidates) > k:
+            part = np.argpartition(-scores, k - 1)[:k]
+            candidates, scores = candidates[part], scores[part]
+        order = np.argsort(-scores, kind="stable")
+        return candidates[order].astype(np.int64), scores[order]
@@ -0,0 +1,209 @@
+# rag_tools/build_corpus.py
+
+import os
+import time
+import shutil
+import argparse
+import resource
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from rag_tools.ann_index import ANN_INDEX, KINDS, build_index
+from rag_tools.chunk_store import ChunkStore, ChunkStoreWriter
+from rag_tools.skill_index import build_skill_index
+from rag_tools.ingest import (
+    CSV_PATH, INDEX_PATH, STORE_PATH,
+    _embed, _new_manifest, commit_build, load_manifest, new_generation, posting_hash, split_postings,
+)
+
+# Streaming, parallel full rebuild for large feeds (CSV or Parquet):
+#   1. the feed is read BUILD_BATCH_ROWS rows at a time, never as one frame
+#   2. a process pool splits and embeds each batch (one embedder per worker) and
+#      writes it as a shard, a small chunk store under <store>.shards/
+#   3. shards are appended to the new chunk store in feed order as they finish,
+#      then deleted; at most 2 x workers batches are in flight
+#   4. the ANN index is built from the memory-mapped store vectors in blocks, and
+#      store, index and manifest are swapped in together (ingest.commit_build)
+#   5. the skill index is rebuilt for the new corpus version (a second pass over the feed)
+# Peak memory is the batches in flight plus the workers' models, whatever the
+# feed size; only the posting keys (manifest) and the index itself grow with it.
+# Produces the same store, index and manifest as `python -m rag_tools.ingest --full`:
+#     python -m rag_tools.build_corpus --feed jobs.parquet --workers 4
+
+BUILD_BATCH_ROWS = int(os.getenv("BUILD_BATCH_ROWS", "2000"))
+BUILD_WORKERS = int(os.getenv("BUILD_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# ---------------- Reading the feed ----------------
+
+def iter_feed(path: str, batch_rows: int = BUILD_BATCH_ROWS) -> Iterator[pd.DataFrame]:
+    """The feed as DataFrames of at most `batch_rows` rows (Parquet needs pyarrow)."""
+    if path.endswith((".parquet", ".pq")):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=batch_rows)
+
+
+def iter_postings(path: str, batch_rows: int = BUILD_BATCH_ROWS) -> Iterator[Tuple[str, dict]]:
+    """(posting key, row) for every row, keyed like `ingest.keyed_postings` without loading the feed."""
+    seen: Dict[str, int] = {}
+    for df in iter_feed(path, batch_rows):
+        for row in df.to_dict("records"):
+            digest = posting_hash(row)
+            n = seen.get(digest, 0)
+            seen[digest] = n + 1
+            yield f"{digest}-{n}", row
+
+
+def _batches(postings: Iterator[Tuple[str, dict]], size: int) -> Iterator[List[Tuple[str, dict]]]:
+    batch = []
+    for item in postings:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# ---------------- Workers ----------------
+
+def _init_worker(threads: int) -> None:
+    # Split the cores between workers instead of every model using all of them
+    os.environ.setdefault("ONNX_THREADS", str(threads))
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def _build_shard(shard_dir: str, postings: List[Tuple[str, dict]]) -> Tuple[str, Dict[str, List[str]]]:
+    """Split and embed one batch into a shard store; returns its path and chunk ids per posting."""
+    from rag_tools.setup_vectorstore import get_embedder  # loaded once per worker process
+
+    chunks = split_postings(dict(postings))
+    vectors = _embed(get_embedder(), chunks)
+    writer = ChunkStoreWriter(shard_dir, dim=vectors.shape[1])
+    writer.add_documents(chunks, vectors)
+    writer.close()
+
+    chunk_ids: Dict[str, List[str]] = {}
+    for chunk in chunks:
+        chunk_ids.setdefault(chunk.metadata["posting_id"], []).append(chunk.metadata["chunk_id"])
+    return shard_dir, chunk_ids
+
+# ---------------- Merge ----------------
+
+class ShardMerger:
+    """Appends finished shards to the chunk store in feed order, whatever order they finish in."""
+
+    def __init__(self, store_path: str, progress, generation: Optional[str] = None):
+        self.store_path = store_path
+        self.progress = progress
+        self.generation = generation
+        self.writer: Optional[ChunkStoreWriter] = None
+        self.chunk_ids: Dict[str, List[str]] = {}
+        self.postings = 0
+        self._next = 0
+        self._ready: Dict[int, Tuple[str, Dict[str, List[str]]]] = {}
+
+    def add(self, seq: int, result: Tuple[str, Dict[str, List[str]]]) -> None:
+        self._ready[seq] = result
+        while self._next in self._ready:
+            shard_dir, chunk_ids = self._ready.pop(self._next)
+            shard = ChunkStore(shard_dir)
+            if self.writer is None:
+                self.writer = ChunkStoreWriter(self.store_path, dim=shard.dim, generation=self.generation)
+            self.writer.append_store(shard)
+            del shard
+            shutil.rmtree(shard_dir, ignore_errors=True)
+
+            self.chunk_ids.update(chunk_ids)
+            self.postings += len(chunk_ids)
+            self.progress.update(len(chunk_ids))
+            self.progress.set_postfix(chunks=self.writer.count, refresh=False)
+            self._next += 1
+
+    def close(self) -> ChunkStore:
+        """The finished store, still at the writer's staging path."""
+        if self.writer is None:
+            raise ValueError("The feed has no postings")
+        return self.writer.close(swap=False)
+
+
+def _peak_rss_mb() -> Tuple[float, float]:
+    """Peak RSS of this process and of the largest finished worker (Linux reports KiB)."""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    workers = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return round(own, 1), round(workers, 1)
+
+# ---------------- Build ----------------
+
+def build_corpus(
+    feed: str = CSV_PATH,
+    workers: int = BUILD_WORKERS,
+    batch_rows: int = BUILD_BATCH_ROWS,
+    kind: str = ANN_INDEX,
+    store_path: str = STORE_PATH,
+    index_path: str = INDEX_PATH
+) -> dict:
+    """Rebuild the chunk store, ANN index, ingest manifest and skill index from `feed`; returns the manifest."""
+    from tqdm import tqdm
+
+    workers = max(1, workers)
+    shard_root = store_path + ".shards"
+    shutil.rmtree(shard_root, ignore_errors=True)
+    os.makedirs(shard_root)
+
+    start = time.perf_counter()
+    progress = tqdm(desc="Embedding", unit=" postings", smoothing=0.1)
+    generation = new_generation()
+    merger = ShardMerger(store_path, progress, generation)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(threads,)) as pool:
+            pending = {}
+            for seq, batch in enumerate(_batches(iter_postings(feed, batch_rows), batch_rows)):
+                future = pool.submit(_build_shard, os.path.join(shard_root, f"{seq:06d}"), batch)
+                pending[future] = seq
+                while len(pending) >= 2 * workers:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        merger.add(pending.pop(future), future.result())
+            for future in list(pending):
+                merger.add(pending.pop(future), future.result())
+        store = merger.close()
+    finally:
+        progress.close()
+        shutil.rmtree(shard_root, ignore_errors=True)
+    embed_seconds = time.perf_counter() - start
+    print(f"✅ {store.count} chunks from {merger.postings} postings embedded "
+          f"({merger.postings / embed_seconds:.0f} postings/s, {store.count / embed_seconds:.0f} chunks/s)")
+
+    index, params = build_index(store.vectors, kind)
+    manifest = _new_manifest(load_manifest(), merger.chunk_ids, feed, generation)
+    commit_build(merger.writer, index, params, manifest, store_path, index_path)
+    print(f"✅ Chunk store saved to {store_path}, {params['kind']} index over {index.ntotal} vectors "
+          f"saved to {index_path} ({params['build_seconds']}s)")
+    build_skill_index(iter_postings(feed, batch_rows))
+    own_mb, worker_mb = _peak_rss_mb()
+    print(f"✅ Corpus version {manifest['version']} built in {time.perf_counter() - start:.1f}s "
+          f"(peak RSS {own_mb} MB, largest worker {worker_mb} MB)")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the RAG corpus from a large feed in bounded memory.")
+    parser.add_argument("--feed", default=CSV_PATH, help="Job feed, .csv or .parquet")
+    parser.add_argument("--workers", type=int, default=BUILD_WORKERS, help="Split/embed processes")
+    parser.add_argument("--batch-rows", type=int, default=BUILD_BATCH_ROWS, help="Postings per shard")
+    parser.add_argument("--index", choices=KINDS, default=ANN_INDEX, help="ANN backend")
+    args = parser.parse_args()
+    build_corpus(args.feed, args.workers, args.batch_rows, args.index)
+
+
+if __name__ == "__main__":
+    main()
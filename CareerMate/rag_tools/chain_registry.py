@@ -0,0 +1,110 @@
+# rag_tools/chain_registry.py
+
+import time
+import threading
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from langchain_core.runnables import Runnable
+
+# Compiled RAG chains, one per (prompt, retriever, llm, output parser), built once per process.
+
+@dataclass
+class ChainEntry:
+    name: str
+    prompt: object
+    retriever: object
+    llm: object
+    output_parser: object
+    chain: "Runnable"
+    document_chain: "Runnable"
+    build_seconds: float
+    uses: int = 0
+    built_at: float = field(default_factory=time.time)
+
+
+_chains: Dict[Tuple[int, int, int, int], ChainEntry] = {}
+_lock = threading.Lock()
+
+
+def _get_entry(llm, prompt, retriever, name: Optional[str], output_parser=None) -> ChainEntry:
+    key = (id(prompt), id(retriever), id(llm), id(output_parser))
+    entry = _chains.get(key)
+    if entry is None:
+        with _lock:
+            entry = _chains.get(key)
+            if entry is None:
+                from langchain.chains.combine_documents import create_stuff_documents_chain
+                from langchain.chains.retrieval import create_retrieval_chain
+
+                start = time.perf_counter()
+                if output_parser is None:
+                    document_chain = create_stuff_documents_chain(llm, prompt)
+                else:
+                    document_chain = create_stuff_documents_chain(llm, prompt, output_parser=output_parser)
+                chain = create_retrieval_chain(retriever, document_chain)
+                entry = ChainEntry(
+                    name=name or f"chain-{len(_chains)}",
+                    prompt=prompt,
+                    retriever=retriever,
+                    llm=llm,
+                    output_parser=output_parser,
+                    chain=chain,
+                    document_chain=document_chain,
+                    build_seconds=time.perf_counter() - start,
+                )
+                _chains[key] = entry
+    entry.uses += 1
+    return entry
+
+
+def get_rag_chain(llm, prompt, retriever, name: Optional[str] = None, output_parser=None) -> "Runnable":
+    """
+    Return the retrieval chain for these components, building it on first request.
+    The entry keeps references to its components, so the id-based key stays valid.
+    `output_parser` defaults to plain text.
+    """
+    return _get_entry(llm, prompt, retriever, name, output_parser).chain
+
+
+def get_document_chain(llm, prompt, retriever, name: Optional[str] = None, output_parser=None) -> "Runnable":
+    """
+    The "stuff documents" half of the same entry, for callers that retrieve
+    themselves (e.g. with metadata filters) and pass `{"input", "context"}`.
+    """
+    return _get_entry(llm, prompt, retriever, name, output_parser).document_chain
+
+
+def warmup(probe_query: str = "Data Analyst") -> None:
+    """
+    Touch every registered chain once: resolve input schemas and run one
+    retrieval so indexes and models are paged in before the first user request.
+    """
+    for entry in list(_chains.values()):
+        entry.chain.get_input_schema()
+        entry.chain.get_output_schema()
+        entry.retriever.invoke(probe_query)
+
+
+def describe_chains() -> List[dict]:
+    """Introspection: what is registered, what it is built from, and how often it was reused."""
+    return [
+        {
+            "name": entry.name,
+            "prompt_variables": list(getattr(entry.prompt, "input_variables", [])),
+            "retriever": type(entry.retriever).__name__,
+            "llm": getattr(entry.llm, "model_name", type(entry.llm).__name__),
+            "output_parser": type(entry.output_parser).__name__ if entry.output_parser else "StrOutputParser",
+            "build_ms": round(entry.build_seconds * 1000, 2),
+            "uses": entry.uses,
+            "built_at": entry.built_at,
+        }
+        for entry in _chains.values()
+    ]
+
+
+def clear() -> None:
+    """Drop all compiled chains (e.g. after swapping the retriever or LLM)."""
+    with _lock:
+        _chains.clear()
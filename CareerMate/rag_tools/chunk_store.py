@@ -0,0 +1,213 @@
+# rag_tools/chunk_store.py
+
+import os
+import mmap
+import json
+import shutil
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_community.docstore.base import Docstore
+
+# Columnar, memory-mapped chunk store shared by the FAISS docstore and BM25.
+#
+# Layout of a store directory (row i == FAISS position i):
+#   text.bin / text.idx    UTF-8 chunk texts, int64 offsets (n + 1)
+#   meta.bin / meta.idx    JSON metadata per chunk, int64 offsets (n + 1)
+#   vectors.f32            float32 embeddings, shape (n, dim)
+#   store.json             {"count", "dim", "format", "generation"}
+#
+# Every worker maps the same files, so the page cache holds one copy, and a
+# `Document` is only built for rows that are actually returned.
+
+STORE_FORMAT = 1
+
+
+def swap_dir(staged: str, path: str) -> None:
+    """Move a finished directory into place; readers that already mapped the old files keep working."""
+    old = path + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old)
+    os.replace(staged, path)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def _map(path: str) -> Optional[mmap.mmap]:
+    if os.path.getsize(path) == 0:
+        return None
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class ChunkStore:
+    """Read-only view over a store directory."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "store.json"), "r", encoding="utf-8") as f:
+            info = json.load(f)
+        self.count = info["count"]
+        self.dim = info["dim"]
+        self.generation = info.get("generation")   # build id shared with the index and manifest (see ingest.py)
+
+        self._text = _map(os.path.join(path, "text.bin"))
+        self._meta = _map(os.path.join(path, "meta.bin"))
+        self._text_idx = np.memmap(os.path.join(path, "text.idx"), dtype=np.int64, mode="r", shape=(self.count + 1,))
+        self._meta_idx = np.memmap(os.path.join(path, "meta.idx"), dtype=np.int64, mode="r", shape=(self.count + 1,))
+        self.vectors = (
+            np.memmap(os.path.join(path, "vectors.f32"), dtype=np.float32, mode="r", shape=(self.count, self.dim))
+            if self.count else np.empty((0, self.dim), dtype=np.float32)
+        )
+
+    def __len__(self) -> int:
+        return self.count
+
+    def text(self, row: int) -> str:
+        start, end = self._text_idx[row], self._text_idx[row + 1]
+        return self._text[start:end].decode("utf-8")
+
+    def metadata(self, row: int) -> dict:
+        start, end = self._meta_idx[row], self._meta_idx[row + 1]
+        return json.loads(self._meta[start:end])
+
+    def document(self, row: int) -> Document:
+        return Document(page_content=self.text(row), metadata=self.metadata(row))
+
+    def documents(self, rows: Iterable[int]) -> List[Document]:
+        return [self.document(int(row)) for row in rows]
+
+    def iter_texts(self) -> Iterator[str]:
+        for row in range(self.count):
+            yield self.text(row)
+
+    def iter_metadata(self) -> Iterator[dict]:
+        for row in range(self.count):
+            yield self.metadata(row)
+
+
+class ChunkStoreWriter:
+    """
+    Streaming writer: rows are appended to files in a staging directory, which
+    replaces the target directory on `close()`. Memory use does not grow with the corpus.
+    """
+
+    def __init__(self, path: str, dim: int, generation: Optional[str] = None):
+        self.path = path
+        self.dim = dim
+        self.generation = generation
+        self.count = 0
+        self.staging_path = path + ".tmp"
+        shutil.rmtree(self.staging_path, ignore_errors=True)
+        os.makedirs(self.staging_path)
+        self._files = {
+            name: open(os.path.join(self.staging_path, name), "wb")
+            for name in ("text.bin", "text.idx", "meta.bin", "meta.idx", "vectors.f32")
+        }
+        self._text_pos = 0
+        self._meta_pos = 0
+        self._files["text.idx"].write(np.int64(0).tobytes())
+        self._files["meta.idx"].write(np.int64(0).tobytes())
+
+    def add(self, text: str, metadata: dict, vector) -> None:
+        self.add_many([text], [metadata], np.asarray([vector], dtype=np.float32))
+
+    def add_many(self, texts: List[str], metadatas: List[dict], vectors: np.ndarray) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(texts), self.dim)
+        text_offsets, meta_offsets = [], []
+        for text, meta in zip(texts, metadatas):
+            text_bytes = text.encode("utf-8")
+            meta_bytes = json.dumps(meta, ensure_ascii=False, default=str).encode("utf-8")
+            self._files["text.bin"].write(text_bytes)
+            self._files["meta.bin"].write(meta_bytes)
+            self._text_pos += len(text_bytes)
+            self._meta_pos += len(meta_bytes)
+            text_offsets.append(self._text_pos)
+            meta_offsets.append(self._meta_pos)
+        self._files["text.idx"].write(np.asarray(text_offsets, dtype=np.int64).tobytes())
+        self._files["meta.idx"].write(np.asarray(meta_offsets, dtype=np.int64).tobytes())
+        self._files["vectors.f32"].write(vectors.tobytes())
+        self.count += len(texts)
+
+    def add_documents(self, docs: List[Document], vectors: np.ndarray) -> None:
+        self.add_many([d.page_content for d in docs], [d.metadata for d in docs], vectors)
+
+    def copy_rows(self, store: ChunkStore, rows: Iterable[int], batch_size: int = 1024) -> None:
+        """Carry rows over from an existing store without re-embedding them."""
+        rows = list(rows)
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            self.add_many(
+                [store.text(r) for r in batch],
+                [store.metadata(r) for r in batch],
+                store.vectors[batch] if batch else np.empty((0, self.dim), dtype=np.float32)
+            )
+
+    def append_store(self, store: ChunkStore) -> None:
+        """Append all rows of another store (e.g. a build shard) by copying its files as-is."""
+        if store.dim != self.dim:
+            raise ValueError(f"Store dimension {store.dim} does not match {self.dim}")
+        if not store.count:
+            return
+        with open(os.path.join(store.path, "text.bin"), "rb") as src:
+            shutil.copyfileobj(src, self._files["text.bin"])
+        with open(os.path.join(store.path, "meta.bin"), "rb") as src:
+            shutil.copyfileobj(src, self._files["meta.bin"])
+        with open(os.path.join(store.path, "vectors.f32"), "rb") as src:
+            shutil.copyfileobj(src, self._files["vectors.f32"])
+        self._files["text.idx"].write((np.asarray(store._text_idx[1:]) + self._text_pos).tobytes())
+        self._files["meta.idx"].write((np.asarray(store._meta_idx[1:]) + self._meta_pos).tobytes())
+        self._text_pos += int(store._text_idx[-1])
+        self._meta_pos += int(store._meta_idx[-1])
+        self.count += store.count
+
+    def close(self, swap: bool = True) -> ChunkStore:
+        """
+        Finish the store. With `swap=False` it stays at `staging_path` for the caller
+        to `swap_dir` once the matching index is written too (see ingest.commit_build).
+        """
+        for f in self._files.values():
+            f.close()
+        with open(os.path.join(self.staging_path, "store.json"), "w", encoding="utf-8") as f:
+            json.dump({"count": self.count, "dim": self.dim, "format": STORE_FORMAT, "generation": self.generation}, f)
+        if not swap:
+            return ChunkStore(self.staging_path)
+        swap_dir(self.staging_path, self.path)
+        return ChunkStore(self.path)
+
+
+# ---------------- FAISS docstore adapter ----------------
+
+class RowIds(Mapping):
+    """`index_to_docstore_id` for a store: FAISS position i maps to docstore id str(i)."""
+
+    def __init__(self, count: int):
+        self.count = count
+
+    def __getitem__(self, i: int) -> str:
+        if not 0 <= i < self.count:
+            raise KeyError(i)
+        return str(i)
+
+    def __iter__(self):
+        return iter(range(self.count))
+
+    def __len__(self) -> int:
+        return self.count
+
+
+class ChunkStoreDocstore(Docstore):
+    """LangChain docstore that materializes `Document`s from the store on lookup."""
+
+    def __init__(self, store: ChunkStore):
+        self.store = store
+
+    def search(self, search: str):
+        row = int(search)
+        if not 0 <= row < len(self.store):
+            return f"ID {search} not found."
+        return self.store.document(row)
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        raise NotImplementedError("The chunk store is read-only; use rag_tools.ingest to change it.")
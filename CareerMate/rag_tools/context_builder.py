@@ -0,0 +1,211 @@
+# rag_tools/context_builder.py
+
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain.docstore.document import Document
+
+from rag_tools.startup import lazy
+from rag_tools.tracing import span
+
+# Context assembly between retrieval and the "stuff documents" prompt:
+#   1. group the fused chunks back into their postings (chunks in order, the
+#      splitter's overlap removed, the posting header restored if needed)
+#   2. drop near-duplicate postings (reposts) by cosine similarity of their
+#      stored chunk vectors, so no query re-embedding is needed
+#   3. order the postings by maximal marginal relevance: retrieval rank vs.
+#      similarity to the postings already picked
+#   4. pack them into a token budget
+# Chunks carry their store row in metadata["row"] (see HybridRetriever).
+
+CONTEXT_BUILDER = os.getenv("CONTEXT_BUILDER", "true").lower() not in ("0", "false", "no")
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))              # 1.0 = rank only
+CONTEXT_DEDUP_SIMILARITY = float(os.getenv("CONTEXT_DEDUP_SIMILARITY", "0.95"))
+CONTEXT_MAX_POSTINGS = int(os.getenv("CONTEXT_MAX_POSTINGS", "8"))
+
+CHARS_PER_TOKEN = 4          # rough, model-agnostic estimate
+SPLIT_OVERLAP = 50           # chunk_overlap of the ingest splitter
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _chunk_index(doc: Document) -> int:
+    chunk_id = str(doc.metadata.get("chunk_id", ""))
+    tail = chunk_id.rsplit(":", 1)[-1]
+    return int(tail) if tail.isdigit() else 0
+
+
+def _merge(previous: str, text: str, max_overlap: int = SPLIT_OVERLAP) -> str:
+    """Join two consecutive chunks, dropping the text they share."""
+    for size in range(min(max_overlap, len(previous), len(text)), 0, -1):
+        if previous.endswith(text[:size]):
+            return previous + text[size:]
+    return previous + "\n" + text
+
+
+def _header(meta: dict) -> str:
+    return (
+        f"Job Title: {meta.get('designation', 'Not specified')}\n"
+        f"Job Type: {meta.get('work_type', 'Not specified')}\n"
+        f"Involvement: {meta.get('involvement', 'Not specified')}\n"
+        f"Location: {meta.get('location', 'Not specified')}\n"
+    )
+
+
+class Posting:
+    """The retrieved chunks of one posting, best rank first."""
+
+    def __init__(self, key: str, rank: int):
+        self.key = key
+        self.rank = rank                       # best rank among its chunks
+        self.chunks: List[Document] = []
+
+    def text(self) -> str:
+        chunks = sorted(self.chunks, key=_chunk_index)
+        text, previous_index = None, None
+        for chunk in chunks:
+            index = _chunk_index(chunk)
+            if text is None:
+                text = chunk.page_content
+            elif index == previous_index + 1:
+                text = _merge(text, chunk.page_content)
+            else:
+                text += "\n...\n" + chunk.page_content
+            previous_index = index
+        if _chunk_index(chunks[0]) != 0:  # the posting's header chunk was not retrieved
+            text = _header(chunks[0].metadata) + "Job Description: ..." + text
+        return text
+
+    def document(self, text: str) -> Document:
+        meta = {k: v for k, v in self.chunks[0].metadata.items() if k not in ("row", "chunk_id")}
+        meta["chunks"] = len(self.chunks)
+        return Document(page_content=text, metadata=meta)
+
+
+def group_postings(docs: List[Document]) -> List[Posting]:
+    postings: Dict[str, Posting] = OrderedDict()
+    for rank, doc in enumerate(docs):
+        key = doc.metadata.get("posting_id") or doc.metadata.get("chunk_id") or f"doc-{rank}"
+        posting = postings.get(key)
+        if posting is None:
+            posting = postings[key] = Posting(key, rank)
+        posting.chunks.append(doc)
+    return list(postings.values())
+
+
+def posting_vectors(postings: List[Posting], vectors) -> Optional[np.ndarray]:
+    """Normalized mean chunk vector per posting, or None if rows or vectors are missing."""
+    if vectors is None:
+        return None
+    rows = [[c.metadata.get("row") for c in p.chunks] for p in postings]
+    if any(row is None for group in rows for row in group):
+        return None
+    matrix = np.stack([np.asarray(vectors[group], dtype=np.float32).mean(axis=0) for group in rows])
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def mmr_order(relevance: np.ndarray, vectors: np.ndarray, lam: float, dedup_similarity: float) -> List[int]:
+    """
+    Indexes in maximal-marginal-relevance order. Candidates more similar than
+    `dedup_similarity` to an already picked one are dropped as duplicates.
+    """
+    similarity = vectors @ vectors.T
+    remaining = list(range(len(relevance)))
+    picked: List[int] = []
+    while remaining:
+        if picked:
+            redundancy = similarity[np.ix_(remaining, picked)].max(axis=1)
+            keep = redundancy < dedup_similarity
+            remaining = [i for i, k in zip(remaining, keep) if k]
+            if not remaining:
+                break
+            redundancy = redundancy[keep]
+        else:
+            redundancy = np.zeros(len(remaining))
+        scores = lam * relevance[remaining] - (1 - lam) * redundancy
+        picked.append(remaining.pop(int(np.argmax(scores))))
+    return picked
+
+
+def build_context(
+    docs: List[Document],
+    vectors=None,
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    lam: float = CONTEXT_MMR_LAMBDA,
+    dedup_similarity: float = CONTEXT_DEDUP_SIMILARITY,
+    max_postings: int = CONTEXT_MAX_POSTINGS
+) -> List[Document]:
+    """
+    One Document per selected posting, best first, within `token_budget`.
+    `docs` are fused chunks in retrieval order; `vectors` is the store's vector
+    matrix (rows in metadata["row"]). Without vectors only exact duplicates go.
+    """
+    if not docs:
+        return []
+    with span("context.build", chunks=len(docs)) as attrs:
+        postings = group_postings(docs)
+        texts = [p.text() for p in postings]
+
+        matrix = posting_vectors(postings, vectors)
+        if matrix is not None and len(postings) > 1:
+            ranks = np.asarray([p.rank for p in postings], dtype=np.float32)
+            relevance = 1.0 - ranks / len(docs)
+            order = mmr_order(relevance, matrix, lam, dedup_similarity)
+        else:
+            order = list(range(len(postings)))
+
+        selected, seen, used = [], set(), 0
+        for i in order:
+            if len(selected) >= max_postings:
+                break
+            text = texts[i]
+            if text in seen:
+                continue
+            tokens = estimate_tokens(text)
+            if used + tokens > token_budget:
+                if selected:
+                    continue  # a shorter posting further down may still fit
+                text = text[:token_budget * CHARS_PER_TOKEN]
+                tokens = estimate_tokens(text)
+            seen.add(text)
+            used += tokens
+            selected.append(postings[i].document(text))
+
+        attrs.update(postings=len(postings), selected=len(selected), tokens=used)
+        return selected
+
+
+def pack_context(docs: List[Document]) -> List[Document]:
+    """`build_context` with the live chunk store's vectors; a no-op when CONTEXT_BUILDER=false."""
+    if not CONTEXT_BUILDER:
+        return docs
+    from rag_tools.setup_vectorstore import get_store
+    return build_context(docs, get_store().vectors)
+
+
+async def apack_context(docs: List[Document]) -> List[Document]:
+    # A few small matrix products: cheaper than a hop to the executor
+    return pack_context(docs)
+
+
+def _query(value) -> str:
+    # create_retrieval_chain hands a plain Runnable its whole input, not input["input"]
+    return value["input"] if isinstance(value, dict) else value
+
+
+@lazy("context retriever")
+def get_context_retriever():
+    """The hybrid retriever followed by context assembly, for retrieval chains."""
+    from langchain_core.runnables import RunnableLambda
+    from rag_tools.setup_vectorstore import get_hybrid_retriever
+    return (
+        RunnableLambda(_query, name="query")
+        | get_hybrid_retriever()
+        | RunnableLambda(pack_context, afunc=apack_context, name="pack_context")
+    )
@@ -0,0 +1,163 @@
+# rag_tools/course_catalog.py
+
+import os
+import re
+import csv
+import json
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from rag_tools.skill_index import normalize_skill
+from rag_tools.startup import lazy
+
+# Course catalog with a normalized-skill index.
+#
+# The catalog file is CSV (header: skill,title,provider[,rating]) or JSONL with
+# the same keys, one course per row. Courses are grouped by a normalized skill
+# key; a requested skill is resolved to a catalog skill by, in order:
+#   1. exact key after alias normalization ("ML" -> "Machine Learning")
+#   2. the same after dropping filler words ("Pandas library" -> "Pandas"), then
+#      for single words of the request ("AWS cloud" -> "AWS")
+#   3. character-trigram similarity over catalog skills ("Tensorflow 2" -> "TensorFlow")
+# Resolution is memoized, so repeated lookups are dictionary hits.
+
+COURSE_CATALOG_PATH = os.getenv("COURSE_CATALOG_PATH", "courses.csv")
+COURSE_MATCH_THRESHOLD = float(os.getenv("COURSE_MATCH_THRESHOLD", "0.6"))   # trigram Dice coefficient
+COURSES_PER_SKILL = 3
+
+FILLER_WORDS = {
+    "library", "libraries", "framework", "frameworks", "language", "programming", "basics",
+    "fundamentals", "skills", "skill", "tool", "tools", "advanced", "basic", "intro",
+    "introduction", "knowledge", "of", "in", "the", "with", "and", "using", "experience",
+}
+
+
+@dataclass(frozen=True)
+class Course:
+    skill: str
+    title: str
+    provider: str
+    rating: Optional[float] = None
+
+    def label(self) -> str:
+        return f"{self.title} - {self.provider}"
+
+
+def skill_key(name: str) -> str:
+    """Canonical, lowercase, punctuation-insensitive key for a skill name."""
+    canonical = normalize_skill(name)
+    return " ".join(re.findall(r"[a-z0-9+#]+", canonical.lower()))
+
+
+def _trigrams(key: str) -> set:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def read_courses(path: str) -> Iterator[Course]:
+    """Stream courses from a CSV or JSONL catalog file."""
+    def to_course(row: dict) -> Optional[Course]:
+        row = {str(k).strip().lower(): v for k, v in row.items()}
+        if not row.get("skill") or not row.get("title"):
+            return None
+        rating = row.get("rating")
+        return Course(
+            skill=str(row["skill"]).strip(),
+            title=str(row["title"]).strip(),
+            provider=str(row.get("provider") or "").strip(),
+            rating=float(rating) if rating not in (None, "") else None,
+        )
+
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        rows = (json.loads(line) for line in f if line.strip()) if path.endswith(".jsonl") else csv.DictReader(f)
+        for row in rows:
+            course = to_course(row)
+            if course is not None:
+                yield course
+
+
+class CourseCatalog:
+    def __init__(self, courses: Iterable[Course], match_threshold: float = COURSE_MATCH_THRESHOLD):
+        self.match_threshold = match_threshold
+        by_key: Dict[str, List[Course]] = defaultdict(list)
+        for course in courses:
+            by_key[skill_key(course.skill)].append(course)
+
+        # Best-rated first when ratings exist, otherwise file order
+        self._by_key = {
+            key: sorted(items, key=lambda c: -(c.rating or 0.0)) for key, items in by_key.items()
+        }
+        self._names = {key: items[0].skill for key, items in self._by_key.items()}
+        self._keys = list(self._by_key)
+        self._grams = [_trigrams(key) for key in self._keys]
+        self._gram_index: Dict[str, List[int]] = defaultdict(list)
+        for i, grams in enumerate(self._grams):
+            for gram in grams:
+                self._gram_index[gram].append(i)
+
+        # Memoized per catalog instance
+        self.resolve = lru_cache(maxsize=65536)(self._resolve)
+
+    @classmethod
+    def from_file(cls, path: str = COURSE_CATALOG_PATH) -> "CourseCatalog":
+        return cls(read_courses(path))
+
+    def __len__(self) -> int:
+        return sum(len(items) for items in self._by_key.values())
+
+    def skills(self) -> List[str]:
+        return sorted(self._names.values())
+
+    # ---------------- Matching ----------------
+
+    def _fuzzy(self, key: str) -> Optional[str]:
+        grams = _trigrams(key)
+        shared: Dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for i in self._gram_index.get(gram, ()):
+                shared[i] += 1
+        best, best_score = None, self.match_threshold
+        for i, count in shared.items():
+            score = 2 * count / (len(grams) + len(self._grams[i]))
+            if score >= best_score:
+                best, best_score = self._keys[i], score
+        return best
+
+    def _resolve(self, skill: str) -> Optional[str]:
+        """Catalog skill key for a requested skill, or None if nothing is close enough."""
+        key = skill_key(skill)
+        if key in self._by_key:
+            return key
+        words = [w for w in skill.split() if w.lower() not in FILLER_WORDS]
+        if words and len(words) < len(skill.split()):
+            trimmed = skill_key(" ".join(words))
+            if trimmed in self._by_key:
+                return trimmed
+            key = trimmed
+        if len(words) > 1:
+            for word in words:
+                if skill_key(word) in self._by_key:
+                    return skill_key(word)
+        return self._fuzzy(key) if key else None
+
+    # ---------------- Lookup ----------------
+
+    def courses_for(self, skill: str, limit: int = COURSES_PER_SKILL) -> List[Course]:
+        key = self.resolve(skill)
+        return self._by_key[key][:limit] if key else []
+
+    def lookup_many(self, skills: Iterable[str], limit: int = COURSES_PER_SKILL) -> Dict[str, List[Course]]:
+        """Courses for each requested skill, keyed by the skill as given."""
+        return {skill: self.courses_for(skill, limit) for skill in dict.fromkeys(skills)}
+
+    def matched_skill(self, skill: str) -> Optional[str]:
+        """Display name of the catalog skill a request resolved to."""
+        key = self.resolve(skill)
+        return self._names[key] if key else None
+
+
+@lazy("course catalog")
+def get_course_catalog() -> CourseCatalog:
+    return CourseCatalog.from_file(COURSE_CATALOG_PATH)
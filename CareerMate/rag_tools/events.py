@@ -0,0 +1,34 @@
+# rag_tools/events.py
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+# Progress events from inside tools (retrieved jobs, RAG tokens) for streaming
+# callers. A streaming turn installs a sink; the agent runner's tasks inherit it
+# through the context, so tools just call `emit(...)`. Without a sink `emit` is a no-op.
+
+EventSink = Callable[[dict], None]
+
+_sink: ContextVar[Optional[EventSink]] = ContextVar("careermate_event_sink", default=None)
+
+
+@contextmanager
+def event_sink(sink: EventSink):
+    """Route `emit()` calls made in this context (and tasks created from it) to `sink`."""
+    token = _sink.set(sink)
+    try:
+        yield
+    finally:
+        _sink.reset(token)
+
+
+def emit(event_type: str, **data) -> None:
+    sink = _sink.get()
+    if sink is not None:
+        sink({"type": event_type, **data})
+
+
+def streaming() -> bool:
+    """True when someone is listening, so producers can skip work nobody will see."""
+    return _sink.get() is not None
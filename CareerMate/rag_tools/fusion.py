@@ -0,0 +1,49 @@
+# rag_tools/fusion.py
+
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+# A ranking is a best-first list of (chunk id, raw score) pairs from one retriever.
+Ranking = Sequence[Tuple[Hashable, float]]
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Ranking],
+    weights: Optional[Sequence[float]] = None,
+    k: int = 60
+) -> Dict[Hashable, float]:
+    """
+    Weighted RRF: score(d) = sum_i w_i / (k + rank_i(d)). Only ranks are used,
+    so retrievers with incomparable score scales fuse cleanly.
+    """
+    weights = weights or [1.0] * len(rankings)
+    fused: Dict[Hashable, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, (key, _) in enumerate(ranking, start=1):
+            fused[key] = fused.get(key, 0.0) + weight / (k + rank)
+    return fused
+
+
+def weighted_score_fusion(
+    rankings: Sequence[Ranking],
+    weights: Optional[Sequence[float]] = None
+) -> Dict[Hashable, float]:
+    """
+    Convex combination of min-max normalized scores. Scores must be
+    "higher is better"; a document missing from a ranking contributes 0 for it.
+    """
+    weights = weights or [1.0] * len(rankings)
+    fused: Dict[Hashable, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        if not ranking:
+            continue
+        scores = [score for _, score in ranking]
+        lo, hi = min(scores), max(scores)
+        span = (hi - lo) or 1.0
+        for key, score in ranking:
+            fused[key] = fused.get(key, 0.0) + weight * (score - lo) / span
+    return fused
+
+
+def top_fused(fused: Dict[Hashable, float], k: int) -> List[Hashable]:
+    """Keys of the `k` highest fused scores, best first."""
+    return sorted(fused, key=fused.get, reverse=True)[:k]
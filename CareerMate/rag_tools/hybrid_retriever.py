@@ -0,0 +1,181 @@
+# rag_tools/hybrid_retriever.py
+
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import faiss
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain.schema import BaseRetriever
+from langchain.docstore.document import Document
+from pydantic import PrivateAttr
+
+from rag_tools.ann_index import search_parameters
+from rag_tools.batching import MicroBatcher
+from rag_tools.bm25_index import SparseBM25
+from rag_tools.chunk_store import ChunkStore
+from rag_tools.metadata_filter import MetadataIndex
+from rag_tools.fusion import reciprocal_rank_fusion, weighted_score_fusion, top_fused
+from rag_tools.metrics import observe, SIZE_BUCKETS
+from rag_tools.tracing import span
+from rag_tools.setup_vectorstore import (
+    get_retrieval_executor, RETRIEVAL_BATCH_WINDOW_MS, RETRIEVAL_MAX_BATCH
+)
+
+# Define Hybrid Retriever
+class HybridRetriever(BaseRetriever):
+    store: ChunkStore
+    db: FAISS
+    bm25: SparseBM25
+    k: int = 10              # fused chunks returned
+    fetch_k: int = 20        # candidates taken from each retriever
+    fusion: str = "rrf"      # "rrf" or "weighted"
+    dense_weight: float = 1.0
+    bm25_weight: float = 1.0
+    rrf_k: int = 60
+    metadata_index: Optional[MetadataIndex] = None
+    exact_search_limit: int = 4096  # filtered candidate sets up to this size are scored exactly
+    refine: int = 1          # approximate (IVF-PQ) indexes: re-score refine x top_k hits with stored vectors
+
+    _batcher: Optional[MicroBatcher] = PrivateAttr(default=None)
+
+    # `filters` are hard constraints on chunk metadata, e.g.
+    #   retriever.invoke("python sql", filters={"location": "Delhi", "work_type": "remote"})
+    # (see metadata_filter.py). Only matching chunks are scored.
+
+    def _get_relevant_documents(self, query: str, *, filters: Optional[Dict] = None, **kwargs) -> List[Document]:
+        return self.retrieve_batch([query], [filters])[0]
+
+    async def _aget_relevant_documents(self, query: str, *, filters: Optional[Dict] = None, **kwargs) -> List[Document]:
+        if self._batcher is None:
+            self._batcher = MicroBatcher(
+                self._retrieve_items,
+                get_retrieval_executor(),
+                window=RETRIEVAL_BATCH_WINDOW_MS / 1000,
+                max_batch=RETRIEVAL_MAX_BATCH
+            )
+        return await self._batcher.submit((query, filters))
+
+    async def aretrieve_batch(self, queries: List[str], filters: Optional[List[Optional[Dict]]] = None) -> List[List[Document]]:
+        """`retrieve_batch` on the retrieval pool, for callers that already hold several queries."""
+        if not queries:
+            return []
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_retrieval_executor(), self.retrieve_batch, queries, filters)
+
+    def _retrieve_items(self, items: List[Tuple[str, Optional[Dict]]]) -> List[List[Document]]:
+        return self.retrieve_batch([query for query, _ in items], [filters for _, filters in items])
+
+    def retrieve_batch(self, queries: List[str], filters: Optional[List[Optional[Dict]]] = None) -> List[List[Document]]:
+        """Hybrid retrieval for several queries with one embedding call and one FAISS search."""
+        observe("retrieval_batch_size", len(queries), SIZE_BUCKETS)
+        with span("retrieval", queries=len(queries)) as attrs:
+            with span("retrieval.filter"):
+                masks = self.filter_masks(filters or [None] * len(queries))
+            dense_hits = self.dense_search_batch(queries, top_k=self.fetch_k, masks=masks)
+            with span("retrieval.bm25", queries=len(queries)):
+                kw_hits = [self.bm25_search(query, top_k=self.fetch_k, mask=mask) for query, mask in zip(queries, masks)]
+            with span("retrieval.fusion", fusion=self.fusion):
+                fused = [self.fuse(dense, kw) for dense, kw in zip(dense_hits, kw_hits)]
+            attrs["filtered"] = sum(mask is not None for mask in masks)
+            return [self.documents(rows) for rows in fused]
+
+    def filter_masks(self, filters: List[Optional[Dict]]) -> List[Optional[np.ndarray]]:
+        """Boolean row mask per query (None = unfiltered)."""
+        if not any(filters):
+            return [None] * len(filters)
+        if self.metadata_index is None:
+            raise ValueError("This retriever has no metadata index; filters are not supported.")
+        return [self.metadata_index.mask(f) for f in filters]
+
+    def documents(self, rows: List[int]) -> List[Document]:
+        """Materialize chunks; metadata["row"] lets later stages read their stored vectors."""
+        docs = self.store.documents(rows)
+        for row, doc in zip(rows, docs):
+            doc.metadata["row"] = int(row)
+        return docs
+
+    # Both searches return (row, score) pairs; rows are chunk ids in the store and
+    # Documents are only materialized for the fused top k.
+
+    def dense_search(self, query: str, top_k: int = 10, mask: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        return self.dense_search_batch([query], top_k, [mask])[0]
+
+    def dense_search_batch(
+        self,
+        queries: List[str],
+        top_k: int = 10,
+        masks: Optional[List[Optional[np.ndarray]]] = None
+    ) -> List[List[Tuple[int, float]]]:
+        """Batched FAISS search. Scores are oriented so that higher is better."""
+        with span("retrieval.embed", queries=len(queries)):
+            vectors = np.asarray(self.db.embeddings.embed_documents(queries), dtype=np.float32)
+        if self.db._normalize_L2:
+            faiss.normalize_L2(vectors)
+        masks = masks or [None] * len(queries)
+
+        # Unfiltered queries share one FAISS search; filtered ones only score their candidates
+        results: List[List[Tuple[int, float]]] = [[] for _ in queries]
+        unfiltered = [i for i, mask in enumerate(masks) if mask is None]
+        with span("retrieval.dense", queries=len(queries), filtered=len(queries) - len(unfiltered)):
+            if unfiltered:
+                scores, indices = self.db.index.search(vectors[unfiltered], top_k * self.refine)
+                for i, row_scores, row_indices in zip(unfiltered, scores, indices):
+                    results[i] = self._ann_hits(vectors[i], row_scores, row_indices, top_k)
+            for i, mask in enumerate(masks):
+                if mask is not None:
+                    results[i] = self._filtered_dense_search(vectors[i], np.flatnonzero(mask), top_k)
+        return results
+
+    def _filtered_dense_search(self, vector: np.ndarray, rows: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        if not len(rows):
+            return []
+        if len(rows) <= self.exact_search_limit:
+            # Small candidate sets: score the stored vectors directly (same result as a flat index)
+            return self._exact_hits(vector, rows, top_k)
+
+        # Large candidate sets: let FAISS skip everything outside the selector
+        selector = faiss.IDSelectorBatch(rows.astype(np.int64))
+        params = search_parameters(self.db.index, selector)
+        scores, indices = self.db.index.search(vector[None, :], top_k * self.refine, params=params)
+        return self._ann_hits(vector, scores[0], indices[0], top_k)
+
+    def _exact_hits(self, vector: np.ndarray, rows: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        """Score `rows` against their stored vectors; best `top_k` first."""
+        candidates = np.asarray(self.store.vectors[rows])
+        if self.db.distance_strategy == DistanceStrategy.MAX_INNER_PRODUCT:
+            scores = candidates @ vector
+        else:
+            scores = -((candidates - vector) ** 2).sum(axis=1)
+        if len(rows) > top_k:
+            part = np.argpartition(-scores, top_k - 1)[:top_k]
+            rows, scores = rows[part], scores[part]
+        order = np.argsort(-scores, kind="stable")
+        return [(int(rows[j]), float(scores[j])) for j in order]
+
+    def _ann_hits(self, vector: np.ndarray, scores: np.ndarray, indices: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        if self.refine > 1:
+            return self._exact_hits(vector, indices[indices != -1], top_k)
+        return self._dense_hits(scores, indices)
+
+    def _dense_hits(self, scores: np.ndarray, indices: np.ndarray) -> List[Tuple[int, float]]:
+        if self.db.distance_strategy != DistanceStrategy.MAX_INNER_PRODUCT:
+            scores = -scores  # L2 distance: smaller is closer
+        return [(int(i), float(score)) for score, i in zip(scores, indices) if i != -1]
+
+    def bm25_search(self, query: str, top_k: int = 10, mask: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        top_idx, scores = self.bm25.top_k(query.split(), top_k, mask=mask)
+        return [(int(i), float(score)) for i, score in zip(top_idx, scores)]
+
+    def bm25_retrieve(self, query: str, top_k: int = 10) -> List[Document]:
+        return self.store.documents(row for row, _ in self.bm25_search(query, top_k))
+
+    def fuse(self, dense_hits: List[Tuple[int, float]], kw_hits: List[Tuple[int, float]]) -> List[int]:
+        """Merge both rankings by chunk row and keep the `k` best fused rows."""
+        weights = [self.dense_weight, self.bm25_weight]
+        if self.fusion == "weighted":
+            fused = weighted_score_fusion([dense_hits, kw_hits], weights)
+        else:
+            fused = reciprocal_rank_fusion([dense_hits, kw_hits], weights, k=self.rrf_k)
+        return top_fused(fused, self.k)
@@ -0,0 +1,306 @@
+# rag_tools/ingest.py
+
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import argparse
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import faiss
+import numpy as np
+import pandas as pd
+from langchain.docstore.document import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from rag_tools.ann_index import ANN_INDEX, build_index, load_params, remove_rows, save_index
+from rag_tools.chunk_store import ChunkStore, ChunkStoreWriter, swap_dir
+
+# ---------------- Paths ----------------
+
+CSV_PATH = "IT_jobs.csv"
+STORE_PATH = "rag_tools/chunk_store"          # chunk text, metadata and vectors (see chunk_store.py)
+INDEX_PATH = "rag_tools/rag_jobs_db"          # the folder setup_vectorstore loads
+FAISS_FILE = os.path.join(INDEX_PATH, "index.faiss")
+MANIFEST_PATH = "rag_tools/ingest_manifest.json"
+
+# Columns that define a posting's content. A change in any of them re-embeds the posting.
+POSTING_COLUMNS = [
+    "designation", "name", "work_type", "involvement", "employees_count",
+    "job_details", "industry", "level", "City", "State",
+]
+
+# Bump when the chunk metadata layout changes; incremental ingest then rebuilds
+# instead of mixing old and new metadata in one store.
+METADATA_SCHEMA = 2
+
+splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
+
+# ---------------- Posting helpers ----------------
+
+def posting_hash(row: dict) -> str:
+    """Content hash of a single CSV row."""
+    payload = "\x1f".join(str(row.get(col)) for col in POSTING_COLUMNS)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def keyed_postings(df: pd.DataFrame) -> Dict[str, dict]:
+    """
+    Map every row to a stable posting key. Identical rows share a hash, so the
+    occurrence number is appended to keep duplicates apart.
+    """
+    postings = {}
+    seen = {}
+    for row in df.to_dict("records"):
+        digest = posting_hash(row)
+        n = seen.get(digest, 0)
+        seen[digest] = n + 1
+        postings[f"{digest}-{n}"] = row
+    return postings
+
+
+def _clean(value) -> Optional[str]:
+    """CSV cells carry stray spaces and "Not Avilable" placeholders."""
+    if value is None or pd.isna(value):
+        return None
+    value = str(value).strip()
+    return None if value.lower() in ("", "not avilable", "not available") else value
+
+
+def posting_to_document(key: str, row: dict) -> Document:
+    text = f"""Job Title: {row["designation"]}
+Job Type: {row["work_type"]}
+Involvement: {row["involvement"]}
+Location: {row["City"]}, {row["State"]}
+Job Description: {row["job_details"]}
+"""
+    meta = {
+        "posting_id": key,
+        "designation": row["designation"],
+        "location": f"{row['City']}, {row['State']}",
+        "work_type": row["work_type"],
+        "involvement": row["involvement"],
+        "industry": _clean(row.get("industry")),
+        "level": _clean(row.get("level")),
+    }
+    return Document(page_content=text, metadata=meta)
+
+
+def split_postings(postings: Dict[str, dict]) -> List[Document]:
+    """Split postings into chunks, giving each chunk a stable `chunk_id`."""
+    chunks = []
+    for key, row in postings.items():
+        for i, chunk in enumerate(splitter.split_documents([posting_to_document(key, row)])):
+            chunk.metadata["chunk_id"] = f"{key}:{i}"
+            chunks.append(chunk)
+    return chunks
+
+# ---------------- Manifest ----------------
+
+def load_manifest(path: str = MANIFEST_PATH) -> Optional[dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest: dict, path: str = MANIFEST_PATH) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+_version_cache: Dict[str, tuple] = {}
+
+def corpus_version(path: str = MANIFEST_PATH) -> int:
+    """
+    Version of the indexed corpus; bumped on every ingest that changes it.
+    Cheap enough to call per request: the manifest is only re-read when its mtime changes.
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+    cached = _version_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        manifest = load_manifest(path)
+        cached = (mtime, manifest["version"] if manifest else 0)
+        _version_cache[path] = cached
+    return cached[1]
+
+
+def _new_manifest(previous: Optional[dict], postings: Dict[str, List[str]], source: str, generation: str) -> dict:
+    return {
+        "version": (previous["version"] + 1) if previous else 1,
+        "updated_at": datetime.now().isoformat(timespec="seconds"),
+        "source": source,
+        "metadata_schema": METADATA_SCHEMA,
+        "generation": generation,
+        "postings": postings,
+    }
+
+# ---------------- Build generations ----------------
+
+# Every build stamps the chunk store, index params and manifest with the same
+# generation id. Row i of the store is FAISS position i only within one
+# generation, so a pair from different builds must never be used together.
+
+def new_generation() -> str:
+    return uuid.uuid4().hex
+
+
+def live_generations(store_path: str = STORE_PATH, index_path: str = INDEX_PATH,
+                     manifest: Optional[dict] = None) -> Dict[str, Optional[str]]:
+    return {
+        "store": ChunkStore(store_path).generation,
+        "index": load_params(index_path).get("generation"),
+        "manifest": (manifest or {}).get("generation"),
+    }
+
+
+def commit_build(writer: ChunkStoreWriter, index, params: dict, manifest: dict,
+                 store_path: str = STORE_PATH, index_path: str = INDEX_PATH) -> None:
+    """
+    Make a build live. The store (closed with `swap=False`) and the index are
+    complete on staging paths before anything is swapped in; then the store, the
+    index and, last, the manifest replace the live ones. If the process dies in
+    between, the generations disagree and the next ingest rebuilds instead of
+    diffing against a manifest that no longer describes the store's rows.
+    """
+    staged_index = index_path + ".tmp"
+    shutil.rmtree(staged_index, ignore_errors=True)
+    save_index(index, {**params, "generation": manifest["generation"]}, staged_index)
+    swap_dir(writer.staging_path, store_path)
+    swap_dir(staged_index, index_path)
+    save_manifest(manifest)
+
+
+def _embed(embedder, chunks: List[Document]) -> np.ndarray:
+    if not chunks:
+        return np.empty((0, len(embedder.embed_query("dimension probe"))), dtype=np.float32)
+    return np.asarray(embedder.embed_documents([c.page_content for c in chunks]), dtype=np.float32)
+
+
+# ---------------- Ingestion ----------------
+
+def full_rebuild(df: pd.DataFrame, embedder, source: str = CSV_PATH) -> dict:
+    """Re-chunk and re-embed the whole feed."""
+    postings = keyed_postings(df)
+    chunks = split_postings(postings)
+    vectors = _embed(embedder, chunks)
+
+    generation = new_generation()
+    writer = ChunkStoreWriter(STORE_PATH, dim=vectors.shape[1], generation=generation)
+    writer.add_documents(chunks, vectors)
+    writer.close(swap=False)
+
+    index, params = build_index(vectors, ANN_INDEX)
+    chunk_ids = {}
+    for chunk in chunks:
+        chunk_ids.setdefault(chunk.metadata["posting_id"], []).append(chunk.metadata["chunk_id"])
+    manifest = _new_manifest(load_manifest(), chunk_ids, source, generation)
+    commit_build(writer, index, params, manifest)
+    print(f"✅ {len(chunks)} chunks saved to {STORE_PATH}")
+    print(f"Saving {params['kind']} vectorstore to:", os.path.abspath(INDEX_PATH))
+    return manifest
+
+
+def incremental_ingest(df: pd.DataFrame, embedder, source: str = CSV_PATH) -> dict:
+    """
+    Embed only postings whose content hash is new, and drop postings that are no
+    longer in the feed from both the FAISS index and the chunk store (which the
+    BM25 index is built from).
+    Falls back to a full rebuild when there is no manifest to diff against.
+    """
+    manifest = load_manifest()
+    if manifest is None or not os.path.exists(FAISS_FILE) or not os.path.exists(STORE_PATH):
+        print("No ingest manifest found, running a full rebuild.")
+        return full_rebuild(df, embedder, source)
+    if manifest.get("metadata_schema", 1) != METADATA_SCHEMA:
+        print("Chunk metadata layout changed, running a full rebuild.")
+        return full_rebuild(df, embedder, source)
+    generations = live_generations(manifest=manifest)
+    if len(set(generations.values())) != 1:
+        print(f"⚠️ Chunk store, index and manifest are from different builds ({generations}), "
+              "probably an interrupted ingest; running a full rebuild.")
+        return full_rebuild(df, embedder, source)
+
+    current = keyed_postings(df)
+    indexed = manifest["postings"]
+    added = {key: row for key, row in current.items() if key not in indexed}
+    removed = {key for key in indexed if key not in current}
+
+    if not added and not removed:
+        print(f"✅ Index is up to date (version {manifest['version']}).")
+        return manifest
+
+    store = ChunkStore(STORE_PATH)
+    index = faiss.read_index(FAISS_FILE)
+    params = load_params(INDEX_PATH)
+
+    stale_rows, kept_rows = [], []
+    for row, meta in enumerate(store.iter_metadata()):
+        (stale_rows if meta.get("posting_id") in removed else kept_rows).append(row)
+
+    new_chunks = split_postings(added)
+    vectors = _embed(embedder, new_chunks)
+
+    # The store keeps FAISS order: surviving rows first (remove_ids compacts the
+    # index the same way), then the new chunks, which are appended to the index.
+    generation = new_generation()
+    writer = ChunkStoreWriter(STORE_PATH, dim=store.dim, generation=generation)
+    writer.copy_rows(store, kept_rows)
+    writer.add_documents(new_chunks, vectors)
+    new_store = writer.close(swap=False)
+
+    if stale_rows and params["kind"] != "flat":
+        # IVF / HNSW cannot compact ids in place: refill from the new store's vectors,
+        # which already include the added chunks
+        index = remove_rows(index, params, np.asarray(stale_rows), np.asarray(new_store.vectors))
+    else:
+        if stale_rows:
+            index = remove_rows(index, params, np.asarray(stale_rows), None)
+        if len(vectors):
+            index.add(vectors)
+
+    postings = {key: ids for key, ids in indexed.items() if key not in removed}
+    for chunk in new_chunks:
+        postings.setdefault(chunk.metadata["posting_id"], []).append(chunk.metadata["chunk_id"])
+    manifest = _new_manifest(manifest, postings, source, generation)
+    commit_build(writer, index, params, manifest)
+
+    print(f"✅ Ingested {len(added)} new/changed postings ({len(new_chunks)} chunks), "
+          f"removed {len(removed)} postings ({len(stale_rows)} chunks). Corpus version {manifest['version']}.")
+    return manifest
+
+
+def ingest(csv_path: str = CSV_PATH, full: bool = False) -> dict:
+    from rag_tools.setup_vectorstore import get_embedder  # same embedder as queries (EMBEDDER=hf|onnx)
+
+    from rag_tools.skill_index import build_skill_index, stored_version
+
+    df = pd.read_csv(csv_path)
+    embedder = get_embedder()
+    if full:
+        manifest = full_rebuild(df, embedder, csv_path)
+    else:
+        manifest = incremental_ingest(df, embedder, csv_path)
+    # Keep the skill index on the same corpus version, or skill gaps drift from the feed
+    if stored_version() != manifest["version"]:
+        build_skill_index(df)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest the job feed into the RAG index.")
+    parser.add_argument("--csv", default=CSV_PATH, help="Path to the job feed CSV")
+    parser.add_argument("--full", action="store_true", help="Rebuild the index from scratch")
+    args = parser.parse_args()
+    ingest(args.csv, full=args.full)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# rag_tools/intent_router.py
+
+import os
+import asyncio
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from rag_tools.startup import lazy
+
+# Fast-path intent classification with the MiniLM embedder that retrieval already
+# loads: a query is compared with a few exemplar phrasings per intent. Confident
+# matches skip the LLM router (conversation_agent); everything else still goes to it.
+
+INTENT_ROUTER = os.getenv("INTENT_ROUTER", "true").lower() not in ("0", "false", "no")
+# Cosine similarity to the nearest exemplar, and lead over the runner-up intent
+INTENT_MIN_SIMILARITY = float(os.getenv("INTENT_MIN_SIMILARITY", "0.6"))
+INTENT_MIN_MARGIN = float(os.getenv("INTENT_MIN_MARGIN", "0.08"))
+
+# "chat" has exemplars too, so general questions land on it instead of scraping
+# past the threshold for a tool intent. It is always routed to the LLM.
+INTENT_EXEMPLARS: Dict[str, List[str]] = {
+    "skill_gap": [
+        "What skills do I need to become a data analyst?",
+        "Which skills am I missing for my target job?",
+        "What extra skills do I need for this role?",
+        "I want to be a game developer",
+        "I want to become a data scientist",
+        "What are the requirements for a software engineer job?",
+        "What should I learn to qualify for this job?",
+        "Am I ready for a backend developer role?",
+    ],
+    "find_jobs": [
+        "Find me a job.",
+        "Find jobs that match my skills",
+        "Show me job openings",
+        "Are there any remote jobs for me?",
+        "Search for full-time jobs in Bangalore",
+        "Which companies are hiring for my profile?",
+        "Look for job listings near me",
+        "I'm looking for work as a Python developer",
+    ],
+    "courses": [
+        "How do I learn SQL and Pandas?",
+        "Recommend courses for my missing skills",
+        "Suggest online courses to learn machine learning",
+        "Where can I study Java?",
+        "What are good tutorials for C#?",
+        "Give me learning resources for statistics",
+        "Which course should I take to learn Unity?",
+    ],
+    "career_plan": [
+        "Give me a complete career plan",
+        "Create a career plan for my target job",
+        "Plan my path to becoming a data analyst with skills, jobs and courses",
+        "What am I missing, which jobs fit me and which courses should I take?",
+        "Show me everything: skill gaps, job openings and courses",
+        "Give me a full roadmap to get this job",
+        "Help me plan my next career move",
+    ],
+    "chat": [
+        "What is deep learning?",
+        "Explain the difference between a list and a tuple",
+        "Hello, who are you?",
+        "Thanks, that was helpful",
+        "How does a hash map work?",
+        "Tell me about cloud computing",
+        "Yes please",
+        "What is the time complexity of quicksort?",
+    ],
+}
+
+# Intents that may be dispatched without the LLM router
+ROUTABLE_INTENTS = ("skill_gap", "find_jobs", "courses", "career_plan")
+
+
+@dataclass
+class IntentMatch:
+    intent: str
+    score: float          # best exemplar similarity for `intent`
+    margin: float         # lead over the second-best intent
+    confident: bool       # safe to dispatch without the LLM router
+
+
+class IntentRouter:
+    """Nearest-exemplar classifier over normalized sentence embeddings."""
+
+    def __init__(
+        self,
+        embed_documents: Callable[[List[str]], List[List[float]]],
+        embed_query: Callable[[str], List[float]],
+        exemplars: Dict[str, List[str]] = INTENT_EXEMPLARS,
+        min_similarity: float = INTENT_MIN_SIMILARITY,
+        min_margin: float = INTENT_MIN_MARGIN
+    ):
+        self.embed_query = embed_query
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self.intents = list(exemplars)
+        texts, labels = [], []
+        for label, phrases in enumerate(exemplars.values()):
+            texts.extend(phrases)
+            labels.extend([label] * len(phrases))
+        self._labels = np.asarray(labels)
+        self._matrix = self._normalize(np.asarray(embed_documents(texts), dtype=np.float32))
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+    def classify(self, query: str) -> IntentMatch:
+        vector = self._normalize(np.asarray(self.embed_query(query), dtype=np.float32))
+        similarities = self._matrix @ vector
+        per_intent = np.full(len(self.intents), -1.0, dtype=np.float32)
+        np.maximum.at(per_intent, self._labels, similarities)
+
+        order = np.argsort(-per_intent)
+        best = int(order[0])
+        score = float(per_intent[best])
+        margin = score - float(per_intent[order[1]]) if len(order) > 1 else score
+        intent = self.intents[best]
+        confident = (
+            intent in ROUTABLE_INTENTS
+            and score >= self.min_similarity
+            and margin >= self.min_margin
+        )
+        return IntentMatch(intent=intent, score=score, margin=margin, confident=confident)
+
+    async def aclassify(self, query: str, executor=None) -> IntentMatch:
+        """Like `classify`, but the embedding runs on `executor`, off the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(executor, self.classify, query)
+
+
+@lazy("intent router")
+def get_intent_router() -> IntentRouter:
+    from rag_tools.setup_vectorstore import get_embedder
+    embedder = get_embedder()
+    return IntentRouter(embedder.embed_documents, embedder.embed_query)
+
+
+async def classify_intent(query: str) -> Optional[IntentMatch]:
+    """Classify on the retrieval pool; None when the fast path is disabled."""
+    if not INTENT_ROUTER:
+        return None
+    from rag_tools.setup_vectorstore import get_retrieval_executor
+    return await get_intent_router().aclassify(query, get_retrieval_executor())
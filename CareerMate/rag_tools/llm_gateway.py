@@ -0,0 +1,362 @@
+# rag_tools/llm_gateway.py
+
+import os
+import copy
+import json
+import time
+import random
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+import httpx
+
+from rag_tools.startup import lazy
+from rag_tools.metrics import incr, observe
+
+# One HTTP client for every model call (the agents' AsyncOpenAI and the RAG
+# chains' ChatOpenAI), whose transport adds, per worker process:
+#   pooling     one tuned keep-alive pool instead of one per SDK client
+#   coalescing  identical non-streaming requests in flight share one upstream call
+#   rate limit  a token bucket on requests and tokens per minute, corrected from the
+#               provider's x-ratelimit-* headers (which count all workers) and
+#               paused for Retry-After on a 429
+#   retries     429 / 5xx / connection errors, exponential backoff with full jitter
+#   hedging     optional: a non-streaming call still unanswered after LLM_HEDGE_AFTER
+#               seconds is sent again and the first answer wins
+# The SDKs' own retries are turned off (max_retries=0) so this is the only policy.
+# `SingleFlight` is also used one level up, to share a whole RAG lookup (retrieval
+# and streamed LLM call) between identical concurrent requests.
+
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "64"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "32"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))                    # seconds, per read
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+
+LLM_COALESCE = os.getenv("LLM_COALESCE", "true").lower() not in ("0", "false", "no")
+LLM_RATE_RPM = float(os.getenv("LLM_RATE_RPM", "0"))                   # 0 = until the provider says
+LLM_RATE_TPM = float(os.getenv("LLM_RATE_TPM", "0"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_RETRY_BASE = float(os.getenv("LLM_RETRY_BASE", "0.5"))             # seconds
+LLM_RETRY_MAX = float(os.getenv("LLM_RETRY_MAX", "20"))
+LLM_HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER", "0"))             # 0 = no hedging
+
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+RETRY_ERRORS = (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+CHARS_PER_TOKEN = 4
+DEFAULT_COMPLETION_TOKENS = 512     # budgeted when a request sets no max_tokens
+
+# ---------------- Single flight ----------------
+
+class Flight:
+    """A leader's claim on a key; resolve it with the result, or close it with the error."""
+
+    def __init__(self, group: "SingleFlight", key: Hashable, future: asyncio.Future):
+        self.group = group
+        self.key = key
+        self.future = future
+
+    def resolve(self, value):
+        if not self.future.done():
+            self.future.set_result(value)
+        self.close()
+        return value
+
+    def close(self, error: Optional[BaseException] = None) -> None:
+        """Release the key. Followers get `error`; if the leader gave up they run the call themselves."""
+        if self.group._flights.get(self.key) is self.future:
+            del self.group._flights[self.key]
+        if self.future.done():
+            return
+        if error is None or isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+            self.future.cancel()
+        else:
+            self.future.set_exception(error)
+            self.future.exception()  # followers re-raise it; don't log it as unretrieved
+
+    def __enter__(self) -> "Flight":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.close(exc)
+        return False
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent async calls: the first caller of a key runs it,
+    callers arriving while it is in flight await the same result. Nothing is kept
+    afterwards (that is the answer caches' job). Results are deep-copied for
+    followers unless `copy_results=False`.
+    """
+
+    def __init__(self, name: str, copy_results: bool = True):
+        self.name = name
+        self.copy_results = copy_results
+        self._flights: Dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def lead(self, key: Hashable) -> Flight:
+        future = asyncio.get_running_loop().create_future()
+        self._flights[key] = future
+        incr("singleflight_calls_total", flight=self.name, role="leader")
+        return Flight(self, key, future)
+
+    async def wait(self, key: Hashable) -> Tuple[bool, Any]:
+        """(True, result) if an identical call was in flight, else (False, None)."""
+        loop = asyncio.get_running_loop()
+        while True:
+            future = self._flights.get(key)
+            if future is None or future.get_loop() is not loop:
+                return False, None
+            incr("singleflight_calls_total", flight=self.name, role="follower")
+            try:
+                result = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise           # this caller was cancelled
+                continue            # the leader was: try again, possibly as the leader
+            return True, copy.deepcopy(result) if self.copy_results else result
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        shared, result = await self.wait(key)
+        if shared:
+            return result
+        with self.lead(key) as flight:
+            return flight.resolve(await fn())
+
+# ---------------- Rate limit ----------------
+
+def _duration(value: Optional[str]) -> Optional[float]:
+    """'20ms', '1.5s', '6m0s' (x-ratelimit-reset-*) or plain seconds -> seconds."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    seconds, number = 0.0, ""
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    i = 0
+    while i < len(value):
+        if value[i].isdigit() or value[i] == ".":
+            number += value[i]
+            i += 1
+            continue
+        unit = "ms" if value.startswith("ms", i) else value[i]
+        if unit not in units or not number:
+            return None
+        seconds += float(number) * units[unit]
+        number = ""
+        i += len(unit)
+    return seconds
+
+
+def retry_after(headers: httpx.Headers) -> Optional[float]:
+    if "retry-after-ms" in headers:
+        return _duration(headers["retry-after-ms"] + "ms")
+    return _duration(headers.get("retry-after"))
+
+
+class TokenBucket:
+    """
+    Requests and tokens per minute. Starts from LLM_RATE_RPM / LLM_RATE_TPM (0 =
+    unlimited); the provider's limit and remaining headers then take over. Only
+    touched from the event loop, so there is no lock.
+    """
+
+    def __init__(self, rpm: float = LLM_RATE_RPM, tpm: float = LLM_RATE_TPM):
+        self.limits = {"requests": rpm, "tokens": tpm}
+        self.levels = dict(self.limits)
+        self._refilled = time.monotonic()
+        self._paused_until = 0.0
+
+    def _refill(self) -> float:
+        now = time.monotonic()
+        elapsed, self._refilled = now - self._refilled, now
+        for kind, limit in self.limits.items():
+            if limit:
+                self.levels[kind] = min(limit, self.levels[kind] + elapsed * limit / 60)
+        return now
+
+    def _reserve(self, tokens: float) -> float:
+        """Take the budget and return 0, or return how long to wait for it."""
+        now = self._refill()
+        if now < self._paused_until:
+            return self._paused_until - now
+        cost = {"requests": 1.0, "tokens": tokens}
+        wait = 0.0
+        for kind, limit in self.limits.items():
+            if limit:
+                need = min(cost[kind], limit)  # a request larger than the bucket still gets through
+                wait = max(wait, (need - self.levels[kind]) * 60 / limit)
+        if wait > 0:
+            return wait
+        for kind, limit in self.limits.items():
+            if limit:
+                self.levels[kind] -= min(cost[kind], limit)
+        return 0.0
+
+    async def acquire(self, tokens: float) -> float:
+        """Wait until the request fits; returns the seconds waited."""
+        waited = 0.0
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return waited
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def try_acquire(self, tokens: float) -> bool:
+        return self._reserve(tokens) <= 0
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def update(self, headers: httpx.Headers) -> None:
+        """Follow x-ratelimit-limit-* / x-ratelimit-remaining-* (per minute, as OpenAI reports them)."""
+        self._refill()
+        for kind in self.limits:
+            try:
+                limit = float(headers.get(f"x-ratelimit-limit-{kind}", self.limits[kind]))
+                remaining = float(headers.get(f"x-ratelimit-remaining-{kind}", limit))
+            except ValueError:
+                continue
+            if limit and not self.limits[kind]:
+                self.levels[kind] = remaining   # first time the provider names a limit
+            self.limits[kind] = limit
+            if limit:
+                self.levels[kind] = min(self.levels[kind], remaining)
+
+# ---------------- Transport ----------------
+
+def _request_info(request: httpx.Request) -> Tuple[bool, float]:
+    """(streaming?, estimated tokens) from a JSON request body."""
+    try:
+        body = json.loads(request.content or b"{}")
+    except ValueError:
+        return False, 0.0
+    if not isinstance(body, dict):
+        return False, 0.0
+    completion = body.get("max_completion_tokens") or body.get("max_tokens") or DEFAULT_COMPLETION_TOKENS
+    return bool(body.get("stream")), len(request.content) / CHARS_PER_TOKEN + completion
+
+
+def _backoff(attempt: int) -> float:
+    return random.uniform(0, min(LLM_RETRY_MAX, LLM_RETRY_BASE * 2 ** attempt))
+
+
+async def _drain(response: httpx.Response) -> tuple:
+    """Read a whole response off the connection: (status, headers, raw body, extensions)."""
+    try:
+        body = b"".join([chunk async for chunk in response.stream])   # raw bytes, still encoded
+    finally:
+        await response.aclose()
+    extensions = {k: v for k, v in response.extensions.items() if k != "network_stream"}
+    return response.status_code, response.headers.multi_items(), body, extensions
+
+
+def _replay(request: httpx.Request, drained: tuple) -> httpx.Response:
+    status, headers, body, extensions = drained
+    return httpx.Response(status, headers=headers, stream=httpx.ByteStream(body), request=request, extensions=extensions)
+
+
+class GatewayTransport(httpx.AsyncBaseTransport):
+    """httpx transport with coalescing, rate limiting, retries and hedging (see module comment)."""
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None, limiter: Optional[TokenBucket] = None):
+        self.transport = transport or httpx.AsyncHTTPTransport(limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        ))
+        self.limiter = limiter or TokenBucket()
+        self.flights = SingleFlight("llm_http", copy_results=False)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        stream, tokens = _request_info(request)
+        if stream or not LLM_COALESCE or request.method != "POST":
+            return await self._send(request, stream, tokens)
+
+        key = (str(request.url), hashlib.sha1(request.content).hexdigest())
+        drained = await self.flights.do(key, lambda: self._send_drained(request, tokens))
+        return _replay(request, drained)
+
+    async def _send_drained(self, request: httpx.Request, tokens: float) -> tuple:
+        return await _drain(await self._send(request, False, tokens))
+
+    async def _send(self, request: httpx.Request, stream: bool, tokens: float) -> httpx.Response:
+        attempt = 0
+        while True:
+            waited = await self.limiter.acquire(tokens)
+            if waited:
+                observe("llm_gateway_wait_seconds", waited)
+            last = attempt >= LLM_MAX_RETRIES
+            try:
+                if LLM_HEDGE_AFTER and not stream:
+                    response = await self._hedged(request, tokens)
+                else:
+                    response = await self.transport.handle_async_request(request)
+            except RETRY_ERRORS as exc:
+                if last:
+                    raise
+                incr("llm_gateway_retries_total", reason=type(exc).__name__)
+                await asyncio.sleep(_backoff(attempt))
+                attempt += 1
+                continue
+
+            self.limiter.update(response.headers)
+            if response.status_code not in RETRY_STATUSES or last:
+                incr("llm_gateway_requests_total", status=str(response.status_code))
+                return response
+            delay = retry_after(response.headers)
+            if response.status_code == 429:
+                delay = delay or _duration(response.headers.get("x-ratelimit-reset-requests")) or _backoff(attempt)
+                self.limiter.pause(delay)   # every caller holds off, not just this one
+            await response.aclose()
+            incr("llm_gateway_retries_total", reason=str(response.status_code))
+            await asyncio.sleep(min(LLM_RETRY_MAX, delay) if delay else _backoff(attempt))
+            attempt += 1
+
+    async def _read(self, request: httpx.Request) -> httpx.Response:
+        return _replay(request, await _drain(await self.transport.handle_async_request(request)))
+
+    async def _hedged(self, request: httpx.Request, tokens: float) -> httpx.Response:
+        """Send once; if still unanswered after LLM_HEDGE_AFTER, send again (budget permitting) and take the first."""
+        first = asyncio.ensure_future(self._read(request))
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=LLM_HEDGE_AFTER)
+            if done or not self.limiter.try_acquire(tokens):
+                return await first
+            incr("llm_gateway_hedges_total")
+            tasks.append(asyncio.ensure_future(self._read(request)))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        incr("llm_gateway_hedge_wins_total", winner="original" if task is first else "hedge")
+                        return task.result()
+            return first.result()   # both failed: raise the original's error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+# ---------------- Clients ----------------
+
+@lazy("llm http client")
+def get_http_client() -> httpx.AsyncClient:
+    """The shared async HTTP client for all model calls (one per process; no connection is opened until used)."""
+    return httpx.AsyncClient(
+        transport=GatewayTransport(),
+        timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+    )
@@ -2,28 +2,49 @@
 
 import os
 from dotenv import load_dotenv
-from openai import AsyncOpenAI
-from langchain_openai import ChatOpenAI
+
+from rag_tools.startup import lazy
 
 # ✅ Load environment variables from .env file
 load_dotenv()
 
-
-print("API Key:", os.getenv("API_KEY"))
-
 BASE_URL = os.getenv("BASE_URL")
 API_KEY = os.getenv("API_KEY")
 MODEL_NAME = os.getenv("MODEL_NAME")
-
-if not BASE_URL or not API_KEY or not MODEL_NAME:
-    raise ValueError("Please set BASE_URL, API_KEY, and MODEL_NAME in your .env file")
-
-# Initialize OpenAI client
-
-llm = ChatOpenAI(
-    base_url=BASE_URL,
-    api_key=API_KEY,
-    model=MODEL_NAME,
-    temperature=0.3,
-   streaming=False
-)
+# Stream tokens from the RAG chains (set LLM_STREAMING=false for endpoints without SSE support)
+LLM_STREAMING = os.getenv("LLM_STREAMING", "true").lower() not in ("0", "false", "no")
+# Ask for token usage on streamed responses (stream_options.include_usage) for the LLM metrics
+LLM_STREAM_USAGE = os.getenv("LLM_STREAM_USAGE", "true").lower() not in ("0", "false", "no")
+
+
+@lazy("llm client")
+def get_llm():
+    """The LangChain chat model, created on first use."""
+    from langchain_openai import ChatOpenAI
+    from rag_tools.tracing import LLMMetricsHandler
+    from rag_tools.llm_gateway import LLM_TIMEOUT, get_http_client
+
+    if not BASE_URL or not API_KEY or not MODEL_NAME:
+        raise ValueError("Please set BASE_URL, API_KEY, and MODEL_NAME in your .env file")
+
+    # Initialize OpenAI client; calls go through the shared gateway client, which
+    # also owns retries (see llm_gateway.py). The chains only call it async.
+    return ChatOpenAI(
+        base_url=BASE_URL,
+        api_key=API_KEY,
+        model=MODEL_NAME,
+        temperature=0.3,
+        streaming=LLM_STREAMING,
+        stream_usage=LLM_STREAM_USAGE,
+        callbacks=[LLMMetricsHandler()],
+        http_async_client=get_http_client(),
+        max_retries=0,
+        timeout=LLM_TIMEOUT
+    )
+
+
+def __getattr__(name: str):
+    # `from rag_tools.llm_loader import llm` keeps working, but loads lazily
+    if name == "llm":
+        return get_llm()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
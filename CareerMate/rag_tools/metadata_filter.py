@@ -0,0 +1,128 @@
+# rag_tools/metadata_filter.py
+
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+
+# Bitmap index over chunk metadata, used to restrict dense and BM25 search to the
+# chunks that satisfy a user's hard constraints before anything is scored.
+#
+# One packed bitmap (1 bit per chunk row) is kept per (field, value). A filter is
+#   {"location": "Delhi", "work_type": "remote", "involvement": ["full-time", "contract"]}
+# Values within a field are OR-ed, fields are AND-ed.
+
+FILTER_FIELDS = ("location", "work_type", "involvement", "industry", "level")
+
+# Placeholders the CSV uses for missing values; such rows never match a filter on that field
+MISSING_VALUES = {"", "notavilable", "notavailable", "na", "nan", "none"}
+
+# Location words that don't identify a place ("Greater Bengaluru Area")
+LOCATION_STOPWORDS = {"greater", "area", "region", "metropolitan", "urban", "district", "city"}
+LOCATION_ALIASES = {
+    "bangalore": "bengaluru",
+    "gurgaon": "gurugram",
+    "bombay": "mumbai",
+    "trivandrum": "thiruvananthapuram",
+    "calcutta": "kolkata",
+    "madras": "chennai",
+}
+
+FilterValue = Union[str, Sequence[str]]
+
+
+def normalize_value(value) -> Optional[str]:
+    """Case-, space- and punctuation-insensitive key: "On-site" and "onsite" match."""
+    if value is None:
+        return None
+    key = re.sub(r"[^a-z0-9]", "", str(value).lower())
+    if key.endswith("level") and key != "level":  # "Mid-Senior level" == "mid-senior"
+        key = key[:-len("level")]
+    return None if key in MISSING_VALUES else key
+
+
+def location_terms(value) -> List[str]:
+    """Place words of a location string: "New Delhi, Delhi" -> ["new", "delhi"]."""
+    if value is None:
+        return []
+    words = re.findall(r"[a-z0-9]+", str(value).lower())
+    terms = [LOCATION_ALIASES.get(w, w) for w in words if w not in LOCATION_STOPWORDS]
+    return list(dict.fromkeys(t for t in terms if t not in MISSING_VALUES))
+
+
+class MetadataIndex:
+    """
+    Packed bitmaps over the chunk store's metadata. `location` is indexed by
+    place word so that "Delhi" matches "New Delhi, Delhi" and "Delhi Cantonment, Delhi".
+    """
+
+    def __init__(self, metadatas: Iterable[dict], fields: Sequence[str] = FILTER_FIELDS):
+        self.fields = tuple(fields)
+        postings: Dict[str, Dict[str, List[int]]] = {f: {} for f in self.fields}
+        count = 0
+        for row, meta in enumerate(metadatas):
+            count += 1
+            for field in self.fields:
+                keys = location_terms(meta.get(field)) if field == "location" else [normalize_value(meta.get(field))]
+                for key in keys:
+                    if key is not None:
+                        postings[field].setdefault(key, []).append(row)
+
+        self.count = count
+        self._bitmaps: Dict[str, Dict[str, np.ndarray]] = {}
+        for field, values in postings.items():
+            self._bitmaps[field] = {}
+            for key, rows in values.items():
+                bits = np.zeros(count, dtype=bool)
+                bits[rows] = True
+                self._bitmaps[field][key] = np.packbits(bits)
+
+    @classmethod
+    def from_store(cls, store, fields: Sequence[str] = FILTER_FIELDS) -> "MetadataIndex":
+        return cls(store.iter_metadata(), fields)
+
+    def values(self, field: str) -> List[str]:
+        """Indexed keys of a field (normalized), for debugging and UIs."""
+        return sorted(self._bitmaps.get(field, {}))
+
+    def _empty(self) -> np.ndarray:
+        return np.zeros((self.count + 7) // 8, dtype=np.uint8)
+
+    def _value_bitmap(self, field: str, value: str) -> np.ndarray:
+        bitmaps = self._bitmaps[field]
+        if field == "location":
+            terms = location_terms(value)
+            if not terms:
+                return self._empty()
+            bitmap = bitmaps.get(terms[0], self._empty())
+            for term in terms[1:]:  # every place word must match
+                bitmap = bitmap & bitmaps.get(term, self._empty())
+            return bitmap
+        return bitmaps.get(normalize_value(value), self._empty())
+
+    def bitmap(self, filters: Optional[Dict[str, FilterValue]]) -> Optional[np.ndarray]:
+        """Packed bitmap of rows matching `filters`; None when nothing is constrained."""
+        result = None
+        for field, value in (filters or {}).items():
+            if value is None or value == [] or value == "":
+                continue
+            if field not in self._bitmaps:
+                raise ValueError(f"Unknown filter field {field!r}; indexed fields: {', '.join(self.fields)}")
+            values = [value] if isinstance(value, str) else list(value)
+            field_bitmap = self._empty()
+            for v in values:
+                field_bitmap |= self._value_bitmap(field, v)
+            result = field_bitmap if result is None else result & field_bitmap
+        return result
+
+    def mask(self, filters: Optional[Dict[str, FilterValue]]) -> Optional[np.ndarray]:
+        """Boolean mask over chunk rows, or None when nothing is constrained."""
+        bitmap = self.bitmap(filters)
+        if bitmap is None:
+            return None
+        return np.unpackbits(bitmap, count=self.count).astype(bool)
+
+    def rows(self, filters: Optional[Dict[str, FilterValue]]) -> Optional[np.ndarray]:
+        """Sorted chunk rows matching `filters`, or None when nothing is constrained."""
+        mask = self.mask(filters)
+        return None if mask is None else np.flatnonzero(mask)
@@ -0,0 +1,233 @@
+# rag_tools/metrics.py
+
+import os
+import glob
+import json
+import time
+import bisect
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# In-process counters and histograms, labelled like Prometheus series:
+#   incr("structured_output_responses_total", flow="jobs", result="malformed")
+#   observe("stage_seconds", 0.012, stage="retrieval.dense")
+# `render_prometheus()` exposes them in the text format (GET /metrics on serve.py).
+# Pre-forked workers call `enable_multiprocess(dir)` so a scrape merges every worker's series.
+
+# Upper bounds in seconds, and for counts (chunks, tokens, batch sizes)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+COUNT_BUCKETS = (0, 1, 2, 3, 4, 6, 8, 12, 16)   # small per-turn counts (handoffs, model calls)
+
+Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+_counters: Dict[Key, float] = {}
+_histograms: Dict[Key, list] = {}               # key -> [bucket counts, sum, count]
+_buckets: Dict[str, Sequence[float]] = {}        # histogram name -> bucket bounds
+_lock = threading.Lock()
+
+
+def _key(name: str, labels: Dict[str, str]) -> Key:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def incr(name: str, value: float = 1, **labels) -> None:
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def get(name: str, **labels) -> float:
+    """Sum of every series of `name` whose labels include `labels`."""
+    wanted = set(_key(name, labels)[1])
+    with _lock:
+        return sum(v for (n, series), v in _counters.items() if n == name and wanted <= set(series))
+
+
+def observe(name: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS, **labels) -> None:
+    """Add one observation to histogram `name`. Bucket bounds are fixed by the first call."""
+    key = _key(name, labels)
+    with _lock:
+        bounds = _buckets.setdefault(name, tuple(buckets))
+        series = _histograms.get(key)
+        if series is None:
+            series = _histograms[key] = [[0] * len(bounds), 0.0, 0]
+        i = bisect.bisect_left(bounds, value)
+        if i < len(bounds):
+            series[0][i] += 1
+        series[1] += value
+        series[2] += 1
+
+
+def histogram(name: str, **labels) -> Dict[str, float]:
+    """count / sum / mean over every series of `name` whose labels include `labels`."""
+    wanted = set(_key(name, labels)[1])
+    count, total = 0, 0.0
+    with _lock:
+        for (n, series), (_, series_sum, series_count) in _histograms.items():
+            if n == name and wanted <= set(series):
+                count += series_count
+                total += series_sum
+    return {"count": count, "sum": total, "mean": total / count if count else 0.0}
+
+
+def _series(name: str, labels: Tuple[Tuple[str, str], ...]) -> str:
+    label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+    return f"{name}{{{label_text}}}" if label_text else name
+
+
+def snapshot() -> Dict[str, float]:
+    """All series as `name{label="value",...}` -> value (histograms as _count and _sum)."""
+    with _lock:
+        items = list(_counters.items())
+        items += [((f"{n}_count", labels), h[2]) for (n, labels), h in _histograms.items()]
+        items += [((f"{n}_sum", labels), h[1]) for (n, labels), h in _histograms.items()]
+    return {_series(name, labels): value for (name, labels), value in sorted(items)}
+
+
+def _state() -> tuple:
+    """A copy of this process's counters, histograms and bucket bounds."""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: (list(h[0]), h[1], h[2]) for key, h in _histograms.items()}
+        buckets = dict(_buckets)
+    return counters, histograms, buckets
+
+
+def render_prometheus() -> str:
+    """
+    Counters and histograms in the Prometheus text exposition format. With
+    `enable_multiprocess`, the series of every process sharing the directory are summed.
+    """
+    counters, histograms, buckets = _merged_state() if _dir else _state()
+    counters = sorted(counters.items())
+    histograms = sorted(histograms.items())
+
+    lines: List[str] = []
+    typed = set()
+    for (name, labels), value in counters:
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{_series(name, labels)} {value:g}")
+    for (name, labels), (counts, total, count) in histograms:
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} histogram")
+        cumulative = 0
+        for bound, bucket_count in zip(buckets[name], counts):
+            cumulative += bucket_count
+            lines.append(f"{_series(name + '_bucket', labels + (('le', f'{bound:g}'),))} {cumulative}")
+        lines.append(f"{_series(name + '_bucket', labels + (('le', '+Inf'),))} {count}")
+        lines.append(f"{_series(name + '_sum', labels)} {total:g}")
+        lines.append(f"{_series(name + '_count', labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _buckets.clear()
+
+# ---------------- Multi-process ----------------
+# Each worker writes its series to <dir>/<pid>-<start>.json every METRICS_FLUSH_SECONDS
+# and a scrape sums every file with the live series of the worker that answers, the way
+# prometheus_client's multiprocess mode does. Files of exited workers are kept, so the
+# totals never go backwards when a worker is replaced; wipe the directory between runs.
+
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "1.0"))
+
+_dir: Optional[str] = None
+_file: Optional[str] = None
+_stop = threading.Event()
+
+
+def enable_multiprocess(directory: str) -> None:
+    """Share this process's series through `directory`; call in each worker after fork()."""
+    global _dir, _file
+    os.makedirs(directory, exist_ok=True)
+    _dir = directory
+    _file = os.path.join(directory, f"{os.getpid()}-{time.time_ns()}.json")
+    _stop.clear()
+    write_snapshot()
+    threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True).start()
+
+
+def _flush_loop() -> None:
+    while not _stop.wait(METRICS_FLUSH_SECONDS):
+        try:
+            write_snapshot()
+        except OSError as e:
+            print(f"⚠️ Could not write metrics to {_file}: {e}")
+
+
+def write_snapshot() -> None:
+    """Atomically replace this process's file in the shared directory."""
+    path = _file
+    if path is None:
+        return
+    counters, histograms, buckets = _state()
+    record = {
+        "counters": [[name, labels, value] for (name, labels), value in counters.items()],
+        "histograms": [[name, labels, *h] for (name, labels), h in histograms.items()],
+        "buckets": buckets,
+    }
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(record, f)
+    os.replace(tmp, path)
+
+
+def stop_multiprocess() -> None:
+    """Stop the flush thread, write the final series and go back to process-local metrics."""
+    global _dir, _file
+    _stop.set()
+    write_snapshot()
+    _dir = _file = None
+
+
+def _merged_state() -> tuple:
+    """This process's live series plus the last snapshot of every other process."""
+    counters, histograms, buckets = _state()
+    for path in glob.glob(os.path.join(_dir, "*.json")):
+        if path == _file:
+            continue
+        try:
+            with open(path) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            continue  # replaced or half-written; the next scrape picks it up
+        for name, bounds in record["buckets"].items():
+            buckets.setdefault(name, tuple(bounds))
+        for name, labels, value in record["counters"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, counts, total, count in record["histograms"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            if len(counts) != len(buckets[name]):
+                continue
+            mine = histograms.get(key)
+            if mine is None:
+                histograms[key] = (list(counts), total, count)
+            else:
+                histograms[key] = ([a + b for a, b in zip(mine[0], counts)], mine[1] + total, mine[2] + count)
+    return counters, histograms, buckets
+
+# ---------------- Structured output ----------------
+
+def record_structured_output(flow: str, valid: int, invalid: int, malformed: bool = False) -> None:
+    """
+    One LLM response parsed into `valid` objects with `invalid` ones rejected.
+    `malformed` means the response was not parseable at all.
+    """
+    failed = malformed or invalid > 0
+    incr("structured_output_responses_total", flow=flow, result="failed" if failed else "ok")
+    incr("structured_output_items_total", valid, flow=flow, result="valid")
+    incr("structured_output_items_total", invalid, flow=flow, result="invalid")
+
+
+def parse_failure_rate(flow: str) -> float:
+    """Share of `flow` responses with a malformed payload or at least one rejected object."""
+    total = get("structured_output_responses_total", flow=flow)
+    return get("structured_output_responses_total", flow=flow, result="failed") / total if total else 0.0
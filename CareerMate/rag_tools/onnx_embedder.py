@@ -0,0 +1,147 @@
+# rag_tools/onnx_embedder.py
+
+import os
+import time
+import argparse
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# all-MiniLM-L6-v2 on ONNX Runtime with int8 (dynamic) quantized weights: same
+# vectors (mean pooling + L2 normalization) as HuggingFaceEmbeddings within
+# quantization error, several times faster per query on CPU and without torch
+# at serving time. Selected with EMBEDDER=onnx (see setup_vectorstore.get_embedder).
+#
+# Needs `onnxruntime` and `tokenizers`. Export and quantize once (this step also
+# needs `torch` and `transformers`), then compare against the PyTorch model:
+#     python -m rag_tools.onnx_embedder --export
+#     python -m rag_tools.onnx_embedder --check
+
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "rag_tools/onnx_minilm")
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))    # 0 = onnxruntime default
+SOURCE_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+MAX_TOKENS = 256        # the model's max_seq_length
+MODEL_FILE = "model_int8.onnx"
+
+
+class OnnxEmbeddings(Embeddings):
+    """LangChain `Embeddings` over an exported MiniLM; thread-safe, like the PyTorch one."""
+
+    def __init__(self, model_dir: str = ONNX_MODEL_DIR, batch_size: int = 32, threads: int = ONNX_THREADS):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path = os.path.join(model_dir, MODEL_FILE)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"{model_path} not found; run `python -m rag_tools.onnx_embedder --export` first.")
+
+        self.batch_size = batch_size
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_TOKENS)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        out = []
+        for start in range(0, len(texts), self.batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + self.batch_size])
+            input_ids = np.asarray([e.ids for e in encodings], dtype=np.int64)
+            mask = np.asarray([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {"input_ids": input_ids, "attention_mask": mask}
+            if "token_type_ids" in self._input_names:
+                feeds["token_type_ids"] = np.zeros_like(input_ids)
+            hidden = self.session.run(None, feeds)[0]
+
+            # Mean pooling over real tokens, then L2 normalization (as sentence-transformers does)
+            weights = mask[..., None].astype(np.float32)
+            pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            out.append(pooled.astype(np.float32))
+        return np.vstack(out) if out else np.empty((0, 384), dtype=np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0].tolist()
+
+# ---------------- Export ----------------
+
+def export(model_dir: str = ONNX_MODEL_DIR, source_model: str = SOURCE_MODEL) -> str:
+    """Export the transformer to ONNX, quantize its weights to int8 and save the tokenizer."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    os.makedirs(model_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(source_model)
+    model = AutoModel.from_pretrained(source_model).eval()
+    sample = tokenizer(["CareerMate export sample"], return_tensors="pt")
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic = {0: "batch", 1: "sequence"}
+
+    fp32_path = os.path.join(model_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(sample[name] for name in names), fp32_path,
+            input_names=names, output_names=["last_hidden_state"],
+            dynamic_axes={name: dynamic for name in [*names, "last_hidden_state"]},
+            opset_version=14,
+        )
+    int8_path = os.path.join(model_dir, MODEL_FILE)
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    os.remove(fp32_path)
+    tokenizer.backend_tokenizer.save(os.path.join(model_dir, "tokenizer.json"))
+    print(f"✅ int8 model saved to {int8_path} ({os.path.getsize(int8_path) / 2 ** 20:.1f} MB)")
+    return int8_path
+
+
+def check(model_dir: str = ONNX_MODEL_DIR, n: int = 200, csv_path: str = "IT_jobs.csv") -> dict:
+    """Cosine agreement with the PyTorch embedder and per-query latency of both."""
+    import pandas as pd
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    df = pd.read_csv(csv_path)
+    texts = (df["designation"].astype(str) + " " + df["job_details"].astype(str).str[:300]).head(n).tolist()
+    embedders = {"pytorch": HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2"), "onnx-int8": OnnxEmbeddings(model_dir)}
+
+    vectors, report = {}, {}
+    for name, embedder in embedders.items():
+        embedder.embed_query("warm up")
+        latencies = []
+        for text in texts:
+            start = time.perf_counter()
+            embedder.embed_query(text)
+            latencies.append((time.perf_counter() - start) * 1000)
+        vectors[name] = np.asarray(embedder.embed_documents(texts), dtype=np.float32)
+        report[f"{name}_p50_ms"] = round(float(np.percentile(latencies, 50)), 2)
+    cosine = (vectors["pytorch"] * vectors["onnx-int8"]).sum(axis=1)
+    report["cosine_mean"] = round(float(cosine.mean()), 4)
+    report["cosine_min"] = round(float(cosine.min()), 4)
+    print(report)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export / check the int8 ONNX MiniLM embedder.")
+    parser.add_argument("--export", action="store_true", help=f"Export {SOURCE_MODEL} to {ONNX_MODEL_DIR}")
+    parser.add_argument("--check", action="store_true", help="Compare vectors and latency with the PyTorch model")
+    parser.add_argument("--model-dir", default=ONNX_MODEL_DIR)
+    args = parser.parse_args()
+    if args.export:
+        export(args.model_dir)
+    if args.check:
+        check(args.model_dir)
+    if not (args.export or args.check):
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
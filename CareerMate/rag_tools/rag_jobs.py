@@ -1,39 +1,41 @@
 # rag_tools/rag_jobs.py
 
-from langchain.prompts import ChatPromptTemplate
-from langchain_core.documents import Document
-from langchain.schema import BaseRetriever
-from openai import AsyncOpenAI
-from typing import List, Optional
-from pydantic import BaseModel
-from rag_tools.setup_vectorstore import hybrid_retriever
-from rag_tools.llm_loader import llm
-
-# NEW IMPORTS
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain.chains.retrieval import create_retrieval_chain
-from agents import function_tool
+from typing import AsyncIterator, Dict, List, Optional
+from pydantic import BaseModel, ValidationError, field_validator
+from rag_tools.setup_vectorstore import get_hybrid_retriever, get_embedder, get_retrieval_executor
+from rag_tools.llm_loader import get_llm
+from rag_tools.startup import lazy
+
+from rag_tools.chain_registry import get_rag_chain, get_document_chain
+from rag_tools.context_builder import get_context_retriever, apack_context
+from rag_tools.answer_cache import AnswerCache
+from rag_tools.llm_gateway import SingleFlight
+from rag_tools.metrics import record_structured_output
+from rag_tools.tracing import start_span, end_span, record_context
+
+MAX_JOBS = 3
 
 # ---------------- Prompt ----------------
 
-qa_prompt_for_jobs = ChatPromptTemplate.from_messages([
-    ("system",
-     "You are a helpful assistant who matches job seekers to relevant job listings.\n"
-     "Given the following context from job postings, extract only the top 3 most relevant job listings that match the following:\n"
-     "- User skills\n"
-     "- Preferred location (if given)\n"
-     "- Job involvement (e.g. full-time or part-time)\n"
-     "- Work type (e.g. remote, on-site, hybrid)\n\n"
-     "Only use the job information from the context. Do NOT invent job titles or details.\n\n"
-     "Format the output like:\n"
-     "1. **Job Title** at (Company name) (Location)\n"
-     "   - Type: [Full-time/Part-time], [Remote/On-site/Hybrid]\n"
-     "   - Requirements: [...]\n"
-     "   - Description: ...\n\n"
-     "   - Contact information: (include only if available...)\n\n"
-     "Context:\n{context}"),
-    ("user", "{input}")
-])
+@lazy("jobs prompt")
+def get_jobs_prompt():
+    # langchain_core.prompts pulls in langsmith; build on first use
+    from langchain_core.prompts import ChatPromptTemplate
+
+    return ChatPromptTemplate.from_messages([
+        ("system",
+         "You are a helpful assistant who matches job seekers to relevant job listings.\n"
+         "Given the following context from job postings, extract only the top 3 job listings that best match the user's skills and job title.\n"
+         "The postings have already been filtered by the user's location, involvement and work type.\n\n"
+         "Only use the job information from the context. Do NOT invent job titles or details.\n\n"
+         "Respond with JSON only, no prose and no code fences, best match first:\n"
+         '{{"jobs": [{{"title": "...", "company": "...", "location": "City, State", '
+         '"requirements": ["...", "..."], "description": "one or two sentences", "contact": null}}]}}\n'
+         'Use "Not specified" for a company that is not in the context, and null for a missing contact. '
+         'If no posting fits, return {{"jobs": []}}.\n\n'
+         "Context:\n{context}"),
+        ("user", "{input}")
+    ])
 
 # ---------------- Output Schema ----------------
 
@@ -45,91 +47,200 @@ class JobListing(BaseModel):
     description: str
     contact: Optional[str] = None
 
-# ---------------- RAG Job Search Tool ----------------
+    @field_validator("requirements", mode="before")
+    @classmethod
+    def _split_requirements(cls, value):
+        if isinstance(value, str):
+            return [r.strip() for r in value.split(",") if r.strip()]
+        return value
 
-async def find_jobs_with_rag(
+    @field_validator("contact", mode="before")
+    @classmethod
+    def _empty_contact(cls, value):
+        return value or None
+
+# ---------------- RAG Chain ----------------
+
+@lazy("jobs output parser")
+def get_jobs_parser():
+    # Parses partial JSON too, so `astream` yields the listings as they are generated
+    from langchain_core.output_parsers import JsonOutputParser
+    return JsonOutputParser()
+
+def get_jobs_chain():
+    """Built on first use, then reused by every tool call (see chain_registry)."""
+    return get_rag_chain(get_llm(), get_jobs_prompt(), get_context_retriever(), name="jobs",
+                         output_parser=get_jobs_parser())
+
+def get_jobs_document_chain():
+    """LLM half of the jobs chain; `find_jobs_with_rag` retrieves with filters itself."""
+    return get_document_chain(get_llm(), get_jobs_prompt(), get_context_retriever(), name="jobs",
+                              output_parser=get_jobs_parser())
+
+# ---------------- Answer Cache ----------------
+
+# Hard constraints go into the namespace so only the skill list is matched semantically
+@lazy("jobs answer cache")
+def get_jobs_cache() -> AnswerCache:
+    return AnswerCache(embed_fn=get_embedder().embed_query, executor=get_retrieval_executor(), name="jobs")
+
+# Identical searches in flight at the same time share one retrieval + LLM call
+_flights = SingleFlight("jobs")
+
+def _cache_keys(skills, job_title, location, involvement, work_type):
+    namespace = "jobs|" + "|".join(str(v).lower() for v in (job_title, location, involvement, work_type))
+    query = ", ".join(sorted(s.lower() for s in skills))
+    return namespace, query
+
+async def cached_jobs(
     skills: List[str],
     job_title: Optional[str] = None,
     location: Optional[str] = None,
     involvement: Optional[str] = None,
     work_type: Optional[str] = None
-) -> List[JobListing]:
+) -> Optional[List[JobListing]]:
+    """Answer-cache lookup for a search, for callers that retrieve themselves (see `stream_jobs_with_rag`)."""
+    namespace, query = _cache_keys(skills, job_title, location, involvement, work_type)
+    return await get_jobs_cache().aget(namespace, query, semantic=True)
+
+# ---------------- Query ----------------
+
+def jobs_query(skills: List[str], job_title: Optional[str] = None) -> str:
     """
-    Use RAG to search job listings that match the user's skills, location, involvement, and work type.
+    Natural language query for retrieval and the prompt. Location, involvement and
+    work type are hard constraints: they filter the chunks (`job_filters`) instead
+    of being matched as text.
     """
-    # Build a natural language query
     query_parts = [f"Find jobs requiring: {', '.join(skills)}."]
     if job_title:
-        query_parts.append(f"Job title: {job_title}.")    
-    if location:
-        query_parts.append(f"Location: {location}.")
-    if involvement:
-        query_parts.append(f"Involvement: {involvement}.")
-    if work_type:
-        query_parts.append(f"Work type: {work_type}.")
-    query = " ".join(query_parts)
-
-    # --- REPLACED RetrievalQA with modern create_retrieval_chain pattern ---
-    
-    # 1. Create a chain to combine the documents into a single prompt
-    #    This part knows about the {context} and {input} placeholders
-    document_chain = create_stuff_documents_chain(llm, qa_prompt_for_jobs)
-    
-    # 2. Create the full RAG chain that first retrieves documents, then passes them
-    #    to the document_chain. This chain expects the input key "input".
-    rag_chain = create_retrieval_chain(hybrid_retriever, document_chain)
-
-    # Invoke the chain using the input key "input"
-    response = await rag_chain.ainvoke({"input": query})
-    
-    raw_result = response["answer"]
-    
-    # ... The rest of your code remains the same ...
-    
-    # Parse result into structured list
-    job_blocks = raw_result.split("\n\n")
-    job_list = []
-    for block in job_blocks:
-        lines = block.strip().split("\n")
-        if not lines or len(lines) < 3:
-            continue
+        query_parts.append(f"Job title: {job_title}.")
+    return " ".join(query_parts)
+
+def job_filters(location: Optional[str], involvement: Optional[str], work_type: Optional[str]) -> Dict[str, Optional[str]]:
+    return {"location": location, "involvement": involvement, "work_type": work_type}
+
+# ---------------- RAG Job Search Tool ----------------
+
+def _jobs_in(parsed) -> list:
+    """The (possibly partial) list of job objects in a parsed response."""
+    if isinstance(parsed, dict):
+        parsed = parsed.get("jobs", [])
+    return parsed if isinstance(parsed, list) else []
+
+async def stream_jobs_with_rag(
+    skills: List[str],
+    job_title: Optional[str] = None,
+    location: Optional[str] = None,
+    involvement: Optional[str] = None,
+    work_type: Optional[str] = None,
+    docs: Optional[list] = None
+) -> AsyncIterator[JobListing]:
+    """
+    Like `find_jobs_with_rag`, but yields each `JobListing` as soon as the model
+    has finished generating it. Objects that don't validate are skipped and
+    counted in the `jobs` parse-failure metric.
+
+    `docs` are chunks the caller already retrieved for `jobs_query` with
+    `job_filters`, e.g. batched with other queries; such a caller has checked
+    `cached_jobs` already, so the cache lookup is skipped.
+    """
+    # Not a context-manager span: this generator may be resumed from other contexts
+    handle = start_span("rag.jobs", location=location, involvement=involvement, work_type=work_type)
+    stats = {"cached": False, "jobs": 0}
+    flight = None
+    try:
+        namespace, cache_query = _cache_keys(skills, job_title, location, involvement, work_type)
+        if docs is None:
+            cached = await get_jobs_cache().aget(namespace, cache_query, semantic=True)
+            if cached is not None:
+                stats.update(cached=True, jobs=len(cached))
+                for job in cached:
+                    yield job
+                return
+
+        # Followers get the leader's listings at once, without streaming them
+        shared, jobs = await _flights.wait((namespace, cache_query))
+        if shared:
+            stats.update(shared=True, jobs=len(jobs))
+            for job in jobs:
+                yield job
+            return
+        flight = _flights.lead((namespace, cache_query))
+
+        query = jobs_query(skills, job_title)
+        if docs is None:
+            docs = await get_hybrid_retriever().ainvoke(query, filters=job_filters(location, involvement, work_type))
+        stats["chunks"] = len(docs)
+        if not docs:
+            flight.resolve([])
+            return
+        # One entry per posting, deduplicated and packed to the context token budget
+        docs = await apack_context(docs)
+        record_context("jobs", docs)
+
+        # The parser emits the whole object parsed so far on every token; job i is
+        # complete once job i + 1 has started (or the stream has ended).
+        from langchain_core.exceptions import OutputParserException
+
+        jobs: List[JobListing] = []
+        done = invalid = 0
+        partial: list = []
+        malformed = False
+        seen_json = False
+
+        def accept(raw) -> Optional[JobListing]:
+            nonlocal invalid
+            try:
+                return JobListing.model_validate(raw)
+            except ValidationError:
+                invalid += 1
+                return None
+
         try:
-            header = lines[0]
-            title_part = header.split("**")[1]
-            company_location = header.split(" at ")[1].split(" (")
-            company = company_location[0]
-            location = company_location[1].rstrip(")")
-            type_line = lines[1].replace("Type:", "").strip()
-            involvement_str, work_type_str = [s.strip() for s in type_line.split(",")]
-            requirements_line = lines[2].replace("Requirements:", "").strip()
-            description = ""
-            contact = None
-
-            # Collect description and contact lines from the rest of lines (3 onward)
-            for line in lines[3:]:
-                line = line.strip()
-                if line.lower().startswith("description:"):
-                    # Remove "Description:" and add text to description
-                    description += line[len("Description:"):].strip() + " "
-                elif line.lower().startswith("contact information:"):
-                    # Remove label and assign contact info
-                    contact = line[len("Contact information:"):].strip()
-                else:
-                    # If other lines exist, consider them part of description as well
-                    description += line + " "
-
-            description = description.strip()
-
-            job_list.append(JobListing(
-                title=title_part,
-                company=company,
-                location=location,
-                requirements=[r.strip() for r in requirements_line.split(",")],
-                description=description,
-                contact=contact
-            ))
-        except Exception:
-            continue
-
-    return job_list[:3]
+            async for parsed in get_jobs_document_chain().astream({"input": query, "context": docs}):
+                if isinstance(parsed, (dict, list)):
+                    seen_json = True
+                partial = _jobs_in(parsed)
+                while done < len(partial) - 1 and len(jobs) < MAX_JOBS:
+                    job = accept(partial[done])
+                    done += 1
+                    if job is not None:
+                        jobs.append(job)
+                        yield job
+        except OutputParserException:
+            malformed = True
+        else:
+            malformed = not seen_json  # e.g. the model answered in prose
+            for raw in partial[done:]:
+                if len(jobs) >= MAX_JOBS:
+                    break
+                job = accept(raw)
+                if job is not None:
+                    jobs.append(job)
+                    yield job
 
+        stats.update(jobs=len(jobs), invalid=invalid, malformed=malformed)
+        record_structured_output("jobs", valid=len(jobs), invalid=invalid, malformed=malformed)
+        if jobs and not malformed and not invalid:  # don't pin a failed parse in the cache
+            get_jobs_cache().put(namespace, cache_query, jobs, semantic=True)
+        flight.resolve(jobs)
+    except BaseException as error:  # incl. GeneratorExit when the consumer stops early
+        if flight is not None:
+            flight.close(error)
+        raise
+    finally:
+        end_span(handle, **stats)
+
+async def find_jobs_with_rag(
+    skills: List[str],
+    job_title: Optional[str] = None,
+    location: Optional[str] = None,
+    involvement: Optional[str] = None,
+    work_type: Optional[str] = None
+) -> List[JobListing]:
+    """
+    Use RAG to search job listings that match the user's skills, location, involvement, and work type.
+    """
+    return [
+        job async for job in stream_jobs_with_rag(skills, job_title, location, involvement, work_type)
+    ]
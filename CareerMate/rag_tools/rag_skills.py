@@ -1,73 +1,111 @@
 # rag_tools/rag_skills.py
 
-from langchain_core.documents import Document
-from langchain_core.runnables import Runnable
-from langchain.prompts import ChatPromptTemplate
-from langchain_community.vectorstores import FAISS
-from langchain.schema import BaseRetriever
-from openai import AsyncOpenAI
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel
-import os
 
-# --- NEW IMPORTS ---
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain.chains.retrieval import create_retrieval_chain
-from agents import function_tool
-
-# --- Load RAG components ---
-from rag_tools.setup_vectorstore import hybrid_retriever
-from rag_tools.llm_loader import llm
+# --- RAG components (loaded on first use) ---
+from rag_tools.setup_vectorstore import get_embedder, get_hybrid_retriever, get_retrieval_executor
+from rag_tools.llm_loader import get_llm
+from rag_tools.startup import lazy
+from rag_tools.chain_registry import get_rag_chain, get_document_chain
+from rag_tools.context_builder import get_context_retriever, apack_context
+from rag_tools.answer_cache import AnswerCache, normalize_query
+from rag_tools.llm_gateway import SingleFlight
+from rag_tools.events import emit
+from rag_tools.tracing import span, record_context
 
 
 # --- Define prompt for skill extraction (simplified) ---
-qa_prompt_for_skills = ChatPromptTemplate.from_messages([
-    ("system",
-     "You are a helpful assistant for extracting technical job skills from job descriptions.\n"
-     "Given the following context, extract and list the key required skills for the job title below.\n"
-     "For example: from 'Proficiency in data analysis tools such as SQL, R, and Python' extract only SQL, R, Python"
-     "Another example: from 'Knowledge of databases (e.g., Ms Excel, Google Sheets, SQL, Hadoop, MS Access)' extract only Ms Excel, Google Sheets, SQL, Hadoop, MS Access"
-     "Another example: from 'Familiarity with Machine Learning / AI & Big Data' extract only Machine Learning, AI, Big Data"
-     "Another example: from 'Data visualization tools (e.g., Power BI, Tableau)' extract only Power BI, Tableau"
-     "Remember: Always try to extract the softwares or programming languages or tools, do not extract the whole domain like 'Database development and implementation' or 'Business requirements gathering', etc."
-     "- Use only the content in the context.\n"
-     "- Return a bullet-point list of skills only.\n"
-     "- Do NOT make up any skill not explicitly mentioned.\n\n"
-     "Context:\n{context}"
-    ),
-    ("user", "{input}"),
-])
+@lazy("skills prompt")
+def get_skills_prompt():
+    from langchain_core.prompts import ChatPromptTemplate
+
+    return ChatPromptTemplate.from_messages([
+        ("system",
+         "You are a helpful assistant for extracting technical job skills from job descriptions.\n"
+         "Given the following context, extract and list the key required skills for the job title below.\n"
+         "For example: from 'Proficiency in data analysis tools such as SQL, R, and Python' extract only SQL, R, Python"
+         "Another example: from 'Knowledge of databases (e.g., Ms Excel, Google Sheets, SQL, Hadoop, MS Access)' extract only Ms Excel, Google Sheets, SQL, Hadoop, MS Access"
+         "Another example: from 'Familiarity with Machine Learning / AI & Big Data' extract only Machine Learning, AI, Big Data"
+         "Another example: from 'Data visualization tools (e.g., Power BI, Tableau)' extract only Power BI, Tableau"
+         "Remember: Always try to extract the softwares or programming languages or tools, do not extract the whole domain like 'Database development and implementation' or 'Business requirements gathering', etc."
+         "- Use only the content in the context.\n"
+         "- Return a bullet-point list of skills only.\n"
+         "- Do NOT make up any skill not explicitly mentioned.\n\n"
+         "Context:\n{context}"
+        ),
+        ("user", "{input}"),
+    ])
 
 # --- Output schema ---
 class SkillGapResult(BaseModel):
     missing_skills: List[str]
 
+# --- RAG chain, built once per process ---
+def get_skills_chain():
+    return get_rag_chain(get_llm(), get_skills_prompt(), get_context_retriever(), name="skills")
+
+def get_skills_document_chain():
+    """LLM half of the skills chain; `get_required_skills_with_rag` retrieves itself."""
+    return get_document_chain(get_llm(), get_skills_prompt(), get_context_retriever(), name="skills")
+
+def skills_query(job_title: str) -> str:
+    return f"What are the required skills for a {job_title}?"
+
+# --- Answer cache: exact job title, then semantically similar titles ---
+@lazy("skills answer cache")
+def get_skills_cache() -> AnswerCache:
+    return AnswerCache(embed_fn=get_embedder().embed_query, executor=get_retrieval_executor(), name="skills")
+
+async def cached_required_skills(job_title: str) -> Optional[SkillGapResult]:
+    """Answer-cache lookup, for callers that retrieve themselves (see `get_required_skills_with_rag`)."""
+    return await get_skills_cache().aget("skills", job_title, semantic=True)
+
+# --- Identical lookups in flight at the same time share one retrieval + LLM call ---
+_flights = SingleFlight("skills")
+
 # --- RAG Skill Extraction Tool ---
 
-async def get_required_skills_with_rag(job_title: str) -> SkillGapResult:
+async def get_required_skills_with_rag(job_title: str, docs: Optional[list] = None) -> SkillGapResult:
     """
     Use RAG to extract required skills for a given job title from real job postings.
+    `docs` are chunks the caller already retrieved for `skills_query`, e.g. batched
+    with other queries; such a caller has checked `cached_required_skills` already.
     """
-    query = f"What are the required skills for a {job_title}?"
-    retriever = hybrid_retriever  # already loaded globally
-    
-    # 1. Create a chain to combine the documents into a single prompt
-    #    This part no longer expects 'chat_history'
-    document_chain = create_stuff_documents_chain(llm, qa_prompt_for_skills)
-    
-    # 2. Create the full RAG chain that first retrieves documents, then passes them
-    #    to the document_chain.
-    rag_chain = create_retrieval_chain(retriever, document_chain)
-
-    # Invoke the chain using the correct asynchronous method 'ainvoke'
-    # The input key is "input"
-    response = await rag_chain.ainvoke({"input": query})
-    
-    # The result is now in response["answer"]
-    skills_text = response["answer"]
-    
-    # Process the extracted skills
-    skills = skills_text.split("\n")
-    cleaned_skills = [s.strip("•- ").strip() for s in skills if s.strip()]
-    return SkillGapResult(missing_skills=cleaned_skills)
+    with span("rag.skills", job_title=job_title) as attrs:
+        if docs is None:
+            cached = await cached_required_skills(job_title)
+            attrs["cached"] = cached is not None
+            if cached is not None:
+                return cached
+
+        key = normalize_query(job_title)
+        shared, result = await _flights.wait(key)
+        attrs["shared"] = shared
+        if shared:
+            return result
+
+        with _flights.lead(key) as flight:
+            query = skills_query(job_title)
+            if docs is None:
+                docs = await get_hybrid_retriever().ainvoke(query)
+            # One entry per posting, deduplicated and packed to the context token budget
+            context = await apack_context(docs)
+            record_context("skills", context)
+
+            # Stream the answer; tokens are forwarded to a streaming caller, if
+            # there is one, as they arrive
+            answer = []
+            async for token in get_skills_document_chain().astream({"input": query, "context": context}):
+                if token:
+                    answer.append(token)
+                    emit("rag_token", chain="skills", text=token)
+            skills_text = "".join(answer)
 
+            # Process the extracted skills
+            skills = skills_text.split("\n")
+            cleaned_skills = [s.strip("•- ").strip() for s in skills if s.strip()]
+            attrs["skills"] = len(cleaned_skills)
+            result = SkillGapResult(missing_skills=cleaned_skills)
+            get_skills_cache().put("skills", job_title, result, semantic=True)
+            return flight.resolve(result)
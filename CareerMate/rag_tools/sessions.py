@@ -0,0 +1,429 @@
+# rag_tools/sessions.py
+
+import os
+import copy
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+import weakref
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from rag_tools.startup import lazy
+from rag_tools.metrics import incr, observe, SIZE_BUCKETS
+from rag_tools.tracing import span
+from rag_tools.context_builder import estimate_tokens
+
+# Conversation sessions keyed by user_id: the stored UserContext (skills,
+# preferences, computed missing skills and career plan) plus the turn history.
+#
+# The history sent to the agents is bounded: once the turns exceed
+# SESSION_HISTORY_TOKENS, the oldest ones (all but the last SESSION_KEEP_TURNS)
+# are folded into a rolling summary by one LLM call. That runs after the turn
+# has been answered, in the background, so prompt size and per-turn latency
+# stay flat however long the conversation gets.
+#
+# Storage is pluggable: SESSION_BACKEND=sqlite (default, SESSION_DB_PATH) or
+# memory, or any backend added with `register_backend`. Turns of one user are
+# serialized within a worker. Pre-forked workers can serve the same user at
+# once, so saves are compare-and-swap on a per-session version. Turns are
+# appended, never rewritten, and a save that lost the race re-applies its
+# context changes and new turns to the latest version and tries again.
+
+SESSIONS = os.getenv("SESSIONS", "true").lower() not in ("0", "false", "no")
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "sqlite")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "rag_tools/sessions.db")
+SESSION_HISTORY_TOKENS = int(os.getenv("SESSION_HISTORY_TOKENS", "2000"))
+SESSION_KEEP_TURNS = int(os.getenv("SESSION_KEEP_TURNS", "2"))           # recent turns always kept verbatim
+SESSION_SUMMARY_TOKENS = int(os.getenv("SESSION_SUMMARY_TOKENS", "300"))
+SESSION_SAVE_RETRIES = 8
+
+
+@dataclass
+class Session:
+    user_id: str
+    context: dict = field(default_factory=dict)     # the serialized UserContext
+    summary: str = ""                               # rolling summary of the compacted turns
+    turns: List[dict] = field(default_factory=list) # {"seq", "user", "assistant"} not in the summary, oldest first
+    folded_through: int = -1                        # turns up to this seq are in the summary
+    version: int = 0                                # bumped by every save; 0 = never saved
+    updated_at: float = 0.0
+    new_turns: List[dict] = field(default_factory=list)   # added since the load; get their seq on save
+
+    def add_turn(self, user: str, assistant: str) -> None:
+        turn = {"seq": None, "user": user, "assistant": assistant or ""}
+        self.turns.append(turn)
+        self.new_turns.append(turn)
+
+    def mark_saved(self) -> None:
+        """Called by a backend once `save` has succeeded."""
+        self.version += 1
+        self.new_turns = []
+
+    def history(self) -> List[dict]:
+        """Summary and recent turns as Agents SDK input items, to be followed by the new query."""
+        items = []
+        if self.summary:
+            items.append({"role": "system", "content": f"Summary of the earlier conversation:\n{self.summary}"})
+        for turn in self.turns:
+            items.append({"role": "user", "content": turn["user"]})
+            items.append({"role": "assistant", "content": turn["assistant"]})
+        return items
+
+    def tokens(self) -> int:
+        return estimate_tokens(self.summary) + sum(_turn_tokens(turn) for turn in self.turns)
+
+
+def _turn_tokens(turn: dict) -> int:
+    return estimate_tokens(turn["user"]) + estimate_tokens(turn["assistant"])
+
+# ---------------- Backends ----------------
+
+class SessionBackend:
+    """
+    Blocking session storage; the store calls it from the default executor.
+    `save` is a compare-and-swap: it only writes when the stored version still
+    equals `session.version`, appends `session.new_turns` after the stored turns,
+    drops the turns up to `session.folded_through`, calls `session.mark_saved()`
+    and returns True. Otherwise it writes nothing and returns False.
+    """
+
+    def load(self, user_id: str) -> Optional[Session]:
+        raise NotImplementedError
+
+    def save(self, session: Session) -> bool:
+        raise NotImplementedError
+
+    def delete(self, user_id: str) -> None:
+        raise NotImplementedError
+
+
+def _next_seq(turns: List[dict], folded_through: int) -> int:
+    last = max((turn["seq"] for turn in turns), default=-1)
+    return max(last, folded_through) + 1
+
+
+class MemoryBackend(SessionBackend):
+    """Per-process sessions, for tests and single-process runs. Stored as JSON, so nothing is shared by reference."""
+
+    def __init__(self):
+        self._sessions: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def load(self, user_id: str) -> Optional[Session]:
+        with self._lock:
+            data = self._sessions.get(user_id)
+        if data is None:
+            return None
+        record = json.loads(data)
+        return Session(user_id, record["context"], record["summary"], record["turns"],
+                       record["folded_through"], record["version"], record["updated_at"])
+
+    def save(self, session: Session) -> bool:
+        with self._lock:
+            data = self._sessions.get(session.user_id)
+            record = json.loads(data) if data else {"version": 0, "turns": []}
+            if record["version"] != session.version:
+                return False
+            seq = _next_seq(record["turns"], session.folded_through)
+            for turn in session.new_turns:
+                turn["seq"], seq = seq, seq + 1
+            turns = [t for t in record["turns"] + session.new_turns if t["seq"] > session.folded_through]
+            self._sessions[session.user_id] = json.dumps({
+                "context": session.context, "summary": session.summary, "turns": turns,
+                "folded_through": session.folded_through, "version": session.version + 1,
+                "updated_at": session.updated_at,
+            }, ensure_ascii=False, default=str)
+        session.mark_saved()
+        return True
+
+    def delete(self, user_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(user_id, None)
+
+
+class SQLiteBackend(SessionBackend):
+    """
+    A local SQLite file in WAL mode, shared by the pre-forked workers: one row
+    per user plus one row per turn. Saves run in a BEGIN IMMEDIATE transaction,
+    so the version check and the writes are atomic across processes.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        user_id        TEXT PRIMARY KEY,
+        context        TEXT NOT NULL,
+        summary        TEXT NOT NULL,
+        folded_through INTEGER NOT NULL,
+        version        INTEGER NOT NULL,
+        updated_at     REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS turns (
+        user_id   TEXT NOT NULL,
+        seq       INTEGER NOT NULL,
+        user      TEXT NOT NULL,
+        assistant TEXT NOT NULL,
+        PRIMARY KEY (user_id, seq)
+    );
+    """
+
+    def __init__(self, path: str = SESSION_DB_PATH, timeout: float = 10.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connect().executescript(self.SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread and process: connections must not cross a fork().
+        # Autocommit mode; transactions are explicit.
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def load(self, user_id: str) -> Optional[Session]:
+        conn = self._connect()
+        conn.execute("BEGIN")   # one snapshot for both tables
+        try:
+            row = conn.execute(
+                "SELECT context, summary, folded_through, version, updated_at FROM sessions WHERE user_id = ?",
+                (user_id,)
+            ).fetchone()
+            turns = conn.execute(
+                "SELECT seq, user, assistant FROM turns WHERE user_id = ? AND seq > ? ORDER BY seq",
+                (user_id, row[2] if row else -1)
+            ).fetchall()
+        finally:
+            conn.execute("COMMIT")
+        if row is None:
+            return None
+        context, summary, folded_through, version, updated_at = row
+        return Session(user_id, json.loads(context), summary,
+                       [{"seq": seq, "user": user, "assistant": assistant} for seq, user, assistant in turns],
+                       folded_through, version, updated_at)
+
+    def save(self, session: Session) -> bool:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")   # takes the write lock now, so the check below holds until COMMIT
+        try:
+            row = conn.execute("SELECT version FROM sessions WHERE user_id = ?", (session.user_id,)).fetchone()
+            if (row[0] if row else 0) != session.version:
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute(
+                "INSERT INTO sessions (user_id, context, summary, folded_through, version, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(user_id) DO UPDATE SET context = excluded.context, "
+                "summary = excluded.summary, folded_through = excluded.folded_through, "
+                "version = excluded.version, updated_at = excluded.updated_at",
+                (session.user_id, json.dumps(session.context, ensure_ascii=False, default=str), session.summary,
+                 session.folded_through, session.version + 1, session.updated_at)
+            )
+            last = conn.execute("SELECT MAX(seq) FROM turns WHERE user_id = ?", (session.user_id,)).fetchone()[0]
+            seq = max(-1 if last is None else last, session.folded_through) + 1
+            rows = []
+            for turn in session.new_turns:
+                rows.append((session.user_id, seq, turn["user"], turn["assistant"]))
+                seq += 1
+            conn.executemany("INSERT INTO turns (user_id, seq, user, assistant) VALUES (?, ?, ?, ?)", rows)
+            conn.execute("DELETE FROM turns WHERE user_id = ? AND seq <= ?", (session.user_id, session.folded_through))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        for turn, row in zip(session.new_turns, rows):
+            turn["seq"] = row[1]
+        session.mark_saved()
+        return True
+
+    def delete(self, user_id: str) -> None:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+            conn.execute("DELETE FROM turns WHERE user_id = ?", (user_id,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+BACKENDS: Dict[str, Callable[[], SessionBackend]] = {
+    "sqlite": lambda: SQLiteBackend(SESSION_DB_PATH),
+    "memory": MemoryBackend,
+}
+
+
+def register_backend(name: str, factory: Callable[[], SessionBackend]) -> None:
+    """Make a backend (e.g. Redis, Postgres) selectable with SESSION_BACKEND=<name>."""
+    BACKENDS[name] = factory
+
+# ---------------- Summaries ----------------
+
+SUMMARY_PROMPT = """
+You keep the running summary of a conversation between a user and CareerMate, a career advisor.
+Merge the previous summary and the new turns into one updated summary of at most {words} words.
+Keep facts about the user (target job, skills, preferences), what CareerMate already told them
+(missing skills, jobs, courses) and any open question or offer. Drop greetings and formatting.
+Reply with the summary only.
+"""
+
+
+async def summarize_turns(summary: str, turns: List[dict]) -> str:
+    """Fold `turns` into `summary` with one LLM call."""
+    from rag_tools.llm_loader import get_llm
+
+    transcript = "\n".join(f"User: {t['user']}\nCareerMate: {t['assistant']}" for t in turns)
+    messages = [
+        ("system", SUMMARY_PROMPT.format(words=SESSION_SUMMARY_TOKENS * 3 // 4)),
+        ("human", f"Previous summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"),
+    ]
+    reply = await get_llm().bind(max_tokens=SESSION_SUMMARY_TOKENS).ainvoke(messages)
+    return reply.content.strip()
+
+# ---------------- Store ----------------
+
+class SessionStore:
+    """
+    Loads and saves sessions around a turn and compacts their history.
+
+        async with store.session(user_id) as session:
+            ...                         # run the turn, session.add_turn(query, answer)
+        # saved here; compaction, if needed, continues in the background
+    """
+
+    def __init__(
+        self,
+        backend: SessionBackend,
+        history_tokens: int = SESSION_HISTORY_TOKENS,
+        keep_turns: int = SESSION_KEEP_TURNS,
+        summarize: Callable[[str, List[dict]], Awaitable[str]] = summarize_turns
+    ):
+        self.backend = backend
+        self.history_tokens = history_tokens
+        self.keep_turns = keep_turns
+        self.summarize = summarize
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self._compacting = set()
+        self._tasks = set()
+
+    def _lock(self, user_id: str) -> asyncio.Lock:
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = self._locks[user_id] = asyncio.Lock()
+        return lock
+
+    async def _call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    @asynccontextmanager
+    async def session(self, user_id: str) -> AsyncIterator[Session]:
+        """The user's session for one turn; saved when the block exits without an error."""
+        async with self._lock(user_id):
+            with span("session.load"):
+                session = await self._call(self.backend.load, user_id)
+            incr("session_loads_total", result="found" if session else "new")
+            session = session or Session(user_id)
+            loaded_context = copy.deepcopy(session.context)
+            yield session
+            session.updated_at = time.time()
+            with span("session.save"):
+                session = await self._save(session, loaded_context)
+        observe("session_history_tokens", session.tokens(), SIZE_BUCKETS)
+        self._maybe_compact(session)
+
+    async def _save(self, session: Session, loaded_context: dict) -> Session:
+        """Save; if another worker saved this user since the load, merge onto its version. Returns the saved session."""
+        changes = {k: v for k, v in session.context.items() if loaded_context.get(k) != v}
+        for _ in range(SESSION_SAVE_RETRIES):
+            if await self._call(self.backend.save, session):
+                return session
+            incr("session_save_conflicts_total")
+            latest = await self._call(self.backend.load, session.user_id) or Session(session.user_id)
+            latest.context.update(changes)
+            latest.turns.extend(session.new_turns)
+            latest.new_turns = session.new_turns
+            latest.updated_at = session.updated_at
+            session = latest
+        raise RuntimeError(f"Session of {session.user_id!r} kept changing; gave up after {SESSION_SAVE_RETRIES} saves")
+
+    async def reset(self, user_id: str) -> None:
+        async with self._lock(user_id):
+            await self._call(self.backend.delete, user_id)
+
+    # ---------------- Compaction ----------------
+
+    def _fold_count(self, session: Session) -> int:
+        """How many of the oldest turns to summarize: enough to get back to half the budget."""
+        if session.tokens() <= self.history_tokens:
+            return 0
+        foldable = max(0, len(session.turns) - self.keep_turns)
+        remaining = session.tokens()
+        count = 0
+        while count < foldable and remaining > self.history_tokens // 2:
+            remaining -= _turn_tokens(session.turns[count])
+            count += 1
+        return count
+
+    def _maybe_compact(self, session: Session) -> None:
+        count = self._fold_count(session)
+        if not count or session.user_id in self._compacting:
+            return
+        self._compacting.add(session.user_id)
+        task = asyncio.create_task(self._compact(session.user_id, session.summary, session.folded_through,
+                                                 session.turns[:count]))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _compact(self, user_id: str, summary: str, folded_through: int, turns: List[dict]) -> None:
+        # Summarize without holding the user's lock, so their next turn is not delayed
+        try:
+            with span("session.compact", turns=len(turns)):
+                new_summary = await self.summarize(summary, turns)
+            last = turns[-1]["seq"]
+            async with self._lock(user_id):
+                for _ in range(SESSION_SAVE_RETRIES):
+                    session = await self._call(self.backend.load, user_id)
+                    stored = {turn["seq"]: turn["user"] for turn in session.turns} if session else {}
+                    if (session is None or session.folded_through != folded_through
+                            or any(stored.get(turn["seq"]) != turn["user"] for turn in turns)):
+                        return   # reset or compacted by another worker in the meantime
+                    session.summary = new_summary
+                    session.folded_through = last
+                    session.turns = [turn for turn in session.turns if turn["seq"] > last]
+                    if await self._call(self.backend.save, session):
+                        break
+                else:
+                    raise RuntimeError(f"session kept changing; gave up after {SESSION_SAVE_RETRIES} saves")
+            incr("session_compactions_total", result="ok")
+        except Exception as e:
+            # The turns stay in the history; the next turn tries again
+            incr("session_compactions_total", result="error")
+            print(f"⚠️ Session compaction for {user_id} failed: {e}")
+        finally:
+            self._compacting.discard(user_id)
+
+    async def drain(self) -> None:
+        """Wait for background compactions, e.g. before a CLI run exits."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+
+@lazy("session store")
+def get_session_store() -> SessionStore:
+    if SESSION_BACKEND not in BACKENDS:
+        raise ValueError(f"Unknown SESSION_BACKEND {SESSION_BACKEND!r}; choose from {', '.join(BACKENDS)}")
+    return SessionStore(BACKENDS[SESSION_BACKEND]())
+
+
+async def drain_sessions() -> None:
+    if get_session_store.loaded():
+        await get_session_store().drain()
@@ -1,49 +1,116 @@
 # rag_tools/setup_vectorstore.py
 
+# Retrieval components are created on first use (see rag_tools/startup.py), so
+# importing this module is cheap. The old module-level names (`embedder`, `db`,
+# `store`, `bm25`, `hybrid_retriever`, `retrieval_executor`) still resolve, lazily.
 
-import pickle
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from rank_bm25 import BM25Okapi
-from langchain.schema import BaseRetriever
-from langchain.docstore.document import Document
-from typing import List
 import os
+from concurrent.futures import ThreadPoolExecutor
 
-# Load pre-chunked documents
-with open("rag_tools/chunks.pkl", "rb") as f:
-    chunks: List[Document] = pickle.load(f)
-
-# Load vector DB from disk
-embedder = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-db = FAISS.load_local(
-    folder_path="rag_tools/rag_jobs_db",
-    embeddings=embedder,
-    allow_dangerous_deserialization=True
-)
-
-# Create BM25 index
-tokenized = [doc.page_content.split() for doc in chunks]
-bm25 = BM25Okapi(tokenized)
-
-# Define Hybrid Retriever
-class HybridRetriever(BaseRetriever):
-    chunks: List[Document]
-    db: FAISS
-    bm25: BM25Okapi
-    k: int = 10
-
-    def _get_relevant_documents(self, query: str, **kwargs) -> List[Document]:
-        dense_docs = self.db.as_retriever(search_kwargs={"k": self.k}).get_relevant_documents(query)
-        kw_docs = self.bm25_retrieve(query, top_k=self.k)
-        unique = {doc.page_content: doc for doc in dense_docs + kw_docs}
-        return list(unique.values())[:self.k]
-
-    def bm25_retrieve(self, query: str, top_k: int = 10) -> List[Document]:
-        scores = self.bm25.get_scores(query.split())
-        top_idx = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:top_k]
-        return [self.chunks[i] for i in top_idx]
-
-# Instantiate Hybrid Retriever
-hybrid_retriever = HybridRetriever(chunks=chunks, db=db, bm25=bm25, k=20)
+from rag_tools.startup import lazy
 
+STORE_PATH = "rag_tools/chunk_store"
+INDEX_PATH = "rag_tools/rag_jobs_db"
+
+# Retrieval is CPU-bound (embedding, FAISS, BM25): async callers run it on this
+# bounded pool, and queries arriving within the batch window share one embedding
+# call and one FAISS search.
+RETRIEVAL_WORKERS = int(os.getenv("RETRIEVAL_WORKERS", min(4, os.cpu_count() or 1)))
+RETRIEVAL_BATCH_WINDOW_MS = float(os.getenv("RETRIEVAL_BATCH_WINDOW_MS", "5"))
+RETRIEVAL_MAX_BATCH = int(os.getenv("RETRIEVAL_MAX_BATCH", "32"))
+
+# Query/document embedder: "hf" (PyTorch MiniLM) or "onnx" (int8 MiniLM, see onnx_embedder.py)
+EMBEDDER = os.getenv("EMBEDDER", "hf").lower()
+
+
+@lazy("retrieval executor")
+def get_retrieval_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix="retrieval")
+
+
+@lazy("embedder")
+def get_embedder():
+    if EMBEDDER == "onnx":
+        from rag_tools.onnx_embedder import OnnxEmbeddings
+        return OnnxEmbeddings()
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+
+
+@lazy("chunk store")
+def get_store():
+    # Memory-mapped chunk store (text, metadata, vectors); row i is FAISS position i
+    from rag_tools.chunk_store import ChunkStore
+    return ChunkStore(STORE_PATH)
+
+
+@lazy("index params")
+def get_index_params() -> dict:
+    # Backend (flat / ivfpq / hnsw) and search settings saved with the index, see ann_index.py
+    from rag_tools.ann_index import load_params
+    return load_params(INDEX_PATH)
+
+
+@lazy("faiss index")
+def get_vectorstore():
+    # The docstore reads from the mapped store, so no pickled copy of the documents is loaded
+    import faiss
+    from langchain_community.vectorstores import FAISS
+    from rag_tools.ann_index import apply_search_params
+    from rag_tools.chunk_store import ChunkStoreDocstore, RowIds
+
+    store = get_store()
+    if get_index_params().get("generation") != store.generation:
+        # Row ids would point at other chunks (e.g. an ingest died between the swaps)
+        raise RuntimeError(f"{STORE_PATH} and {INDEX_PATH} are from different builds; "
+                           "run `python -m rag_tools.ingest` to rebuild them.")
+    index = faiss.read_index(os.path.join(INDEX_PATH, "index.faiss"))
+    apply_search_params(index, get_index_params())
+    return FAISS(
+        embedding_function=get_embedder(),
+        index=index,
+        docstore=ChunkStoreDocstore(store),
+        index_to_docstore_id=RowIds(len(store))
+    )
+
+
+@lazy("bm25 index")
+def get_bm25():
+    # CSR term matrix, built once from the store texts
+    from rag_tools.bm25_index import SparseBM25
+    return SparseBM25(text.split() for text in get_store().iter_texts())
+
+
+@lazy("metadata index")
+def get_metadata_index():
+    # Bitmaps over location / work_type / involvement / industry / level for pre-filtering
+    from rag_tools.metadata_filter import MetadataIndex
+    return MetadataIndex.from_store(get_store())
+
+
+@lazy("hybrid retriever")
+def get_hybrid_retriever():
+    from rag_tools.hybrid_retriever import HybridRetriever
+    return HybridRetriever(
+        store=get_store(), db=get_vectorstore(), bm25=get_bm25(),
+        metadata_index=get_metadata_index(), k=20, fetch_k=20,
+        refine=get_index_params()["search"].get("refine", 1)
+    )
+
+
+_lazy_attributes = {
+    "retrieval_executor": get_retrieval_executor,
+    "embedder": get_embedder,
+    "store": get_store,
+    "db": get_vectorstore,
+    "index_params": get_index_params,
+    "bm25": get_bm25,
+    "metadata_index": get_metadata_index,
+    "hybrid_retriever": get_hybrid_retriever,
+}
+
+
+def __getattr__(name: str):
+    if name in _lazy_attributes:
+        return _lazy_attributes[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,275 @@
+# rag_tools/skill_index.py
+
+import os
+import re
+import json
+import argparse
+from collections import Counter
+from typing import Dict, List, Optional
+
+# Offline skill index built from IT_jobs.csv:
+#   title -> skill frequency over that title's postings
+#   skill -> posting keys that mention it
+# Lets the skill-gap tool answer common titles without retrieval or an LLM call.
+
+SKILL_INDEX_PATH = "rag_tools/skill_index.json"
+
+# ---------------- Skill vocabulary ----------------
+
+# Canonical skill -> aliases as they appear in postings (matched as whole words,
+# case-insensitive). Short, ambiguous names are listed in CASE_SENSITIVE below.
+SKILL_ALIASES: Dict[str, List[str]] = {
+    # Languages
+    "Python": ["python"],
+    "Java": ["java", "core java", "java 8"],
+    "JavaScript": ["javascript", "java script", "js", "es6"],
+    "TypeScript": ["typescript"],
+    "C": ["C", "C language", "C programming"],
+    "C++": ["c++", "cpp"],
+    "C#": ["c#", "c sharp", "csharp"],
+    "Go": ["golang"],
+    "R": ["R", "R programming"],
+    "Scala": ["scala"],
+    "Kotlin": ["kotlin"],
+    "Swift": ["swift"],
+    "PHP": ["php"],
+    "Ruby": ["ruby"],
+    "Rust": ["rust"],
+    "Perl": ["perl"],
+    "Bash": ["bash", "shell scripting", "shell script"],
+    "PowerShell": ["powershell"],
+    "VBA": ["vba", "excel macros", "macros"],
+    "SAS": ["SAS"],
+    "MATLAB": ["matlab"],
+    # Data & analytics
+    "SQL": ["sql", "t-sql", "tsql", "pl/sql", "plsql"],
+    "MySQL": ["mysql"],
+    "PostgreSQL": ["postgresql", "postgres"],
+    "Oracle": ["oracle", "oracle db"],
+    "SQL Server": ["sql server", "ms sql", "mssql"],
+    "MongoDB": ["mongodb", "mongo"],
+    "Redis": ["redis"],
+    "Cassandra": ["cassandra"],
+    "Elasticsearch": ["elasticsearch", "elastic search"],
+    "Excel": ["excel", "ms excel", "microsoft excel", "advanced excel"],
+    "Google Sheets": ["google sheets"],
+    "MS Access": ["ms access", "microsoft access"],
+    "Power BI": ["power bi", "powerbi"],
+    "Tableau": ["tableau"],
+    "Looker": ["looker"],
+    "Qlik": ["qlik", "qlikview", "qlik sense"],
+    "Pandas": ["pandas"],
+    "NumPy": ["numpy"],
+    "Statistics": ["statistics", "statistical analysis", "statistical"],
+    "Data Visualization": ["data visualization", "data visualisation"],
+    "Data Modeling": ["data modeling", "data modelling"],
+    "ETL": ["etl", "elt"],
+    "Data Warehousing": ["data warehouse", "data warehousing"],
+    "Hadoop": ["hadoop", "hdfs"],
+    "Spark": ["spark", "pyspark", "apache spark"],
+    "Kafka": ["kafka"],
+    "Airflow": ["airflow"],
+    "Snowflake": ["snowflake"],
+    "Databricks": ["databricks"],
+    "Big Data": ["big data"],
+    # ML / AI
+    "Machine Learning": ["machine learning", "ML"],
+    "Deep Learning": ["deep learning"],
+    "AI": ["AI", "artificial intelligence"],
+    "NLP": ["nlp", "natural language processing"],
+    "Computer Vision": ["computer vision"],
+    "TensorFlow": ["tensorflow"],
+    "PyTorch": ["pytorch"],
+    "scikit-learn": ["scikit-learn", "sklearn", "scikit learn"],
+    # Web & frameworks
+    "HTML": ["html", "html5"],
+    "CSS": ["css", "css3"],
+    "React": ["react", "reactjs", "react.js"],
+    "Angular": ["angular", "angularjs", "angular.js"],
+    "Vue": ["vue", "vuejs", "vue.js"],
+    "Node.js": ["node.js", "nodejs", "node js"],
+    "Express": ["express.js", "expressjs"],
+    "Django": ["django"],
+    "Flask": ["flask"],
+    "FastAPI": ["fastapi"],
+    "Spring": ["spring", "spring boot", "springboot"],
+    "Hibernate": ["hibernate"],
+    ".NET": [".net", "dotnet", "asp.net", ".net core", "asp.net core"],
+    "REST APIs": ["rest", "restful", "rest api", "rest apis", "web api"],
+    "GraphQL": ["graphql"],
+    "Microservices": ["microservices", "micro services"],
+    # Cloud & DevOps
+    "AWS": ["aws", "amazon web services"],
+    "Azure": ["azure", "microsoft azure"],
+    "GCP": ["gcp", "google cloud"],
+    "Docker": ["docker"],
+    "Kubernetes": ["kubernetes", "k8s"],
+    "Terraform": ["terraform"],
+    "Ansible": ["ansible"],
+    "Jenkins": ["jenkins"],
+    "CI/CD": ["ci/cd", "ci cd", "continuous integration"],
+    "Git": ["git", "github", "gitlab", "bitbucket"],
+    "Linux": ["linux", "unix"],
+    # Tools & practices
+    "Jira": ["jira"],
+    "Agile": ["agile", "scrum"],
+    "Unity": ["unity", "unity3d"],
+    "Unreal Engine": ["unreal", "unreal engine"],
+    "SAP": ["SAP"],
+    "Salesforce": ["salesforce"],
+    "Selenium": ["selenium"],
+    "Unit Testing": ["unit testing", "junit", "pytest", "nunit"],
+    "Embedded Systems": ["embedded", "embedded systems", "rtos"],
+}
+
+# Aliases that are only recognized with their exact capitalization ("C", "R", "AI", ...)
+CASE_SENSITIVE = {"C", "R", "AI", "ML", "SAS", "SAP"}
+
+_alias_to_skill = {alias.lower(): skill for skill, aliases in SKILL_ALIASES.items() for alias in aliases}
+_alias_to_skill.update({skill.lower(): skill for skill in SKILL_ALIASES})
+
+
+def _alias_pattern(aliases: List[str]) -> str:
+    # Whole-word match that also works for aliases with symbols (c#, .net, ci/cd)
+    escaped = "|".join(re.escape(a) for a in sorted(aliases, key=len, reverse=True))
+    return rf"(?<![\w.#+/&])(?:{escaped})(?![\w#+&])"
+
+
+_patterns = []
+for _skill, _aliases in SKILL_ALIASES.items():
+    loose = [a for a in _aliases if a not in CASE_SENSITIVE]
+    strict = [a for a in _aliases if a in CASE_SENSITIVE]
+    if loose:
+        _patterns.append((_skill, re.compile(_alias_pattern(loose), re.IGNORECASE)))
+    if strict:
+        _patterns.append((_skill, re.compile(_alias_pattern(strict))))
+
+
+def normalize_skill(name: str) -> str:
+    """Map an alias ("Ms Excel", "ML", "sklearn") to its canonical skill name."""
+    cleaned = " ".join(name.strip().strip("•-*.,").split())
+    return _alias_to_skill.get(cleaned.lower(), cleaned)
+
+
+def extract_skills(text: str) -> List[str]:
+    """Canonical skills mentioned in a posting's text."""
+    found = []
+    for skill, pattern in _patterns:
+        if skill not in found and pattern.search(text):
+            found.append(skill)
+    return found
+
+
+def normalize_title(title: str) -> str:
+    """'.Net Developers' -> '.net developer'"""
+    words = str(title).lower().replace("-", " ").split()
+    words = [w[:-1] if w.endswith("s") and len(w) > 3 and not w.endswith("ss") else w for w in words]
+    return " ".join(words)
+
+# ---------------- Build ----------------
+
+def build_skill_index(df, output_path: str = SKILL_INDEX_PATH) -> dict:
+    """
+    Extract skills from every posting once and write the inverted index. `df` is
+    the feed DataFrame or an iterable of (posting key, row), e.g. `build_corpus.iter_postings`.
+    """
+    from rag_tools.ingest import keyed_postings, corpus_version
+
+    postings = keyed_postings(df).items() if hasattr(df, "to_dict") else df
+    titles: Dict[str, dict] = {}
+    skill_postings: Dict[str, List[str]] = {}
+    for key, row in postings:
+        skills = extract_skills(f"{row['designation']}\n{row['job_details']}")
+        entry = titles.setdefault(normalize_title(row["designation"]), {"postings": 0, "skills": Counter()})
+        entry["postings"] += 1
+        entry["skills"].update(skills)
+        for skill in skills:
+            skill_postings.setdefault(skill, []).append(key)
+
+    index = {
+        "corpus_version": corpus_version(),
+        "titles": {
+            title: {"postings": entry["postings"], "skills": dict(entry["skills"].most_common())}
+            for title, entry in titles.items()
+        },
+        "skills": skill_postings,
+    }
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, output_path)
+    print(f"✅ Skill index for {len(titles)} titles and {len(skill_postings)} skills saved to {output_path}")
+    return index
+
+def stored_version(path: str = SKILL_INDEX_PATH) -> Optional[int]:
+    """Corpus version the index file was built for (None when there is no index)."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("corpus_version", 0)
+
+# ---------------- Lookup ----------------
+
+_index: Optional[dict] = None
+_loaded_for: Optional[tuple] = None     # (corpus version, index file mtime) of _index
+
+
+def load_skill_index(path: str = SKILL_INDEX_PATH) -> dict:
+    """
+    The index for the live corpus, re-read when an ingest bumps the corpus version
+    or rewrites the file (like answer_cache.py, via the manifest's mtime check).
+    An index built for another corpus version is not used: lookups return None
+    and the skill gap falls back to RAG until the index is rebuilt.
+    """
+    global _index, _loaded_for
+    from rag_tools.ingest import corpus_version
+
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    key = (corpus_version(), mtime)
+    if _index is None or key != _loaded_for:
+        index = {"titles": {}, "skills": {}}
+        if mtime is not None:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("corpus_version", 0) == key[0]:
+                index = data
+            else:
+                print(f"⚠️ {path} was built for corpus version {data.get('corpus_version', 0)}, not {key[0]}; "
+                      f"skill gaps use RAG until `python -m rag_tools.skill_index` rebuilds it.")
+        _index, _loaded_for = index, key
+    return _index
+
+
+def lookup_required_skills(job_title: str, min_share: float = 0.15, top_n: int = 15) -> Optional[List[str]]:
+    """
+    Skills mentioned by at least `min_share` of the postings for this title,
+    most frequent first. Returns None for titles the index has never seen, so the
+    caller can fall back to RAG.
+    """
+    entry = load_skill_index()["titles"].get(normalize_title(job_title))
+    if not entry or not entry["skills"]:
+        return None
+    threshold = max(1, min_share * entry["postings"])
+    skills = [skill for skill, count in entry["skills"].items() if count >= threshold]
+    return skills[:top_n] or list(entry["skills"])[:top_n]
+
+
+def postings_with_skill(skill: str) -> List[str]:
+    """Posting keys (see ingest.keyed_postings) that mention a skill."""
+    return load_skill_index()["skills"].get(normalize_skill(skill), [])
+
+
+def main():
+    from rag_tools.build_corpus import iter_postings
+
+    parser = argparse.ArgumentParser(description="Build the offline title -> skills index.")
+    parser.add_argument("--csv", default="IT_jobs.csv", help="Path to the job feed (.csv or .parquet)")
+    args = parser.parse_args()
+    build_skill_index(iter_postings(args.csv))
+
+
+if __name__ == "__main__":
+    main()
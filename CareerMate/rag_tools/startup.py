@@ -0,0 +1,85 @@
+# rag_tools/startup.py
+
+import time
+import threading
+import functools
+from contextlib import contextmanager
+from typing import Callable, List, Tuple, TypeVar
+
+# Lazy initialization and startup timing for CareerMate.
+# Keep this module free of heavy imports: it is loaded before anything else.
+
+PROCESS_START = time.perf_counter()
+timings: List[Tuple[str, float]] = []
+
+T = TypeVar("T")
+
+
+def record(stage: str, seconds: float) -> None:
+    timings.append((stage, seconds))
+
+
+@contextmanager
+def timed(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def lazy(stage: str) -> Callable[[Callable[[], T]], Callable[[], T]]:
+    """
+    Turn a zero-argument factory into a thread-safe, build-once accessor.
+    The first call is timed under `stage` and shows up in `startup_report()`.
+    """
+    def decorator(factory: Callable[[], T]) -> Callable[[], T]:
+        lock = threading.Lock()
+        state = {}
+
+        @functools.wraps(factory)
+        def get() -> T:
+            if "value" not in state:
+                with lock:
+                    if "value" not in state:
+                        with timed(stage):
+                            state["value"] = factory()
+            return state["value"]
+
+        get.loaded = lambda: "value" in state
+        get.reset = state.clear
+        return get
+    return decorator
+
+
+def warmup(probe: bool = True) -> None:
+    """
+    Load the embedder, indexes and LLM client and build the RAG chains now
+    instead of on the first request. Servers call this before accepting traffic.
+
+    With `probe=False` nothing is executed (no embedding, no search), which is
+    what a pre-fork parent wants: model and thread-pool state must not be
+    initialized before `fork()`. Workers then run `warmup()` themselves.
+    """
+    from rag_tools import chain_registry
+    from rag_tools.rag_jobs import get_jobs_chain
+    from rag_tools.rag_skills import get_skills_chain
+    from rag_tools.intent_router import get_intent_router
+    from rag_tools.course_catalog import get_course_catalog
+
+    with timed("warmup" if probe else "preload"):
+        get_jobs_chain()
+        get_skills_chain()
+        get_course_catalog()
+        if probe:
+            chain_registry.warmup()
+            get_intent_router()  # embeds the intent exemplars
+
+
+def startup_report() -> str:
+    """Human-readable breakdown of where startup time went."""
+    lines = ["Startup timing:"]
+    for stage, seconds in timings:
+        lines.append(f"  {stage:<28} {seconds * 1000:9.1f} ms")
+    lines.append(f"  {'since process start':<28} {(time.perf_counter() - PROCESS_START) * 1000:9.1f} ms")
+    return "\n".join(lines)
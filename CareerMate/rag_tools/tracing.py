@@ -0,0 +1,181 @@
+# rag_tools/tracing.py
+
+import os
+import time
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from rag_tools.metrics import incr, observe, SIZE_BUCKETS
+
+# Spans for the stages of a turn. Every span is timed into the
+# `stage_seconds{stage=...}` histogram; when OpenTelemetry is installed it is also
+# an OTel span, exported once `configure_tracing()` has set up an exporter:
+#   LOGFIRE_TOKEN                 -> logfire (which also instruments the Agents SDK)
+#   OTEL_EXPORTER_OTLP_ENDPOINT   -> OTLP/HTTP via the OpenTelemetry SDK
+# Without either, OTel spans are no-ops and only the local metrics are kept.
+
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "careermate")
+LOGFIRE_TOKEN = os.getenv("LOGFIRE_TOKEN")
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+
+_tracer = None
+_configured = False
+_configure_lock = threading.Lock()
+
+
+def configure_tracing() -> Optional[str]:
+    """
+    Set up span export once per process (call it after forking: exporters run a
+    background thread). Returns the exporter in use, or None.
+    """
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return None
+        _configured = True
+        if LOGFIRE_TOKEN:
+            import logfire
+            logfire.configure(service_name=SERVICE_NAME, token=LOGFIRE_TOKEN, console=False)
+            if hasattr(logfire, "instrument_openai_agents"):
+                logfire.instrument_openai_agents()
+            print("✅ Tracing to logfire")
+            return "logfire"
+        if OTLP_ENDPOINT:
+            from opentelemetry import trace
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+            provider = TracerProvider(resource=Resource.create({"service.name": SERVICE_NAME}))
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+            trace.set_tracer_provider(provider)
+            print(f"✅ Tracing to {OTLP_ENDPOINT}")
+            return "otlp"
+    return None
+
+
+def get_tracer():
+    """The OTel tracer, or None when opentelemetry is not installed."""
+    global _tracer
+    if _tracer is None:
+        try:
+            from opentelemetry import trace
+        except ImportError:
+            _tracer = False
+        else:
+            _tracer = trace.get_tracer("careermate")
+    return _tracer or None
+
+
+def _attributes(values: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in values.items() if isinstance(v, (str, bool, int, float))}
+
+
+@contextmanager
+def span(stage: str, **attributes):
+    """
+    Time a block as `stage`. Yields a dict: anything added to it (counts, sizes)
+    is attached to the OTel span when the block ends.
+
+        with span("retrieval.dense", queries=len(queries)) as attrs:
+            ...
+            attrs["hits"] = len(hits)
+    """
+    tracer = get_tracer()
+    start = time.perf_counter()
+    with (tracer.start_as_current_span(stage) if tracer else nullcontext()) as otel_span:
+        try:
+            yield attributes
+        finally:
+            observe("stage_seconds", time.perf_counter() - start, stage=stage)
+            if otel_span is not None:
+                otel_span.set_attributes(_attributes(attributes))
+
+
+def start_span(stage: str, **attributes):
+    """A span that is ended by the caller (`end_span`), for start/end callbacks."""
+    tracer = get_tracer()
+    return {
+        "stage": stage,
+        "start": time.perf_counter(),
+        "otel": tracer.start_span(stage, attributes=_attributes(attributes)) if tracer else None,
+    }
+
+
+def end_span(handle: Optional[dict], error: Optional[BaseException] = None, **attributes) -> float:
+    """Finish a `start_span` handle; returns its duration in seconds."""
+    if handle is None:
+        return 0.0
+    seconds = time.perf_counter() - handle["start"]
+    observe("stage_seconds", seconds, stage=handle["stage"])
+    otel_span = handle["otel"]
+    if otel_span is not None:
+        otel_span.set_attributes(_attributes(attributes))
+        if error is not None:
+            otel_span.record_exception(error)
+        otel_span.end()
+    return seconds
+
+# ---------------- Token accounting ----------------
+
+def record_llm_call(source: str, caller: str, seconds: float, prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> None:
+    """One model call: latency, plus token counts when the provider reported usage."""
+    observe("llm_call_seconds", seconds, source=source, caller=caller)
+    if prompt_tokens is not None:
+        observe("llm_prompt_tokens", prompt_tokens, SIZE_BUCKETS, source=source, caller=caller)
+        incr("llm_tokens_total", prompt_tokens, source=source, caller=caller, kind="prompt")
+    if completion_tokens is not None:
+        observe("llm_completion_tokens", completion_tokens, SIZE_BUCKETS, source=source, caller=caller)
+        incr("llm_tokens_total", completion_tokens, source=source, caller=caller, kind="completion")
+
+
+def record_context(flow: str, docs) -> None:
+    """Documents stuffed into a RAG prompt, and roughly how many tokens they take (~4 chars each)."""
+    observe("rag_context_chunks", len(docs), SIZE_BUCKETS, flow=flow)
+    observe("rag_context_tokens", sum(len(doc.page_content) for doc in docs) // 4, SIZE_BUCKETS, flow=flow)
+
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """
+    LangChain callbacks for the RAG chains' chat model: call latency, time to
+    first token and token usage (ChatOpenAI reports usage when `stream_usage=True`).
+    """
+    run_inline = True   # cheap bookkeeping, no need for a thread hop
+
+    def __init__(self, name: str = "rag"):
+        self.name = name
+        self._calls: Dict[UUID, dict] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs) -> None:
+        self._calls[run_id] = {"span": start_span("llm.rag", model=(serialized or {}).get("name")), "first_token": None}
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs) -> None:
+        call = self._calls.get(run_id)
+        if call is not None and call["first_token"] is None:
+            call["first_token"] = time.perf_counter()
+            observe("llm_time_to_first_token_seconds", call["first_token"] - call["span"]["start"], source="langchain", caller=self.name)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs) -> None:
+        call = self._calls.pop(run_id, None)
+        if call is None:
+            return
+        usage = {}
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None) or usage
+        if not usage:
+            token_usage = (response.llm_output or {}).get("token_usage") or {}
+            usage = {"input_tokens": token_usage.get("prompt_tokens"), "output_tokens": token_usage.get("completion_tokens")}
+        prompt_tokens, completion_tokens = usage.get("input_tokens"), usage.get("output_tokens")
+        seconds = end_span(call["span"], prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        record_llm_call("langchain", self.name, seconds, prompt_tokens, completion_tokens)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        end_span(self._calls.pop(run_id, {}).get("span"), error=error)
+        incr("llm_errors_total", source="langchain", caller=self.name, error=type(error).__name__)
@@ -0,0 +1,346 @@
+# serve.py
+#
+# Pre-fork HTTP server for CareerMate.
+#
+# The parent process loads the embedder weights, chunk store, FAISS/BM25 indexes,
+# LLM client and RAG chains, freezes the GC so those objects stay on shared
+# copy-on-write pages, binds one listening socket and forks the workers. Each
+# worker runs an asyncio HTTP server on the shared socket with its own
+# concurrency limit and per-request timeout.
+#
+#   python serve.py --port 8000 --workers 8 --max-concurrency 32 --timeout 60
+#
+#   POST /chat    {"user_id": "u1", "query": "Find me a job.", "current_skills": [...],
+#                  "target_job": ..., "preferred_location": ..., "involvement": ...,
+#                  "work_type": ..., "missing_skills": [...]}
+#                 profile fields are optional after the first turn: the context and the
+#                 conversation are kept per user_id (rag_tools/sessions.py)
+#   POST /chat/stream   same body; Server-Sent Events (tokens, tool calls, handoffs,
+#                       jobs) ending with a "final" event
+#   GET  /health
+#   GET  /metrics       Prometheus text format, summed over all workers (--metrics-dir)
+
+import os
+import gc
+import sys
+import glob
+import shutil
+import json
+import time
+import signal
+import socket
+import asyncio
+import argparse
+import tempfile
+from contextlib import asynccontextmanager
+from typing import Optional, Tuple
+
+from rag_tools.startup import warmup
+from rag_tools import metrics
+from rag_tools.tracing import configure_tracing
+from CareerMate import (
+    CONTEXT_FIELDS, UserContext, context_to_dict, user_session, run_turn, stream_turn,
+    InputGuardrailTripwireTriggered
+)
+
+MAX_BODY_BYTES = 1 << 20
+
+# ----------------------------- REQUESTS -----------------------------
+
+# Fields the server computes; clients can only set the profile
+_profile_fields = CONTEXT_FIELDS - {"user_id", "session_start", "career_plan", "skill_gap_for"}
+
+
+def profile_from_payload(payload: dict) -> dict:
+    """Profile fields of the request JSON, applied over the user's stored context; unknown keys are ignored."""
+    return {k: v for k, v in payload.items() if k in _profile_fields}
+
+
+def context_to_payload(user_context: UserContext) -> dict:
+    return context_to_dict(user_context)
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+_reasons = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable",
+            504: "Gateway Timeout"}
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, dict, bytes]]:
+    """Parse one HTTP/1.1 request. Returns None when the client closed the connection."""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, path, _ = request_line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "malformed request line")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length", "0") or 0)
+    if length > MAX_BODY_BYTES:
+        raise HttpError(413, "request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), path.split("?", 1)[0], headers, body
+
+
+def write_response(writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool) -> None:
+    """`payload` is sent as JSON, or as plain text when it is a str."""
+    if isinstance(payload, str):
+        body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4"
+    else:
+        body, content_type = json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json"
+    head = (
+        f"HTTP/1.1 {status} {_reasons.get(status, '')}\r\n"
+        f"Content-Type: {content_type}; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    writer.write(head.encode("latin-1") + body)
+
+
+def write_event(writer: asyncio.StreamWriter, event: dict) -> None:
+    data = json.dumps(event, ensure_ascii=False, default=str)
+    writer.write(f"event: {event['type']}\ndata: {data}\n\n".encode("utf-8"))
+
+# ----------------------------- WORKER -----------------------------
+
+class Worker:
+    """One forked process: an asyncio HTTP server with bounded concurrency."""
+
+    def __init__(self, max_concurrency: int, max_queue: int, timeout: float):
+        self.timeout = timeout
+        self.max_pending = max_concurrency + max_queue
+        self.pending = 0
+        self.slots = asyncio.Semaphore(max_concurrency)
+
+    @staticmethod
+    def parse_chat(body: bytes) -> Tuple[str, str, dict]:
+        """(query, user_id, profile updates) of a chat request."""
+        try:
+            payload = json.loads(body or b"{}")
+            if not payload.get("user_id"):
+                raise ValueError("'user_id' is required")
+            return payload["query"], str(payload["user_id"]), profile_from_payload(payload)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            raise HttpError(400, f"invalid request: {e}")
+
+    @asynccontextmanager
+    async def admit(self):
+        """Take a concurrency slot, or reject with 503 when the queue is full."""
+        if self.pending >= self.max_pending:
+            raise HttpError(503, "server busy, retry later")
+        self.pending += 1
+        try:
+            async with self.slots:
+                yield
+        finally:
+            self.pending -= 1
+
+    async def chat(self, body: bytes) -> dict:
+        query, user_id, profile = self.parse_chat(body)
+        async with self.admit(), user_session(user_id, **profile) as (user_context, session):
+            try:
+                output = await asyncio.wait_for(run_turn(query, user_context, session), self.timeout)
+            except asyncio.TimeoutError:
+                raise HttpError(504, f"request exceeded {self.timeout:.0f}s")
+            except InputGuardrailTripwireTriggered:
+                output = "⚠️ GUARDRAIL TRIGGERED ⚠️"
+        return {"user_id": user_context.user_id, "output": output, "context": context_to_payload(user_context)}
+
+    async def chat_stream(self, body: bytes, writer: asyncio.StreamWriter) -> None:
+        """Stream one turn as Server-Sent Events; the connection closes afterwards."""
+        query, user_id, profile = self.parse_chat(body)
+        async with self.admit(), user_session(user_id, **profile) as (user_context, session):
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream; charset=utf-8\r\n"
+                b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n"
+            )
+            events = stream_turn(query, user_context, session)
+            deadline = time.monotonic() + self.timeout
+            try:
+                while True:
+                    try:
+                        event = await asyncio.wait_for(events.__anext__(), deadline - time.monotonic())
+                    except StopAsyncIteration:
+                        break
+                    if event["type"] == "final":
+                        event["context"] = context_to_payload(user_context)
+                    write_event(writer, event)
+                    await writer.drain()
+            except asyncio.TimeoutError:
+                write_event(writer, {"type": "error", "status": 504, "error": f"request exceeded {self.timeout:.0f}s"})
+            except InputGuardrailTripwireTriggered:
+                write_event(writer, {"type": "final", "output": "⚠️ GUARDRAIL TRIGGERED ⚠️",
+                                     "context": context_to_payload(user_context)})
+            except Exception as e:
+                write_event(writer, {"type": "error", "status": 500, "error": f"{type(e).__name__}: {e}"})
+            finally:
+                await events.aclose()
+            await writer.drain()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await read_request(reader)
+                    if request is None:
+                        break
+                    method, path, headers, body = request
+                    keep_alive = headers.get("connection", "").lower() != "close"
+                    if path == "/health":
+                        status, payload = 200, {"status": "ok", "pid": os.getpid(), "in_flight": self.pending}
+                    elif path == "/metrics":
+                        status, payload = 200, metrics.render_prometheus()
+                    elif path == "/chat":
+                        if method != "POST":
+                            raise HttpError(405, "use POST")
+                        status, payload = 200, await self.chat(body)
+                    elif path == "/chat/stream":
+                        if method != "POST":
+                            raise HttpError(405, "use POST")
+                        await self.chat_stream(body, writer)
+                        break
+                    else:
+                        raise HttpError(404, f"no route for {path}")
+                except HttpError as e:
+                    status, payload = e.status, {"error": e.message}
+                except asyncio.IncompleteReadError:
+                    break
+                except Exception as e:
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+
+                write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, sock: socket.socket) -> None:
+        server = await asyncio.start_server(self.handle, sock=sock)
+        loop = asyncio.get_running_loop()
+        stop = loop.create_future()
+        loop.add_signal_handler(signal.SIGTERM, lambda: stop.done() or stop.set_result(None))
+        async with server:
+            await stop
+
+
+def run_worker(sock: socket.socket, args) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the parent handles Ctrl+C
+    # Threads do not survive fork(); give this worker its own retrieval pool
+    from rag_tools.setup_vectorstore import get_retrieval_executor
+    if get_retrieval_executor.loaded():
+        get_retrieval_executor.reset()
+    # Span exporters run a background thread too; counters inherited from the parent start over
+    configure_tracing()
+    metrics.reset()
+    metrics.enable_multiprocess(args.metrics_dir)
+    # Page in the shared index and run the first inference in this process,
+    # after the fork, so no model thread state crosses fork()
+    warmup(probe=True)
+    worker = Worker(args.max_concurrency, args.max_queue, args.timeout)
+    try:
+        asyncio.run(worker.serve(sock))
+    finally:
+        metrics.stop_multiprocess()
+
+# ----------------------------- SUPERVISOR -----------------------------
+
+def spawn(sock: socket.socket, args) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(sock, args)
+        except BaseException as e:
+            print(f"worker {os.getpid()} crashed: {e!r}", file=sys.stderr)
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork HTTP server for CareerMate.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--max-concurrency", type=int, default=32, help="In-flight requests per worker")
+    parser.add_argument("--max-queue", type=int, default=64, help="Requests per worker allowed to wait for a slot before 503")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument("--metrics-dir", default=os.getenv("METRICS_DIR"),
+                        help="Directory the workers share their metrics through (default: a temporary one)")
+    args = parser.parse_args()
+
+    # Series of a previous run would be summed into this one
+    own_metrics_dir = not args.metrics_dir
+    if args.metrics_dir:
+        for path in glob.glob(os.path.join(args.metrics_dir, "*.json")):
+            os.remove(path)
+    else:
+        args.metrics_dir = tempfile.mkdtemp(prefix="careermate-metrics-")
+
+    # Load once in the parent; workers share these pages copy-on-write
+    warmup(probe=False)
+    gc.collect()
+    gc.freeze()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(1024)
+    sock.setblocking(False)
+
+    workers = {spawn(sock, args) for _ in range(args.workers)}
+    print(f"CareerMate serving on http://{args.host}:{args.port} with {len(workers)} workers")
+
+    stopping = False
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    # Supervise: replace workers that die unexpectedly
+    while workers:
+        try:
+            pid, _ = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        workers.discard(pid)
+        if not stopping:
+            time.sleep(0.5)
+            workers.add(spawn(sock, args))
+
+    if own_metrics_dir:
+        shutil.rmtree(args.metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
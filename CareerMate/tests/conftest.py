@@ -0,0 +1,7 @@
+# tests/conftest.py
+
+import os
+import sys
+
+# Tests import rag_tools the way the app does, from the CareerMate folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,50 @@
+# tests/test_metrics.py
+#
+#   python -m pytest tests
+
+import multiprocessing
+
+import pytest
+
+from rag_tools import metrics
+
+
+@pytest.fixture
+def shared_dir(tmp_path):
+    metrics.reset()
+    yield str(tmp_path)
+    metrics.stop_multiprocess()
+    metrics.reset()
+
+
+def _worker(directory: str, requests: int) -> None:
+    metrics.reset()
+    metrics.enable_multiprocess(directory)
+    for _ in range(requests):
+        metrics.incr("http_requests_total", route="/chat")
+        metrics.observe("stage_seconds", 0.02, stage="retrieval.dense")
+    metrics.stop_multiprocess()
+
+
+def _value(text: str, series: str) -> float:
+    return float(next(line.split()[-1] for line in text.splitlines() if line.startswith(series + " ")))
+
+
+def test_scrape_sums_every_worker_and_keeps_exited_ones(shared_dir):
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=_worker, args=(shared_dir, n)) for n in (3, 5)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(30)
+        assert process.exitcode == 0
+
+    # The worker answering the scrape adds its live series to the others' files
+    metrics.enable_multiprocess(shared_dir)
+    metrics.incr("http_requests_total", route="/chat")
+    text = metrics.render_prometheus()
+    assert _value(text, 'http_requests_total{route="/chat"}') == 9
+    assert _value(text, 'stage_seconds_count{stage="retrieval.dense"}') == 8
+    assert _value(text, 'stage_seconds_bucket{stage="retrieval.dense",le="0.025"}') == 8
+    assert _value(text, 'stage_seconds_bucket{stage="retrieval.dense",le="0.01"}') == 0
+    assert text.count("# TYPE http_requests_total counter") == 1
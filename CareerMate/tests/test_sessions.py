@@ -0,0 +1,91 @@
+# tests/test_sessions.py
+#
+#   python -m pytest tests
+
+import asyncio
+import multiprocessing
+
+from rag_tools.sessions import SessionStore, SQLiteBackend
+
+
+async def _summarize(summary, turns):
+    return " / ".join([summary] * bool(summary) + [turn["user"] for turn in turns])
+
+
+def _store(path: str, history_tokens: int = 100_000) -> SessionStore:
+    return SessionStore(SQLiteBackend(path), history_tokens=history_tokens, keep_turns=2, summarize=_summarize)
+
+
+def test_concurrent_turns_through_two_stores_keep_both(tmp_path):
+    # Two stores on one file behave like two pre-forked workers: no shared lock
+    path = str(tmp_path / "sessions.db")
+    first, second = _store(path), _store(path)
+
+    async def main():
+        both_loaded = asyncio.Barrier(2)
+
+        async def turn(store, query, field, value):
+            async with store.session("u1") as session:
+                await both_loaded.wait()   # both turns start from the same stored version
+                session.context[field] = value
+                session.add_turn(query, f"answer to {query}")
+
+        await asyncio.gather(
+            turn(first, "What skills do I need?", "target_job", "Data Analyst"),
+            turn(second, "Find me a job.", "preferred_location", "Delhi"),
+        )
+
+    asyncio.run(main())
+    session = SQLiteBackend(path).load("u1")
+    assert sorted(turn["user"] for turn in session.turns) == ["Find me a job.", "What skills do I need?"]
+    assert [turn["seq"] for turn in session.turns] == [0, 1]
+    assert session.context == {"target_job": "Data Analyst", "preferred_location": "Delhi"}
+    assert session.version == 2
+
+
+def _worker_turns(path: str, worker: int, turns: int) -> None:
+    async def main():
+        store = _store(path)
+        for i in range(turns):
+            async with store.session("u1") as session:
+                session.context[f"worker_{worker}"] = i
+                session.add_turn(f"worker {worker} turn {i}", "ok")
+    asyncio.run(main())
+
+
+def test_concurrent_turns_in_two_processes_are_not_lost(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    _store(path)   # create the schema before the workers race
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=_worker_turns, args=(path, worker, 25)) for worker in range(2)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(60)
+        assert process.exitcode == 0
+
+    session = SQLiteBackend(path).load("u1")
+    assert len(session.turns) == 50
+    assert [turn["seq"] for turn in session.turns] == list(range(50))
+    assert session.context == {"worker_0": 24, "worker_1": 24}
+    for worker in range(2):   # each worker's turns stay in order
+        own = [turn["user"] for turn in session.turns if turn["user"].startswith(f"worker {worker} ")]
+        assert own == [f"worker {worker} turn {i}" for i in range(25)]
+
+
+def test_compaction_folds_old_turns_into_the_summary(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    store = _store(path, history_tokens=40)
+
+    async def main():
+        for i in range(6):
+            async with store.session("u1") as session:
+                session.add_turn(f"question {i} " + "x" * 40, "answer " + "y" * 40)
+            await store.drain()
+
+    asyncio.run(main())
+    session = SQLiteBackend(path).load("u1")
+    assert [turn["seq"] for turn in session.turns] == [4, 5]
+    assert session.folded_through == 3
+    assert session.summary.count("question") == 4
+    assert session.history()[0]["role"] == "system"